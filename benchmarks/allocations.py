@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""
+Tracks the memory, which is allocated for each request by the *Request*,
+the handler and the *Response*, and the garbage collections triggered while
+the requests are handled. The resources are kept in memory, so only the
+request handling itself is measured.
+
+Usage:
+
+.. code-block:: bash
+
+    python3 benchmarks/allocations.py [number of requests]
+"""
+
+# std
+import gc
+import sys
+import timeit
+import tracemalloc
+
+# local
+import jsonapi
+from jsonapi.marker import property as marker
+
+
+class User(object):
+
+    def __init__(self, id):
+        self._id = str(id)
+        return None
+
+    @marker.id_attribute()
+    def id(self):
+        return self._id
+
+    @marker.attribute()
+    def name(self):
+        return "User " + self._id
+
+
+class Post(object):
+
+    def __init__(self, id, author):
+        self._id = str(id)
+        self._author = author
+        return None
+
+    @marker.id_attribute()
+    def id(self):
+        return self._id
+
+    @marker.attribute()
+    def title(self):
+        return "Title of post " + self._id
+
+    @marker.to_one_relationship()
+    def author(self):
+        return self._author
+
+
+class MemorySession(jsonapi.base.database.Session):
+    """
+    A read only session, which returns the resources in *store*.
+    """
+
+    def __init__(self, api, store):
+        super().__init__(api)
+        self.store = store
+        return None
+
+    def query(self, typename, *, order=None, limit=None, offset=None,
+        filters=None, fields=None, include=None, cursor=None
+        ):
+        resources = [
+            resource for (type_, id_), resource in self.store.items()\
+            if type_ == typename
+        ]
+        offset = offset or 0
+        limit = limit if limit is not None else len(resources)
+        return resources[offset:offset + limit]
+
+    def query_size(self, typename, *, filters=None):
+        return len(self.query(typename))
+
+    def get(self, identifier, required=False, fields=None, include=None):
+        resource = self.store.get(identifier)
+        if resource is None and required:
+            raise jsonapi.base.errors.ResourceNotFound(identifier)
+        return resource
+
+    def get_many(self, identifiers, required=False, fields=None):
+        return {
+            identifier: self.get(identifier, required=required)\
+            for identifier in identifiers
+        }
+
+    def commit(self):
+        return None
+
+
+class MemoryDatabase(jsonapi.base.database.Database):
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        return None
+
+    def session(self):
+        return MemorySession(self.api, self.store)
+
+
+#: The headers of a typical browser request.
+HEADERS = {
+    "Host": "localhost:5000",
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:45.0) Firefox/45.0",
+    "Accept": "application/vnd.api+json",
+    "Content-Type": "application/vnd.api+json",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "Cache-Control": "max-age=0",
+    "Cookie": "session=0123456789abcdef0123456789abcdef",
+    "Referer": "http://localhost:5000/",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+
+def in_flight(api, uri, n):
+    """
+    Returns the number of memory blocks and the bytes, which are held by
+    each request, while it is handled.
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    handlers = list()
+    for i in range(n):
+        request = jsonapi.base.Request(uri, "GET", dict(HEADERS), b"")
+        request.api = api
+        HandlerType = api._find_handler(request)
+        handler = HandlerType(api=api, db=None, request=request)
+
+        request.accept_media_type
+        request.content_type
+        request.japi_fields
+        request.japi_include
+        request.japi_sort
+        request.japi_filters
+        handlers.append(handler)
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del handlers
+    return blocks/n, size/n
+
+
+def handled(api, uri, n):
+    """
+    Returns the time, the peak memory and the number of garbage collections
+    of the youngest generation per request.
+    """
+    def handle():
+        request = jsonapi.base.Request(uri, "GET", dict(HEADERS), b"")
+        api.handle_request(request)
+        return None
+
+    duration = min(timeit.repeat(handle, number=n, repeat=3))/n
+
+    collections = [0]
+    def on_collect(phase, info):
+        if phase == "start" and info["generation"] == 0:
+            collections[0] += 1
+        return None
+
+    gc.callbacks.append(on_collect)
+    try:
+        for i in range(n):
+            handle()
+    finally:
+        gc.callbacks.remove(on_collect)
+
+    tracemalloc.start()
+    peak = 0
+    for i in range(100):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        handle()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return duration, peak, collections[0]/n*1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    authors = [User(i) for i in range(10)]
+    posts = [Post(i, authors[i%10]) for i in range(20)]
+    store = {("User", user._id): user for user in authors}
+    store.update({("Post", post._id): post for post in posts})
+
+    api = jsonapi.base.api.API("/api", db=MemoryDatabase(store))
+    api.add_type(jsonapi.base.schema.Schema(User))
+    api.add_type(jsonapi.base.schema.Schema(Post))
+
+    for label, uri in [
+        ("collection", "http://localhost:5000/api/Post/?page[size]=5"\
+            "&page[number]=2&sort=-title&fields[Post]=title"),
+        ("resource", "http://localhost:5000/api/Post/3?include=author"),
+        ("not found", "http://localhost:5000/api/Post/999")
+        ]:
+        blocks, size = in_flight(api, uri, n)
+        duration, peak, collections = handled(api, uri, n)
+        print("{} ({} requests):".format(label, n))
+        print("\tin flight:   {:.1f} blocks, {:.0f} bytes".format(blocks, size))
+        print("\tpeak:        {} bytes".format(peak))
+        print("\tgc gen0:     {:.1f} per 1000 requests".format(collections))
+        print("\ttime:        {:.1f} us".format(duration*1e6))
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+Compares the :class:`jsonapi.base.router.Router` with the old dispatching,
+which tried the regular expressions of all endpoint types one after another
+and checked the typename afterwards.
+
+Usage:
+
+.. code-block:: bash
+
+    python3 benchmarks/router.py [number of types]
+"""
+
+# std
+import re
+import sys
+import timeit
+
+# local
+from jsonapi.base.router import Router
+
+
+def legacy_routes(base_uri):
+    """
+    The regular expressions of *build_uris()* before the router has been
+    introduced, in the order in which they were tried.
+    """
+    collection = base_uri + "/(?P<type>[A-z][A-z0-9]*)"
+    resource = collection + "/(?P<id>[A-z0-9]+)"
+    relationships = resource + "/relationships/(?P<relname>[A-z][A-z0-9]*)"
+    related = resource + "/(?P<relname>[A-z][A-z0-9]*)"
+    return [
+        (re.compile(collection + "/?"), "collection"),
+        (re.compile(related + "/?"), "related"),
+        (re.compile(resource + "/?"), "resource"),
+        (re.compile(relationships + "/?"), "relationships")
+    ]
+
+
+def legacy_match(routes, typenames, path):
+    for uri_re, endpoint in routes:
+        match = uri_re.fullmatch(path)
+        if match:
+            arguments = match.groupdict()
+            # The handler rejected unknown types in *prepare()*.
+            if not arguments["type"] in typenames:
+                return None
+            return (endpoint, arguments)
+    return None
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    typenames = {"Type{}".format(i) for i in range(n)}
+    routes = legacy_routes("/api")
+
+    router = Router("/api")
+    for typename in typenames:
+        router.add_typename(typename)
+    router.add_route("<type>", "collection")
+    router.add_route("<type>/<id>", "resource")
+    router.add_route("<type>/<id>/<relname>", "related")
+    router.add_route("<type>/<id>/relationships/<relname>", "relationships")
+
+    typename = "Type{}".format(n - 1)
+    paths = [
+        ("collection", "/api/{}".format(typename)),
+        ("resource", "/api/{}/42".format(typename)),
+        ("related", "/api/{}/42/comments".format(typename)),
+        ("relationships", "/api/{}/42/relationships/comments".format(typename)),
+        ("unknown type", "/api/Unknown/42"),
+        ("malformed", "/api/{}/42/a/b/c".format(typename))
+    ]
+
+    print("{} registered types:".format(n))
+    for label, path in paths:
+        # The measurements are interleaved, so that a slower phase of the
+        # machine affects both implementations.
+        legacy = trie = float("inf")
+        for i in range(100):
+            legacy = min(legacy, timeit.timeit(
+                lambda: legacy_match(routes, typenames, path), number=2000
+            ))
+            trie = min(trie, timeit.timeit(
+                lambda: router.match(path), number=2000
+            ))
+        print("{}:".format(label))
+        print("\tlegacy: {:.2f} us".format(legacy/2000*1e6))
+        print("\trouter: {:.2f} us".format(trie/2000*1e6))
+        print("\tspeedup: {:.2f}x".format(legacy/trie))
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Compares the precompiled serialization plans of
+:class:`jsonapi.base.serializer.Serializer` with the old implementation, which
+sorted the fields and built the *OrderedDicts* again for every resource.
+
+Usage:
+
+.. code-block:: bash
+
+    python3 benchmarks/serializer.py [number of resources]
+"""
+
+# std
+from collections import OrderedDict
+import sys
+import timeit
+
+# local
+import jsonapi
+from jsonapi.base.utilities import ensure_identifier_object
+from jsonapi.marker import property as marker
+
+
+class User(object):
+
+    def __init__(self, id):
+        self._id = str(id)
+        return None
+
+    @marker.id_attribute()
+    def id(self):
+        return self._id
+
+
+class Post(object):
+
+    def __init__(self, id, author, comments):
+        self._id = str(id)
+        self._author = author
+        self._comments = comments
+        return None
+
+    @marker.id_attribute()
+    def id(self):
+        return self._id
+
+    @marker.attribute()
+    def title(self):
+        return "Title of post " + self._id
+
+    @marker.attribute()
+    def text(self):
+        return "Lorem ipsum dolor sit amet."
+
+    @marker.attribute()
+    def views(self):
+        return 42
+
+    @marker.attribute()
+    def published(self):
+        return True
+
+    @marker.attribute()
+    def language(self):
+        return "en"
+
+    @marker.attribute()
+    def slug(self):
+        return "post-" + self._id
+
+    @marker.to_one_relationship()
+    def author(self):
+        return self._author
+
+    @marker.to_many_relationship()
+    def comments(self):
+        return self._comments
+
+
+def legacy_serialize_resource(schema, resource, fields=None):
+    """
+    The *Serializer.serialize_resource()* implementation before the
+    serialization plans have been introduced.
+    """
+    d = OrderedDict()
+    d["type"] = schema.typename
+    d["id"] = schema.id_attribute.get(resource)
+
+    attributes = OrderedDict()
+    for name in sorted(schema.attributes):
+        if fields is None or name in fields:
+            attributes[name] = schema.attributes[name].get(resource)
+    if attributes:
+        d["attributes"] = attributes
+
+    relationships = OrderedDict()
+    for name in sorted(schema.relationships):
+        if fields is None or name in fields:
+            rel = schema.relationships[name]
+            relobj = OrderedDict()
+            if rel.to_one:
+                relative = rel.get(resource)
+                relobj["data"] = ensure_identifier_object(relative)\
+                    if relative is not None else None
+            else:
+                relobj["data"] = [
+                    ensure_identifier_object(item)\
+                    for item in rel.get(resource)
+                ]
+            relationships[name] = relobj
+    if relationships:
+        d["relationships"] = relationships
+    return d
+
+
+def legacy_serialize_many(resources, fields):
+    data = list()
+    for resource in resources:
+        schema = resource._jsonapi["schema"]
+        typename = resource._jsonapi["typename"]
+        data.append(legacy_serialize_resource(
+            schema, resource, fields=fields.get(typename)
+        ))
+    return data
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    api = jsonapi.base.api.API("/api", db=jsonapi.base.database.Database())
+    api.add_type(jsonapi.base.schema.Schema(User))
+    api.add_type(jsonapi.base.schema.Schema(Post))
+
+    authors = [User(i) for i in range(10)]
+    posts = [
+        Post(i, authors[i%10], [("Comment", str(i*3 + k)) for k in range(3)])\
+        for i in range(n)
+    ]
+
+    for label, fields in [
+        ("all fields", dict()),
+        ("sparse fieldset", {"Post": ["title", "author"]})
+        ]:
+        assert legacy_serialize_many(posts, fields)\
+            == jsonapi.base.serializer.serialize_many(posts, fields)
+
+        legacy = min(timeit.repeat(
+            lambda: legacy_serialize_many(posts, fields), number=20, repeat=5
+        ))
+        planned = min(timeit.repeat(
+            lambda: jsonapi.base.serializer.serialize_many(posts, fields),
+            number=20, repeat=5
+        ))
+        print("{} ({} resources):".format(label, n))
+        print("\tlegacy:  {:.2f} ms".format(legacy/20*1000))
+        print("\tplanned: {:.2f} ms".format(planned/20*1000))
+        print("\tspeedup: {:.2f}x".format(legacy/planned))
+    return None
+
+
+if __name__ == "__main__":
+    main()
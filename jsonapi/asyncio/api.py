@@ -35,6 +35,7 @@ import logging
 
 # local
 import jsonapi
+from jsonapi.base import conditional
 from jsonapi.base import errors
 from . import handler
 from . import serializer
@@ -58,13 +59,12 @@ class API(jsonapi.base.api.API):
         We use our own *asynchronous* handlers. So we have to override this
         method.
         """
-        uris = jsonapi.base.api.build_uris(self._uri)
-        self._routes.extend([
-            (uris["collection"], handler.CollectionHandler),
-            (uris["related"], handler.RelatedHandler),
-            (uris["resource"], handler.ResourceHandler),
-            (uris["relationships"], handler.RelationshipHandler)
-        ])
+        self.router.add_route("<type>", handler.CollectionHandler)
+        self.router.add_route("<type>/<id>", handler.ResourceHandler)
+        self.router.add_route("<type>/<id>/<relname>", handler.RelatedHandler)
+        self.router.add_route(
+            "<type>/<id>/relationships/<relname>", handler.RelationshipHandler
+        )
         return None
 
     def add_type(self, schema, **kargs):
@@ -84,11 +84,23 @@ class API(jsonapi.base.api.API):
         """
         request.api = self
 
+        # A cached response is returned before a database session is opened.
+        use_cache = self.response_cache is not None and request.method == "get"
+        if use_cache:
+            generation = self.response_cache.generation
+            response = self.response_cache.get(request)
+            if response is not None:
+                conditional.evaluate(request, response)
+                return response
+
+        # The database session is closed, when the request has been handled,
+        # or, if the body is streamed, when the stream has been consumed.
+        db = None
+        close_db = True
         try:
             HandlerType = self._find_handler(request)
-            handler = HandlerType(
-                api=self, db=self._db.session(), request=request
-            )
+            db = self._db.session()
+            handler = HandlerType(api=self, db=db, request=request)
 
             yield from handler.prepare()
             yield from handler.handle()
@@ -97,11 +109,39 @@ class API(jsonapi.base.api.API):
             print("DEBUG", self.debug)
             print()
             if not self.debug:
-                return errors.error_to_response(err, self.dump_json)
+                response = errors.error_to_response(err, self.dump_json)
+
+                # The response to a HEAD request never has a body.
+                if request.method == "head":
+                    response.body = None
+                elif self.compression is not None:
+                    self.compression.compress(request, response)
+                return response
             else:
                 raise
         except Exception as err:
             LOG.critical(err, exc_info=True)
             raise
         else:
+            LOG.debug(
+                "%s %s: identity map %s", request.method, request.uri,
+                handler.db.identity_map.stats()
+            )
+            if handler.response.is_stream:
+                handler.response.body = self._close_after_stream(
+                    handler.response.body, db
+                )
+                close_db = False
+
+            # The body ETag is the hash of the encoded body, so that each
+            # content coding has its own strong ETag.
+            if self.compression is not None:
+                self.compression.compress(request, handler.response)
+            conditional.add_body_etag(request, handler.response)
+            if use_cache:
+                self.response_cache.set(request, handler.response, generation)
+            conditional.evaluate(request, handler.response)
             return handler.response
+        finally:
+            if db is not None and close_db:
+                db.close()
@@ -34,8 +34,8 @@ import asyncio
 
 # local
 import jsonapi
-from jsonapi.base import errors
-from jsonapi.base.utilities import relative_identifiers
+from jsonapi.base.database import _collect_relatives
+from jsonapi.base.utilities import build_include_tree, ensure_identifier
 
 
 __all__ = [
@@ -58,6 +58,8 @@ class Session(jsonapi.base.database.Session):
 
     *   :meth:`query`
     *   :meth:`query_size`
+    *   :meth:`query_with_size`
+    *   :meth:`estimate_size`
     *   :meth:`get`
     *   :meth:`get_many`
     *   :meth:`commit`
@@ -65,7 +67,37 @@ class Session(jsonapi.base.database.Session):
     """
 
     @asyncio.coroutine
-    def get_relatives(self, resources, paths):
+    def query_with_size(self, typename,
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None
+        ):
+        """
+        **May be overridden** for performance reasons.
+
+        Does the same as
+        :meth:`jsonapi.base.database.Session.query_with_size`, but
+        asynchronous.
+        """
+        resources = yield from self.query(
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include
+        )
+        total = yield from self.query_size(typename, filters=filters)
+        return (resources, total)
+
+    @asyncio.coroutine
+    def estimate_size(self, typename, *, filters=None):
+        """
+        **May be overridden** for performance reasons.
+
+        Does the same as :meth:`jsonapi.base.database.Session.estimate_size`,
+        but asynchronous.
+        """
+        total = yield from self.query_size(typename, filters=filters)
+        return (total, False)
+
+    @asyncio.coroutine
+    def get_relatives(self, resources, paths, fields=None):
         """
         **May be overridden** for performance reasons.
 
@@ -76,27 +108,30 @@ class Session(jsonapi.base.database.Session):
 
             Fetch the different paths in *paths* parallel.
         """
-        all_relatives = dict()
-        root_resources = resources
-
-        for path in paths:
-            resources = root_resources
-            for relname in path:
-                # Collect the ids of all related resources.
-                relids = set()
-                for resource in resources:
-                    try:
-                        tmp = relative_identifiers(relname, resource)
-                    except errors.RelationshipNotFound:
-                        raise errors.UnresolvableIncludePath(path)
-                    else:
-                        relids.update(tmp)
-
-                # Query the relatives from the database.
-                relatives = yield from self.get_many(relids, required=True)
-                all_relatives.update(relatives)
-
-                # The next relationship name in the path is defined on the
-                # previously fetched relatives.
-                resources = relatives.values()
+        # The resources in the primary data are neither fetched again nor
+        # contained in the result.
+        primary = {ensure_identifier(resource): resource for resource in resources}
+        known = dict(primary)
+
+        # We walk the include tree breadth-first and fetch all relatives in
+        # the same level with one *get_many()* call.
+        level = [(list(), build_include_tree(paths), list(resources))]
+        while level:
+            nodes, missing = _collect_relatives(level, known)
+            if missing:
+                relatives = yield from self.get_many(
+                    missing, required=True, fields=fields
+                )
+                known.update(relatives)
+
+            # Continue with the relatives of the nodes, which have children.
+            level = [
+                (path, subtree, [known[identifier] for identifier in identifiers])\
+                for path, subtree, identifiers in nodes if subtree
+            ]
+
+        all_relatives = {
+            identifier: resource for identifier, resource in known.items()\
+            if not identifier in primary
+        }
         return all_relatives
@@ -31,6 +31,7 @@ jsonapi.asyncio.handler.base
 import asyncio
 
 # local
+from jsonapi.base import conditional
 from jsonapi.base.response import Response
 from jsonapi.base.errors import MethodNotAllowed
 
@@ -44,6 +45,8 @@ class BaseHandler(object):
     :arg jsonapi.base.request.Request request:
     """
 
+    __slots__ = ("api", "request", "response", "db")
+
     def __init__(self, api, db, request):
         """
         """
@@ -76,12 +79,82 @@ class BaseHandler(object):
         else:
             raise MethodNotAllowed()
 
+    def dump(self, document):
+        """
+        Encodes the *document* with the codec for the media type, which has
+        been negotiated with the *Accept* header of the request.
+
+        :seealso: :attr:`jsonapi.base.request.Request.accept_media_type`
+        """
+        if len(self.api.media_codecs) > 1:
+            self.response.headers["vary"] = "Accept"
+        return self.api.dump_document(
+            document, self.request.accept_media_type
+        )
+
+    def dump_iter(self, document):
+        """
+        Like :meth:`dump`, but returns an iterator, which yields the encoded
+        *document* in chunks.
+        """
+        if len(self.api.media_codecs) > 1:
+            self.response.headers["vary"] = "Accept"
+        return self.api.dump_document_iter(
+            document, self.request.accept_media_type
+        )
+
+    @property
+    def load_document(self):
+        """
+        False, if the resources in the document need not to be loaded. This
+        is the case for a HEAD request, if the *ETag* is not derived from the
+        versions of the resources.
+        """
+        return self.request.method != "head" \
+            or bool(self.api.settings.get("version_etag"))
+
+    def check_not_modified(self, resources, extra=None):
+        """
+        Sets the *ETag* and *Last-Modified* headers, which are derived from
+        the versions of the *resources*, if ``settings["version_etag"]`` is
+        enabled. Returns true, if the request is conditional and the client
+        has a fresh copy of the document. The response is then
+        ``304 Not Modified`` and the document needs not to be serialized.
+
+        :arg resources:
+            The resources in the document (*data* and *included*).
+        :arg extra:
+            Something else, which is part of the document.
+
+        :seealso: :mod:`jsonapi.base.conditional`
+        """
+        if not self.api.settings.get("version_etag"):
+            return False
+
+        resources = list(resources)
+        etag = conditional.version_etag(self.request, resources, extra)
+        if etag is None:
+            return False
+
+        modified = conditional.last_modified(resources)
+        self.response.headers["etag"] = etag
+        if modified is not None:
+            self.response.headers["last-modified"] = \
+                conditional.http_date(modified)
+
+        if conditional.is_not_modified(self.request, etag, modified):
+            conditional.not_modified(self.response)
+            return True
+        return False
+
     @asyncio.coroutine
     def head(self):
         """
-        Handles a HEAD request.
+        Handles a HEAD request. It is handled like a GET request, but the
+        handlers stop before the document is built. So only the existence
+        checks and the computations needed for the headers (*ETag*) are done.
         """
-        raise MethodNotAllowed()
+        return (yield from self.get())
 
     @asyncio.coroutine
     def get(self):
@@ -30,10 +30,12 @@ jsonapi.asyncio.handler.related
 # std
 import asyncio
 from collections import OrderedDict
+import itertools
 
 # local
 from jsonapi.base import errors
-from jsonapi.base.serializer import serialize_many
+from jsonapi.base.serializer import iter_serialize_many, serialize_many
+from jsonapi.base.utilities import ensure_identifier, relatives
 from .base import BaseHandler
 
 
@@ -42,6 +44,10 @@ class RelatedHandler(BaseHandler):
     Returns the related resources for the resource.
     """
 
+    __slots__ = (
+        "typename", "relname", "real_typename", "resource_id", "resource"
+    )
+
     def __init__(self, api, db, request):
         """
         """
@@ -61,13 +67,22 @@ class RelatedHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
 
-        # Load the resource.
-        self.resource = yield from self.db.get((self.typename, self.resource_id))
+        # Load the resource. The related resources and their includes can be
+        # loaded together with it.
+        include = None
+        if self.load_document:
+            include = [[self.relname]]
+            include.extend(
+                [self.relname] + path for path in self.request.japi_include
+            )
+        self.resource = yield from self.db.get(
+            (self.typename, self.resource_id), include=include
+        )
         if self.resource is None:
             raise errors.NotFound()
 
@@ -81,29 +96,81 @@ class RelatedHandler(BaseHandler):
 
         http://jsonapi.org/format/#fetching-relationships
         """
-        resources = yield from self.db.get_relatives([self.resource], [[self.relname]])
-        resources = resources.values()
+        # A HEAD request without a version *ETag* only checks, if the
+        # relationship exists.
+        if not self.load_document:
+            schema = self.api.get_schema(self.real_typename)
+            if not self.relname in schema.relationships:
+                raise errors.NotFound()
+            self.response.headers["content-type"] = \
+                self.request.accept_media_type
+            self.response.status = 200
+            return None
+
+        # Load the related resources. *get_relatives()* is not used here,
+        # because it skips the resource itself, which may be related to
+        # itself.
+        try:
+            items = relatives(self.relname, self.resource)
+        except errors.RelationshipNotFound:
+            raise errors.NotFound()
+
+        resources = [
+            item for item in items if not isinstance(item, (tuple, dict))
+        ]
+        missing = [
+            ensure_identifier(item) for item in items\
+            if isinstance(item, (tuple, dict))
+        ]
+        if missing:
+            fetched = yield from self.db.get_many(
+                missing, required=True, fields=self.request.japi_fields
+            )
+            resources.extend(fetched.values())
 
         included_resources = yield from self.db.get_relatives(
-            resources, self.request.japi_include
+            resources, self.request.japi_include_tree,
+            fields=self.request.japi_fields
         )
 
+        # The client may still have a fresh copy of the document.
+        if self.check_not_modified(
+            itertools.chain(resources, included_resources.values())
+            ):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
         # Build the document.
-        data = serialize_many(resources, fields=self.request.japi_fields)
-        included = serialize_many(
+        # Large documents are serialized lazily and streamed to the client.
+        stream = self.api.stream_threshold is not None \
+            and len(resources) + len(included_resources) \
+                >= self.api.stream_threshold
+        serialize = iter_serialize_many if stream else serialize_many
+
+        data = serialize(resources, fields=self.request.japi_fields)
+        included = serialize(
             included_resources.values(), fields=self.request.japi_fields
         )
         meta = OrderedDict()
         links = OrderedDict()
 
         # Create the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.cache_tags = {ensure_identifier(self.resource)}
+        self.response.cache_tags.update(map(ensure_identifier, resources))
+        self.response.cache_tags.update(included_resources)
+        document = OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
             ("links", links),
             ("jsonapi", self.api.jsonapi_object)
-        ]))
+        ])
+        if stream:
+            self.response.body = self.dump_iter(document)
+        else:
+            self.response.body = self.dump(document)
         return None
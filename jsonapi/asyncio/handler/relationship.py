@@ -35,6 +35,7 @@ from collections import OrderedDict
 from jsonapi.base import errors
 from jsonapi.base import validators
 from jsonapi.base.serializer import serialize_many
+from jsonapi.base.utilities import ensure_identifier
 from .base import BaseHandler
 
 
@@ -43,6 +44,11 @@ class RelationshipHandler(BaseHandler):
     Handles the relationship endpoint.
     """
 
+    __slots__ = (
+        "typename", "relname", "real_typename", "resource_id", "resource",
+        "relationship"
+    )
+
     def __init__(self, api, db, request):
         """
         """
@@ -62,7 +68,7 @@ class RelationshipHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
@@ -103,7 +109,7 @@ class RelationshipHandler(BaseHandler):
 
         document.setdefault("jsonapi", self.api.jsonapi_object)
 
-        body = self.api.dump_json(document)
+        body = self.dump(document)
         return body
 
     @asyncio.coroutine
@@ -113,8 +119,16 @@ class RelationshipHandler(BaseHandler):
 
         http://jsonapi.org/format/#fetching-relationships
         """
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        # The linkage is part of the resource, so its version is used.
+        if self.check_not_modified([self.resource]):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
+        self.response.cache_tags = {ensure_identifier(self.resource)}
         self.response.body = self.build_body()
         return None
 
@@ -146,8 +160,8 @@ class RelationshipHandler(BaseHandler):
         yield from self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
 
@@ -173,8 +187,8 @@ class RelationshipHandler(BaseHandler):
         yield from self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
 
@@ -191,7 +205,7 @@ class RelationshipHandler(BaseHandler):
         yield from self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
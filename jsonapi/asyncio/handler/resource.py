@@ -30,11 +30,13 @@ jsonapi.asyncio.handler.resource
 # std
 import asyncio
 from collections import OrderedDict
+import itertools
 
 # local
 from jsonapi.base import errors
 from jsonapi.base import validators
 from jsonapi.base.serializer import serialize_many
+from jsonapi.base.utilities import ensure_identifier
 from .base import BaseHandler
 
 
@@ -43,6 +45,8 @@ class ResourceHandler(BaseHandler):
     Handles a resource endpoint.
     """
 
+    __slots__ = ("typename", "real_typename", "resource_id", "resource")
+
     def __init__(self, api, db, request):
         """
         """
@@ -63,13 +67,27 @@ class ResourceHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
 
-        # Load the resource
-        self.resource = yield from self.db.get((self.typename, self.resource_id))
+        # Load the resource. Only a GET request is answered with the sparse
+        # fieldset and the included resources, so we must load the complete
+        # resource otherwise. A HEAD request needs the included resources
+        # only for the *ETag*.
+        if self.request.method == "get":
+            fields = self.request.japi_fields
+            include = self.request.japi_include
+        elif self.request.method == "head":
+            fields = self.request.japi_fields
+            include = self.request.japi_include if self.load_document else None
+        else:
+            fields = None
+            include = None
+        self.resource = yield from self.db.get(
+            (self.typename, self.resource_id), fields=fields, include=include
+        )
         if self.resource is None:
             raise errors.NotFound()
 
@@ -84,10 +102,23 @@ class ResourceHandler(BaseHandler):
         http://jsonapi.org/format/#fetching-resources
         """
         # Fetch the included resources.
+        include = self.request.japi_include_tree if self.load_document \
+            else dict()
         included_resources = yield from self.db.get_relatives(
-            [self.resource], self.request.japi_include
+            [self.resource], include, fields=self.request.japi_fields
         )
 
+        # The client may still have a fresh copy of the document.
+        if self.check_not_modified(
+            itertools.chain([self.resource], included_resources.values())
+            ):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
         # Build the response document.
         serializer = self.api.get_serializer(self.real_typename)
         data = serializer.serialize_resource(
@@ -102,9 +133,9 @@ class ResourceHandler(BaseHandler):
         links = OrderedDict()
 
         # Put all together
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.cache_tags = {ensure_identifier(self.resource)}
+        self.response.cache_tags.update(included_resources)
+        self.response.body = self.dump(OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
@@ -142,9 +173,9 @@ class ResourceHandler(BaseHandler):
         links = OrderedDict()
 
         # Put all together.
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        self.response.body = self.dump(OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
@@ -162,5 +193,5 @@ class ResourceHandler(BaseHandler):
         yield from self.db.commit()
 
         # Create the response.
-        self.response.status_code = 204
+        self.response.status = 204
         return None
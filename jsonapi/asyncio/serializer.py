@@ -57,24 +57,8 @@ class Unserializer(jsonapi.base.serializer.Unserializer):
         """
         The same as the base class method, but calls the *db* async.
         """
-        # Collect the identifiers.
-        identifiers = set()
-        for relname, relobj in relationships_object.items():
-            reldata = relobj.get("data")
-
-            # *to-one* relationship (with target)
-            # -> a single resource identifier object
-            if isinstance(reldata, dict):
-                identifiers.add((reldata["type"], reldata["id"]))
-
-            # *to-many* relationship
-            # -> a list of resource identifier objects
-            elif isinstance(reldata, list):
-                identifiers.update(
-                    (item["type"], item["id"]) for item in reldata
-                )
-
         # Load the resources
+        identifiers = self._relationships_identifiers(relationships_object)
         relatives = yield from db.get_many(identifiers, required=True)
 
         # Map the relationship names back to the related resources.
@@ -141,12 +125,18 @@ class Unserializer(jsonapi.base.serializer.Unserializer):
             except errors.ErrorList as err:
                 error_list.extend(err)
 
-        # Update the relationships
+        # Update the relationships. All relatives are loaded at once.
         if "relationships" in resource_object:
             rels_object = resource_object["relationships"]
+            identifiers = self._relationships_identifiers(rels_object)
+            relatives = dict()
+            if identifiers:
+                relatives = yield from db.get_many(identifiers)
             for rel_name, rel_object in rels_object.items():
                 try:
-                    yield from self.update_relationship(db, resource, rel_name, rel_object)
+                    self._set_relationship(
+                        resource, rel_name, rel_object, relatives
+                    )
                 except errors.Error as err:
                     error_list.append(err)
                 except errors.ErrorList as err:
@@ -163,31 +153,15 @@ class Unserializer(jsonapi.base.serializer.Unserializer):
         """
         The same as the base class method, but calls the *db* async.
         """
-        relationship = self.schema.relationships[relationship_name]
-
-        # Break if no data key is given.
-        if not "data" in relationship_object:
-            return None
-
-        # Update a *to-one* relationship
-        if relationship.to_one:
-            identifier = relationship_object["data"]
-            if identifier is None:
-                relative = None
-            else:
-                identifier = (identifier["type"], identifier["id"])
-                relative = yield from db.get(identifier, required=True)
-            relationship.set(resource, relative)
-
-        # Update a *to-many* relationship
-        else:
-            identifiers = relationship_object["data"]
-            identifiers = [(item["type"], item["id"]) for item in identifiers]
-
-            relatives = yield from db.get_many(identifiers, required=True)
-            relatives = list(relatives.values())
-
-            relationship.set(resource, relatives)
+        identifiers = self._relationships_identifiers(
+            {relationship_name: relationship_object}
+        )
+        relatives = dict()
+        if identifiers:
+            relatives = yield from db.get_many(identifiers)
+        self._set_relationship(
+            resource, relationship_name, relationship_object, relatives
+        )
         return None
 
     @asyncio.coroutine
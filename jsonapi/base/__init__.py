@@ -32,11 +32,17 @@ API instance.
 
 .. automodule:: jsonapi.base.handler
 .. automodule:: jsonapi.base.api
+.. automodule:: jsonapi.base.cache
+.. automodule:: jsonapi.base.codecs
+.. automodule:: jsonapi.base.compression
+.. automodule:: jsonapi.base.conditional
 .. automodule:: jsonapi.base.database
 .. automodule:: jsonapi.base.errors
 .. automodule:: jsonapi.base.pagination
+.. automodule:: jsonapi.base.query
 .. automodule:: jsonapi.base.request
 .. automodule:: jsonapi.base.response
+.. automodule:: jsonapi.base.router
 .. automodule:: jsonapi.base.schema
 .. automodule:: jsonapi.base.serializer
 .. automodule:: jsonapi.base.utilities
@@ -46,10 +52,16 @@ API instance.
 # local
 from . import handler
 from . import api
+from . import cache
+from . import codecs
+from . import compression
+from . import conditional
 from . import database
 from . import errors
+from . import query
 from .request import Request
 from .response import Response
+from . import router
 from . import schema
 from . import serializer
 from . import utilities
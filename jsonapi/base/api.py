@@ -46,9 +46,16 @@ except ImportError:
 
 # local
 from .. import version
+from . import codecs
+from .compression import Compression
+from . import conditional
 from . import errors
+from .cache import FragmentCache, LRUCache, ReadCache, ResponseCache
 from . import handler
 from . import serializer
+from .pagination import COUNT_STRATEGIES, CountCache
+from .query import parse_query
+from .router import ID_RE, NAME_RE, Router
 
 
 __all__ = [
@@ -72,10 +79,11 @@ def build_uris(base_uri):
     """
     base_url = base_uri.rstrip("/")
 
-    collection = base_url + "/(?P<type>[A-z][A-z0-9]*)"
-    resource = collection + "/(?P<id>[A-z0-9]+)"
-    relationships = resource + "/relationships/(?P<relname>[A-z][A-z0-9]*)"
-    related = resource + "/(?P<relname>[A-z][A-z0-9]*)"
+    name = NAME_RE.pattern
+    collection = base_url + "/(?P<type>" + name + ")"
+    resource = collection + "/(?P<id>" + ID_RE.pattern + ")"
+    relationships = resource + "/relationships/(?P<relname>" + name + ")"
+    related = resource + "/(?P<relname>" + name + ")"
 
     # Make the rules insensitive against a trailing "/"
     collection = re.compile(collection + "/?")
@@ -113,7 +121,12 @@ class API(object):
         self._uri = uri.rstrip("/")
         self._parsed_uri = urllib.parse.urlparse(self.uri)
 
-        # List of tuples: `(uri_regex, handler_type)`
+        #: The :class:`~jsonapi.base.router.Router`, which finds the handler
+        #: for a request.
+        self.router = Router(self._uri)
+
+        # List of tuples: `(uri_regex, handler_type)`, which are tried, if
+        # the router has no matching route.
         self._routes = list()
         self._create_routes()
 
@@ -130,6 +143,90 @@ class API(object):
         self._serializers = dict()
         self._unserializers = dict()
 
+        #: The :class:`~jsonapi.base.codecs.Codec` used by :meth:`dump_json`
+        #: and :meth:`load_json`. It can be chosen with
+        #: ``settings["json_codec"]``.
+        self.json_codec = codecs.get_codec(self.settings.get("json_codec"))
+
+        #: Maps the supported media types to the
+        #: :class:`~jsonapi.base.codecs.Codec`, which encodes the documents
+        #: of this type. These are the :attr:`json_codec` and the binary
+        #: codecs in ``settings["binary_codecs"]`` (all available by
+        #: default).
+        #:
+        #: :seealso: :meth:`dump_document`, :meth:`load_document`
+        self.media_codecs = OrderedDict()
+        self.media_codecs[self.json_codec.media_type] = self.json_codec
+        for codec in codecs.get_binary_codecs(
+            self.settings.get("binary_codecs")
+            ):
+            self.media_codecs[codec.media_type] = codec
+
+        #: Caches the number of resources in a collection for the *cached*
+        #: count strategy. The entries expire after
+        #: ``settings["count_cache_ttl"]`` seconds.
+        #:
+        #: :seealso: :meth:`get_count_strategy`
+        self.count_cache = CountCache(
+            ttl=self.settings.get("count_cache_ttl", 60)
+        )
+
+        #: Memoizes the :class:`~jsonapi.base.query.ParsedQuery` of the
+        #: most recently used query strings or None, if it is disabled. The
+        #: size is set with ``settings["query_cache_size"]``.
+        #:
+        #: :seealso: :meth:`parse_query`
+        self.query_cache = None
+        query_cache_size = self.settings.get("query_cache_size", 512)
+        if query_cache_size:
+            self.query_cache = LRUCache(max_entries=query_cache_size)
+
+        #: The :class:`~jsonapi.base.cache.FragmentCache` for the serialized
+        #: resource objects or None, if it is disabled. It is enabled with
+        #: ``settings["fragment_cache"]``, which is either True or a
+        #: dictionary with the arguments for the cache.
+        self.fragment_cache = None
+        fragment_cache = self.settings.get("fragment_cache")
+        if fragment_cache:
+            fragment_cache = fragment_cache\
+                if isinstance(fragment_cache, dict) else dict()
+            self.fragment_cache = FragmentCache(**fragment_cache)
+
+        #: The :class:`~jsonapi.base.cache.ResponseCache` for the GET
+        #: requests or None, if it is disabled. It is enabled with
+        #: ``settings["response_cache"]``, which is either True or a
+        #: dictionary with the arguments for the cache.
+        self.response_cache = None
+        response_cache = self.settings.get("response_cache")
+        if response_cache:
+            response_cache = response_cache\
+                if isinstance(response_cache, dict) else dict()
+            self.response_cache = ResponseCache(**response_cache)
+
+        #: The :class:`~jsonapi.base.compression.Compression` of the
+        #: responses or None, if it is disabled. It is enabled with
+        #: ``settings["compression"]``, which is either True or a dictionary
+        #: with the arguments for the compression.
+        self.compression = None
+        compression = self.settings.get("compression")
+        if compression:
+            compression = compression\
+                if isinstance(compression, dict) else dict()
+            self.compression = Compression(**compression)
+
+        #: The :class:`~jsonapi.base.cache.ReadCache`, which is shared by the
+        #: database sessions of all requests, or None, if it is disabled. It
+        #: is enabled with ``settings["read_cache"]``, which is either True,
+        #: a :class:`~jsonapi.base.cache.ReadCache` or a dictionary with the
+        #: arguments for the cache.
+        self.read_cache = None
+        read_cache = self.settings.get("read_cache")
+        if isinstance(read_cache, ReadCache):
+            self.read_cache = read_cache
+        elif read_cache:
+            read_cache = read_cache if isinstance(read_cache, dict) else dict()
+            self.read_cache = ReadCache(**read_cache)
+
         # The database adapter we use to load, save and delete resources.
         self._db = db
         db.init_api(self)
@@ -165,22 +262,46 @@ class API(object):
         """
         return self._db
 
+    @property
+    def stream_threshold(self):
+        """
+        The number of resources in a document, starting from which the
+        document is encoded with :meth:`dump_json_iter` and sent in chunks to
+        the client. The value can be configured with
+        ``settings["stream_threshold"]``. If it is None, the responses are
+        never streamed.
+        """
+        return self.settings.get("stream_threshold", 1000)
+
+    @property
+    def cursor_pagination(self):
+        """
+        If true, a request with a ``page[size]``, but without a
+        ``page[number]``, gets the first page of the cursor pagination. The
+        value can be configured with ``settings["cursor_pagination"]`` and is
+        False by default. A cursor (``page[after]`` or ``page[before]``)
+        always selects the cursor pagination.
+
+        :seealso: :attr:`jsonapi.base.request.Request.japi_cursor_paginate`
+        """
+        return self.settings.get("cursor_pagination", False)
+
     def _create_routes(self):
         """
-        Builds the regular expressions, which match the different endpoint
-        types (collection, resource, related, relationships, ...) and adds
-        them to :attr:`_routes`.
+        Adds the routes for the different endpoint types (collection,
+        resource, related, relationships, ...) to the :attr:`router`.
 
         You may **override** this method, if you want to use other handlers
-        in your API.
-        """
-        uris = build_uris(self._uri)
-        self._routes.extend([
-            (uris["collection"], handler.CollectionHandler),
-            (uris["related"], handler.RelatedHandler),
-            (uris["resource"], handler.ResourceHandler),
-            (uris["relationships"], handler.RelationshipHandler)
-        ])
+        in your API. Additional routes can also be added as tuples
+        ``(uri_regex, handler_type)`` to :attr:`_routes`.
+        """
+        self.router.add_route("<type>", handler.CollectionHandler)
+        self.router.add_route("<type>/<id>", handler.ResourceHandler)
+        self.router.add_route("<type>/<id>/<relname>", handler.RelatedHandler)
+        self.router.add_route(
+            "<type>/<id>/relationships/<relname>", handler.RelationshipHandler
+        )
+        return None
 
 
     def get_resource_class(self, typename, default=ARG_DEFAULT):
@@ -275,6 +396,36 @@ class API(object):
         """
         return list(self._typenames.values())
 
+    def get_count_strategy(self, typename):
+        """
+        Returns the strategy, which is used to count the resources of the
+        type *typename*, when a collection is paginated.
+
+        The strategy can be configured per type with the
+        ``settings["count_strategies"]`` dictionary, which maps a typename to
+        a strategy. The default strategy is ``settings["count_strategy"]``
+        or *exact*, if not given.
+
+        .. code-block:: python3
+
+            api = API("/api", db, settings={
+                "count_strategy": "window",
+                "count_strategies": {"Log": "estimate", "Post": "cached"}
+            })
+
+        :arg str typename:
+        :raises ValueError:
+            If the strategy is unknown.
+
+        :seealso: :data:`jsonapi.base.pagination.COUNT_STRATEGIES`
+        """
+        strategy = self.settings.get("count_strategies", dict()).get(typename)
+        if strategy is None:
+            strategy = self.settings.get("count_strategy", "exact")
+        if not strategy in COUNT_STRATEGIES:
+            raise ValueError("Unknown count strategy '{}'.".format(strategy))
+        return strategy
+
     def has_type(self, typename):
         """
         Returns True, if the api has a type with the given name and False
@@ -287,40 +438,165 @@ class API(object):
 
     def dump_json(self, d):
         """
-        Encodes the object *d* as JSON string.
+        Encodes the object *d* as JSON document and returns it as *bytes*.
 
         This method *can be overridden* if you want to use your own json
         serializer.
 
-        The default implementation uses the :mod:`json` module of the standard
-        library and (if available) the :mod:`bson` json utils.
+        The default implementation uses the :attr:`json_codec`.
 
         :arg d:
-        :rtype: str
+        :rtype: bytes
         """
-        indent = 1 if self.debug else None
-        if bson:
-            return json.dumps(d, default=bson.json_util.default, indent=indent)
-        else:
-            return json.dumps(d, indent=indent)
+        return self.json_codec.dumps(d, indent=self.debug)
+
+    def dump_json_iter(self, d, chunk_size=65536):
+        """
+        Encodes the document *d* like :meth:`dump_json`, but yields the JSON
+        string in chunks of about *chunk_size* bytes.
+
+        The top-level members of *d* are encoded one after another and the
+        members, which are lists or iterators (e.g. *data* and *included*),
+        item by item. So if the resource objects are created lazily by a
+        generator, only one resource object and one chunk must be held in
+        memory at a time.
+
+        :arg dict d:
+        :arg int chunk_size:
+        """
+        buffer = list()
+        buffer_size = 0
+        for part in self._iter_json_parts(d):
+            buffer.append(part)
+            buffer_size += len(part)
+
+            if buffer_size >= chunk_size:
+                yield b"".join(buffer)
+                buffer = list()
+                buffer_size = 0
+
+        if buffer:
+            yield b"".join(buffer)
+        return None
+
+    def _iter_json_parts(self, d):
+        """
+        Yields the JSON encoded parts of the document *d*.
+
+        :seealso: :meth:`dump_json_iter`
+        """
+        yield b"{"
+        for i, (key, value) in enumerate(d.items()):
+            if i:
+                yield b","
+            yield self.dump_json(key) + b":"
+
+            if isinstance(value, (dict, str, bytes)) \
+                or not hasattr(value, "__iter__"):
+                yield self.dump_json(value)
+                continue
+
+            yield b"["
+            for k, item in enumerate(value):
+                if k:
+                    yield b","
+                yield self.dump_json(item)
+            yield b"]"
+        yield b"}"
+        return None
 
     def load_json(self, s):
         """
-        Decods the JSON string *s*.
+        Decods the JSON document *s*.
 
         This method *can be overridden* if you want to use your own json
         serializer.
 
-        The default implementation uses the :mod:`json` module of the standard
-        library and (if available) the :mod:`bson` json utils.
+        The default implementation uses the :attr:`json_codec`. If the
+        :mod:`bson` json utils are available and the document may contain
+        MongoDB extended JSON (``{"$oid": ...}``, ...), they are used instead.
 
-        :arg str s:
+        :arg bytes s:
+            The JSON document as *bytes* or *str*
         """
-        if bson:
+        if bson and ((b'"$' if isinstance(s, bytes) else '"$') in s):
             return json.loads(s, object_hook=bson.json_util.object_hook)
-        else:
-            return json.loads(s)
+        return self.json_codec.loads(s)
 
+    def dump_document(self, d, media_type="application/vnd.api+json"):
+        """
+        Encodes the document *d* with the codec for the *media_type* and
+        returns it as *bytes*. JSON documents are encoded with
+        :meth:`dump_json`.
+
+        :arg d:
+        :arg str media_type:
+            A media type in :attr:`media_codecs`
+        :rtype: bytes
+        """
+        codec = self.media_codecs[media_type]
+        if codec is self.json_codec:
+            return self.dump_json(d)
+        return codec.dumps(d, indent=self.debug)
+
+    def dump_document_iter(self, d, media_type="application/vnd.api+json"):
+        """
+        Encodes the document *d* like :meth:`dump_document`, but returns an
+        iterator, which yields the document in chunks of *bytes*. JSON
+        documents are encoded with :meth:`dump_json_iter`.
+
+        The binary formats need the length of an array before its items, so
+        the lazy members (e.g. *data* and *included*) are collected first
+        and the document is encoded at once.
+
+        :arg dict d:
+        :arg str media_type:
+            A media type in :attr:`media_codecs`
+        """
+        codec = self.media_codecs[media_type]
+        if codec is self.json_codec:
+            return self.dump_json_iter(d)
+
+        d = OrderedDict(
+            (key, value) if isinstance(value, (dict, list, str, bytes)) \
+                or not hasattr(value, "__iter__") else (key, list(value))\
+            for key, value in d.items()
+        )
+        return iter([codec.dumps(d, indent=self.debug)])
+
+    def load_document(self, s, media_type="application/vnd.api+json"):
+        """
+        Decodes the document *s* with the codec for the *media_type*. JSON
+        documents and documents of an unknown media type are decoded with
+        :meth:`load_json`.
+
+        :arg bytes s:
+        :arg str media_type:
+
+        :raises ValueError:
+            If *s* is not a valid document.
+        """
+        codec = self.media_codecs.get(media_type)
+        if codec is None or codec is self.json_codec:
+            return self.load_json(s)
+        return codec.loads(s)
+
+    def parse_query(self, query):
+        """
+        Returns the :class:`~jsonapi.base.query.ParsedQuery` of the query
+        string *query*. The filter values are decoded with :meth:`load_json`.
+        The result is memoized in the :attr:`query_cache`.
+
+        :arg str query:
+        """
+        if self.query_cache is None:
+            return parse_query(query, self.load_json)
+
+        parsed_query = self.query_cache.get(query)
+        if parsed_query is None:
+            parsed_query = parse_query(query, self.load_json)
+            self.query_cache.set(query, parsed_query)
+        return parsed_query
 
     @property
     def uri(self):
@@ -399,6 +675,10 @@ class API(object):
         self._resource_classes[schema.typename] = resource_class
         self._serializers[schema.typename] = serializer_
         self._unserializers[schema.typename] = unserializer
+        self.router.add_typename(schema.typename)
+
+        if self.fragment_cache is not None:
+            serializer_.fragment_cache = self.fragment_cache
 
         # Add some new keys to the _jsonapi attribute of the resource class.
         resource_class._jsonapi = getattr(resource_class, "_jsonapi", dict())
@@ -424,6 +704,12 @@ class API(object):
         :raises jsonapi.base.errors.NotFound:
             If the :attr:`request.uri` is not a valid API endpoint.
         """
+        route = self.router.match(request.parsed_uri.path)
+        if route is not None:
+            HandlerType, arguments = route
+            request.japi_uri_arguments.update(arguments)
+            return HandlerType
+
         for uri_re, HandlerType in self._routes:
             match = uri_re.fullmatch(request.parsed_uri.path)
             if match:
@@ -431,6 +717,18 @@ class API(object):
                 return HandlerType
         raise errors.NotFound()
 
+    @staticmethod
+    def _close_after_stream(chunks, db):
+        """
+        Yields the *chunks* of a streamed body and closes the database
+        session *db* afterwards, also if the client disconnects.
+        """
+        try:
+            yield from chunks
+        finally:
+            db.close()
+        return None
+
     def handle_request(self, request):
         """
         Handles the *request* and returns a :class:`Response`.
@@ -441,22 +739,62 @@ class API(object):
         assert request.api is None or request.api is self
         request.api = self
 
+        # A cached response is returned before a database session is opened.
+        use_cache = self.response_cache is not None and request.method == "get"
+        if use_cache:
+            generation = self.response_cache.generation
+            response = self.response_cache.get(request)
+            if response is not None:
+                conditional.evaluate(request, response)
+                return response
+
+        # The database session is closed, when the request has been handled,
+        # or, if the body is streamed, when the stream has been consumed.
+        db = None
+        close_db = True
         try:
             HandlerType = self._find_handler(request)
-            handler = HandlerType(
-                api=self, db=self._db.session(), request=request
-            )
+            db = self._db.session()
+            handler = HandlerType(api=self, db=db, request=request)
 
             handler.prepare()
             handler.handle()
         except (errors.Error, errors.ErrorList) as err:
             LOG.debug(err, exc_info=False)
             if not self.debug:
-                return errors.error_to_response(err, self.dump_json)
+                response = errors.error_to_response(err, self.dump_json)
+
+                # The response to a HEAD request never has a body.
+                if request.method == "head":
+                    response.body = None
+                elif self.compression is not None:
+                    self.compression.compress(request, response)
+                return response
             else:
                 raise
         except Exception as err:
             LOG.critical(err, exc_info=True)
             raise
         else:
+            LOG.debug(
+                "%s %s: identity map %s", request.method, request.uri,
+                handler.db.identity_map.stats()
+            )
+            if handler.response.is_stream:
+                handler.response.body = self._close_after_stream(
+                    handler.response.body, db
+                )
+                close_db = False
+
+            # The body ETag is the hash of the encoded body, so that each
+            # content coding has its own strong ETag.
+            if self.compression is not None:
+                self.compression.compress(request, handler.response)
+            conditional.add_body_etag(request, handler.response)
+            if use_cache:
+                self.response_cache.set(request, handler.response, generation)
+            conditional.evaluate(request, handler.response)
             return handler.response
+        finally:
+            if db is not None and close_db:
+                db.close()
@@ -0,0 +1,839 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.cache
+==================
+
+This module contains the caches used by the API:
+
+*   :class:`LRUCache` is a thread safe *least recently used* cache, which is
+    bounded by the number of entries and their (estimated) size in bytes.
+*   :class:`FragmentCache` caches the serialized resource objects
+    (fragments), so that hot resources are not serialized again for every
+    request.
+*   :class:`ResponseCache` caches whole GET responses, which are tagged
+    with the types and resources they contain.
+*   :class:`ReadCache` is the second level cache below
+    :meth:`jsonapi.base.database.Session.get` and
+    :meth:`~jsonapi.base.database.Session.get_many`, which is shared by all
+    requests. The entries are stored in a :class:`CacheBackend`.
+"""
+
+# std
+from collections import OrderedDict
+import pickle
+import sys
+import threading
+import time
+import urllib.parse
+
+# third party
+try:
+    import pymemcache.client.base
+except ImportError:
+    pymemcache = None
+
+# local
+from .response import Response
+
+
+__all__ = [
+    "estimate_size",
+    "LRUCache",
+    "FragmentCache",
+    "ResponseCache",
+    "CacheBackend",
+    "MemoryBackend",
+    "MemcachedBackend",
+    "ReadCache"
+]
+
+
+def estimate_size(o):
+    """
+    Returns a rough estimate of the memory used by *o* in bytes. Only the
+    builtin containers (dict, list, tuple) are traversed.
+
+    :arg o:
+    """
+    size = sys.getsizeof(o)
+    if isinstance(o, dict):
+        for key, value in o.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(o, (list, tuple)):
+        for item in o:
+            size += estimate_size(item)
+    return size
+
+
+class LRUCache(object):
+    """
+    A thread safe *least recently used* cache. If the cache is full, the
+    least recently used entries are evicted.
+
+    :arg int max_entries:
+        The maximum number of entries or None, if the number is not bounded.
+    :arg int max_bytes:
+        The maximum size of all entries in bytes or None, if the size is not
+        bounded.
+    :arg sizeof:
+        A function, which returns the size of a value in bytes. The default
+        is :func:`estimate_size`. It is only called, if *max_bytes* is set.
+    :arg on_evict:
+        A function, which is called with the key of each entry, which is
+        evicted or deleted.
+    :arg float ttl:
+        The default lifetime of an entry in seconds or None, if the entries
+        do not expire.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None,
+        on_evict=None, ttl=None
+        ):
+        """
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or estimate_size
+        self.on_evict = on_evict
+        self.ttl = ttl
+
+        #: The lock, which guards the cache. You can acquire it, if you
+        #: need to execute several operations atomically.
+        self.lock = threading.RLock()
+
+        # Maps the key to a tuple ``(value, size, expires)``. The least
+        # recently used entry is the first one.
+        self._entries = OrderedDict()
+
+        #: The size of all entries in bytes (only tracked, if *max_bytes*
+        #: is set).
+        self.bytes = 0
+
+        #: The number of cache hits.
+        self.hits = 0
+
+        #: The number of cache misses.
+        self.misses = 0
+
+        #: The number of evicted entries.
+        self.evictions = 0
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        Returns the value for the *key* or *default*, if the key is not in
+        the cache.
+
+        :arg key:
+        :arg default:
+        """
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None \
+                and entry[2] <= time.monotonic():
+                self.delete(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, size=None, ttl=None):
+        """
+        Adds the *value* with the *key* to the cache. If necessairy, the
+        least recently used entries are evicted.
+
+        :arg key:
+        :arg value:
+        :arg int size:
+            The size of *value* in bytes. If not given and the cache is
+            bounded by the size, :attr:`sizeof` is used to estimate it.
+        :arg float ttl:
+            The lifetime of the entry in seconds. If not given, :attr:`ttl`
+            is used.
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        if self.max_bytes is None:
+            size = 0
+        elif size is None:
+            size = self.sizeof(value)
+
+        # The value would evict the whole cache.
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.delete(key)
+            return None
+
+        with self.lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.bytes -= old_entry[1]
+
+            self._entries[key] = (value, size, expires)
+            self.bytes += size
+            self._evict()
+        return None
+
+    def _evict(self):
+        """
+        Removes the least recently used entries, until the cache is within
+        its bounds again.
+        """
+        while self._entries and (
+            (self.max_entries is not None \
+                and len(self._entries) > self.max_entries) \
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+            key, (value, size, expires) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(key)
+        return None
+
+    def delete(self, key):
+        """
+        Removes the entry with the *key* from the cache, if it exists.
+
+        :arg key:
+        """
+        with self.lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+                if self.on_evict is not None:
+                    self.on_evict(key)
+        return None
+
+    def clear(self):
+        """
+        Removes all entries from the cache. The counters are not reset.
+        """
+        with self.lock:
+            keys = list(self._entries) if self.on_evict is not None else ()
+            self._entries.clear()
+            self.bytes = 0
+            for key in keys:
+                self.on_evict(key)
+        return None
+
+    def stats(self):
+        """
+        Returns a dictionary with the counters and the current size of the
+        cache.
+        """
+        with self.lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class FragmentCache(object):
+    """
+    Caches the serialized resource objects (fragments). The entries are
+    keyed by the typename, the id, the sparse fieldset and the version of
+    the resource (see :attr:`jsonapi.base.schema.Schema.version_attribute`).
+
+    The database sessions invalidate all entries of a resource, when it is
+    saved or deleted (see
+    :meth:`jsonapi.base.database.Session.invalidate_caches`).
+
+    The cache is enabled with the ``settings["fragment_cache"]`` option
+    of the API:
+
+    .. code-block:: python3
+
+        api = API("/api", db, settings={
+            "fragment_cache": {"max_entries": 10000, "max_bytes": 2**26}
+        })
+        ...
+        api.fragment_cache.stats()
+
+    :arg int max_entries:
+    :arg int max_bytes:
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64*2**20):
+        """
+        """
+        self._lru = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes,
+            on_evict=self._forget
+        )
+
+        # Maps the identifier of a resource to the keys of its entries.
+        self._index = dict()
+        return None
+
+    def __len__(self):
+        return len(self._lru)
+
+    def _forget(self, key):
+        """
+        Removes the *key* of an evicted entry from the index.
+        """
+        identifier = key[:2]
+        keys = self._index.get(identifier)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._index[identifier]
+        return None
+
+    def get(self, typename, resource_id, fields, version):
+        """
+        Returns the cached resource object or None.
+
+        :arg str typename:
+        :arg str resource_id:
+        :arg frozenset fields:
+            The sparse fieldset or None
+        :arg version:
+            The version of the resource or None
+        """
+        return self._lru.get((typename, resource_id, fields, version))
+
+    def set(self, typename, resource_id, fields, version, fragment):
+        """
+        Caches the resource object *fragment*.
+
+        :arg str typename:
+        :arg str resource_id:
+        :arg frozenset fields:
+        :arg version:
+        :arg dict fragment:
+        """
+        key = (typename, resource_id, fields, version)
+        with self._lru.lock:
+            self._lru.set(key, fragment)
+            if key in self._lru:
+                self._index.setdefault(key[:2], set()).add(key)
+        return None
+
+    def invalidate(self, identifiers):
+        """
+        Removes all entries of the resources with the *identifiers*.
+
+        :arg identifiers:
+            An iterable of identifier tuples ``(typename, id)``
+        """
+        with self._lru.lock:
+            for identifier in identifiers:
+                for key in list(self._index.get(identifier, ())):
+                    self._lru.delete(key)
+        return None
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        self._lru.clear()
+        return None
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of entries, their size in bytes
+        and the hit, miss and eviction counters.
+
+        :seealso: :meth:`LRUCache.stats`
+        """
+        return self._lru.stats()
+
+
+class ResponseCache(object):
+    """
+    Caches the responses of GET requests. The entries are keyed by the
+    normalized request URI (the path and the sorted query parameters) and
+    the request headers in :attr:`vary`.
+
+    Each entry is tagged with the typename of a collection and the
+    identifiers of all resources in *data* and *included* (see
+    :attr:`jsonapi.base.response.Response.cache_tags`). When a resource is
+    saved or deleted, the database session evicts all entries tagged with
+    its typename, its identifier and the identifiers of its relatives (see
+    :meth:`jsonapi.base.database.Session.invalidate_caches`).
+
+    Streamed responses are not cached. The *Accept-Encoding* header is part
+    of the key, so a compressed response is cached as it has been sent and
+    it is not compressed again (see :mod:`jsonapi.base.compression`).
+    The *Authorization* and *Cookie* headers are part of the key too, so a
+    response built for one client is never sent to another one.
+
+    A response may be built from data, which is changed by a concurrent
+    request before the response is cached. So every invalidation increments
+    the :attr:`generation` and a response is only cached, if the generation
+    has not changed since the lookup (see :meth:`set`). The entries expire
+    after *ttl* seconds anyway.
+
+    The cache is enabled with the ``settings["response_cache"]`` option of
+    the API:
+
+    .. code-block:: python3
+
+        api = API("/api", db, settings={
+            "response_cache": {"max_entries": 1000, "ttl": 60}
+        })
+
+    :arg int max_entries:
+    :arg int max_bytes:
+    :arg float ttl:
+        The lifetime of an entry in seconds or None.
+    :arg vary:
+        The names of the request headers, which are part of the key.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=64*2**20, ttl=300,
+        vary=("accept", "accept-encoding", "content-type", "authorization",
+            "cookie")
+        ):
+        """
+        """
+        self.vary = tuple(header.lower() for header in vary)
+        self._lru = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes, ttl=ttl,
+            sizeof=lambda entry: len(entry[2]), on_evict=self._forget
+        )
+
+        # Maps a tag to the keys of the entries, which are tagged with it.
+        self._tags = dict()
+
+        # Maps the key of an entry to its tags.
+        self._entry_tags = dict()
+
+        #: The number of invalidations.
+        self.generation = 0
+        return None
+
+    def __len__(self):
+        return len(self._lru)
+
+    def _forget(self, key):
+        """
+        Removes the *key* of an evicted entry from the tag index.
+        """
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return None
+
+    def key(self, request):
+        """
+        Returns the key of the *request*.
+
+        :arg jsonapi.base.request.Request request:
+        """
+        query = urllib.parse.parse_qsl(
+            request.parsed_uri.query, keep_blank_values=True
+        )
+        return (
+            request.parsed_uri.path,
+            urllib.parse.urlencode(sorted(query)),
+            tuple(request.headers.get(header) for header in self.vary)
+        )
+
+    def get(self, request):
+        """
+        Returns a new :class:`~jsonapi.base.response.Response` with the
+        cached response for the *request* or None.
+
+        :arg jsonapi.base.request.Request request:
+        """
+        entry = self._lru.get(self.key(request))
+        if entry is None:
+            return None
+
+        status, headers, body = entry
+        return Response(status=status, headers=dict(headers), body=body)
+
+    def set(self, request, response, generation=None):
+        """
+        Caches the *response* for the *request*, if it is tagged and not
+        streamed.
+
+        :arg jsonapi.base.request.Request request:
+        :arg jsonapi.base.response.Response response:
+        :arg int generation:
+            The :attr:`generation` at the time of the lookup. If entries
+            have been invalidated since then, the response may be stale and
+            it is not cached.
+        """
+        if response.cache_tags is None or response.status != 200 \
+            or not response.has_body or response.is_stream:
+            return None
+
+        key = self.key(request)
+        with self._lru.lock:
+            if generation is not None and generation != self.generation:
+                return None
+
+            self._forget(key)
+            self._lru.set(
+                key, (response.status, dict(response.headers), response.body)
+            )
+            if key in self._lru:
+                tags = frozenset(response.cache_tags)
+                self._entry_tags[key] = tags
+                for tag in tags:
+                    self._tags.setdefault(tag, set()).add(key)
+        return None
+
+    def invalidate(self, tags):
+        """
+        Removes all entries, which are tagged with one of the *tags*.
+
+        :arg tags:
+            An iterable of typenames and identifier tuples
+        """
+        with self._lru.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._lru.delete(key)
+        return None
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        self._lru.clear()
+        return None
+
+    def stats(self):
+        """
+        :seealso: :meth:`LRUCache.stats`
+        """
+        return self._lru.stats()
+
+
+class CacheBackend(object):
+    """
+    The interface for the storage of a :class:`ReadCache`. The keys are
+    strings and the values *bytes*.
+    """
+
+    def get_many(self, keys):
+        """
+        **Must be overridden**
+
+        Returns a dictionary, which maps the *keys*, which are in the cache,
+        to their values.
+
+        :arg list keys:
+        """
+        raise NotImplementedError()
+
+    def set_many(self, mapping, ttl=None):
+        """
+        **Must be overridden**
+
+        Stores all key value pairs in *mapping*.
+
+        :arg dict mapping:
+        :arg int ttl:
+            The lifetime of the entries in seconds or None.
+        """
+        raise NotImplementedError()
+
+    def delete_many(self, keys):
+        """
+        **Must be overridden**
+
+        Removes the entries with the *keys*.
+
+        :arg list keys:
+        """
+        raise NotImplementedError()
+
+    def clear(self):
+        """
+        **Must be overridden**
+
+        Removes all entries.
+        """
+        raise NotImplementedError()
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Stores the entries in an in-process :class:`LRUCache`.
+
+    :arg int max_entries:
+    :arg int max_bytes:
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64*2**20):
+        """
+        """
+        self.lru = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes, sizeof=len
+        )
+        return None
+
+    def get_many(self, keys):
+        """
+        """
+        result = dict()
+        for key in keys:
+            value = self.lru.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set_many(self, mapping, ttl=None):
+        """
+        """
+        for key, value in mapping.items():
+            self.lru.set(key, value, ttl=ttl)
+        return None
+
+    def delete_many(self, keys):
+        """
+        """
+        for key in keys:
+            self.lru.delete(key)
+        return None
+
+    def clear(self):
+        """
+        """
+        self.lru.clear()
+        return None
+
+
+class MemcachedBackend(CacheBackend):
+    """
+    Stores the entries in a memcached server.
+
+    :arg client:
+        A memcached client with the *get_many()*, *set_many()*,
+        *delete_many()* and *flush_all()* methods of
+        :class:`pymemcache.client.base.Client`. Any object with this
+        interface (e.g. a local stand-in for the tests) can be used.
+    :arg server:
+        If no *client* is given, a *pymemcache* client for this
+        ``(host, port)`` tuple is created.
+    """
+
+    def __init__(self, client=None, server=("localhost", 11211)):
+        """
+        """
+        if client is None:
+            if pymemcache is None:
+                raise RuntimeError(
+                    "The memcached backend requires *pymemcache*."
+                )
+            client = pymemcache.client.base.Client(server)
+        self.client = client
+        return None
+
+    def get_many(self, keys):
+        """
+        """
+        return self.client.get_many(keys) if keys else dict()
+
+    def set_many(self, mapping, ttl=None):
+        """
+        """
+        if mapping:
+            self.client.set_many(mapping, expire=int(ttl or 0))
+        return None
+
+    def delete_many(self, keys):
+        """
+        """
+        if keys:
+            self.client.delete_many(keys)
+        return None
+
+    def clear(self):
+        """
+        """
+        self.client.flush_all()
+        return None
+
+
+class ReadCache(object):
+    """
+    A read-through cache for the resources loaded by
+    :meth:`jsonapi.base.database.Session.get` and
+    :meth:`~jsonapi.base.database.Session.get_many`, which is shared by all
+    requests.
+
+    The cache stores the state of a resource, which is returned by
+    :meth:`~jsonapi.base.database.Session.dump_resource`, and the session
+    rebuilds the resource with
+    :meth:`~jsonapi.base.database.Session.load_resource`. The entries are
+    invalidated, when a saved or deleted resource is committed.
+
+    The cache is enabled with the ``settings["read_cache"]`` option of the
+    API:
+
+    .. code-block:: python3
+
+        api = API("/api", db, settings={
+            "read_cache": {
+                "backend": MemcachedBackend(server=("localhost", 11211)),
+                "ttl": 300,
+                "exclude": ["Session"]
+            }
+        })
+
+    :arg CacheBackend backend:
+        The storage. If None, a :class:`MemoryBackend` is used.
+    :arg int ttl:
+        The lifetime of an entry in seconds or None.
+    :arg typenames:
+        The names of the types, which are cached or None, if all types
+        should be cached.
+    :arg exclude:
+        The names of the (volatile) types, which are not cached.
+    :arg str prefix:
+        The prefix of all keys in the backend.
+    """
+
+    def __init__(self, backend=None, ttl=300, typenames=None, exclude=(),
+        prefix="jsonapi"
+        ):
+        """
+        """
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.typenames = frozenset(typenames) if typenames is not None \
+            else None
+        self.exclude = frozenset(exclude)
+        self.prefix = prefix
+
+        #: The number of resources found in the cache.
+        self.hits = 0
+
+        #: The number of resources, which were not in the cache.
+        self.misses = 0
+        return None
+
+    def enabled(self, typename):
+        """
+        Returns True, if resources of the type *typename* are cached.
+
+        :arg str typename:
+        """
+        if typename in self.exclude:
+            return False
+        return self.typenames is None or typename in self.typenames
+
+    def key(self, identifier):
+        """
+        Returns the key of the resource with the *identifier* in the
+        backend.
+
+        :arg tuple identifier:
+        """
+        return "{}:{}:{}".format(
+            self.prefix,
+            urllib.parse.quote(identifier[0], safe=""),
+            urllib.parse.quote(str(identifier[1]), safe="")
+        )
+
+    def get_many(self, identifiers):
+        """
+        Returns a dictionary, which maps the *identifiers* of the cached
+        resources to their state.
+
+        :arg list identifiers:
+        """
+        identifiers = [
+            identifier for identifier in identifiers\
+            if self.enabled(identifier[0])
+        ]
+        if not identifiers:
+            return dict()
+
+        keys = {self.key(identifier): identifier for identifier in identifiers}
+        values = self.backend.get_many(list(keys))
+
+        self.hits += len(values)
+        self.misses += len(identifiers) - len(values)
+        return {
+            keys[key]: pickle.loads(value) for key, value in values.items()
+        }
+
+    def set_many(self, states):
+        """
+        Stores the states of the resources.
+
+        :arg dict states:
+            Maps the identifier of a resource to its state
+        """
+        mapping = {
+            self.key(identifier): pickle.dumps(state, pickle.HIGHEST_PROTOCOL)\
+            for identifier, state in states.items()\
+            if self.enabled(identifier[0])
+        }
+        self.backend.set_many(mapping, ttl=self.ttl)
+        return None
+
+    def invalidate(self, identifiers):
+        """
+        Removes the resources with the *identifiers* from the cache.
+
+        :arg identifiers:
+        """
+        keys = [
+            self.key(identifier) for identifier in identifiers\
+            if self.enabled(identifier[0])
+        ]
+        self.backend.delete_many(keys)
+        return None
+
+    def clear(self):
+        """
+        Removes all entries from the backend.
+        """
+        self.backend.clear()
+        return None
+
+    def stats(self):
+        """
+        Returns a dictionary with the hit and miss counters.
+        """
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.codecs
+===================
+
+The JSON codecs used by :meth:`jsonapi.base.api.API.dump_json` and
+:meth:`~jsonapi.base.api.API.load_json`. A codec encodes to and decodes from
+*bytes*, so the documents never take a detour over *str*.
+
+The fastest available backend is chosen automatically (*orjson*, *ujson* and
+finally the :mod:`json` module of the standard library). You can select a
+codec with the ``settings["json_codec"]`` option of the API:
+
+.. code-block:: python3
+
+    api = API("/api", db, settings={"json_codec": "json"})
+
+Types, which are not supported by the backend, are converted by the
+*encoders*, which are looked up by the type of the object. The encoders
+are only called for these objects, so the common case is not slowed down:
+
+.. code-block:: python3
+
+    api.json_codec.register_encoder(Money, lambda o: str(o.amount))
+
+The *binary codecs* encode the same documents for another media type, e.g.
+``application/vnd.api+msgpack`` (*msgpack*) or ``application/vnd.api+cbor``
+(*cbor2*). They are selected with the *Accept* and *Content-Type* headers
+of a request. All available binary codecs are enabled by default. This can
+be changed with ``settings["binary_codecs"]``, a list with the names or
+instances of the codecs:
+
+.. code-block:: python3
+
+    api = API("/api", db, settings={"binary_codecs": ["msgpack"]})
+"""
+
+# std
+import datetime
+import decimal
+import json
+import uuid
+
+# third party
+try:
+    import bson
+    import bson.json_util
+except ImportError:
+    bson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+__all__ = [
+    "default_encoders",
+    "Codec",
+    "StdlibCodec",
+    "UJSONCodec",
+    "ORJSONCodec",
+    "MsgPackCodec",
+    "CBORCodec",
+    "CODECS",
+    "BINARY_CODECS",
+    "get_codec",
+    "get_binary_codecs"
+]
+
+
+def _isoformat(o):
+    return o.isoformat()
+
+
+def default_encoders():
+    """
+    Returns a dictionary, which maps a type to the function, which converts
+    objects of this type into a JSON serializable object:
+
+    *   :class:`datetime.datetime`, :class:`datetime.date`,
+        :class:`datetime.time`: ISO 8601 string
+    *   :class:`decimal.Decimal`, :class:`uuid.UUID`: string
+    *   :class:`bson.ObjectId`: MongoDB extended JSON (``{"$oid": ...}``),
+        if *bson* is installed.
+    """
+    encoders = {
+        datetime.datetime: _isoformat,
+        datetime.date: _isoformat,
+        datetime.time: _isoformat,
+        decimal.Decimal: str,
+        uuid.UUID: str
+    }
+    if bson:
+        encoders[bson.ObjectId] = bson.json_util.default
+    return encoders
+
+
+class Codec(object):
+    """
+    The interface for a JSON codec.
+
+    :arg dict encoders:
+        Maps a type to a function, which converts objects of this type into
+        a JSON serializable object. If None, :func:`default_encoders` is
+        used.
+    """
+
+    #: The name of the codec, which can be used in the
+    #: ``settings["json_codec"]`` option.
+    name = None
+
+    #: The media type of the encoded documents.
+    media_type = "application/vnd.api+json"
+
+    def __init__(self, encoders=None):
+        """
+        """
+        self.encoders = encoders if encoders is not None \
+            else default_encoders()
+        return None
+
+    def register_encoder(self, type_, encoder):
+        """
+        Registers the function *encoder*, which converts objects of type
+        *type_* into a JSON serializable object.
+
+        :arg type type_:
+        :arg encoder:
+        """
+        self.encoders[type_] = encoder
+        return None
+
+    def default(self, o):
+        """
+        Converts the object *o*, which is not supported by the backend, with
+        the encoder registered for its type (or one of its base classes).
+
+        :raises TypeError:
+            If no encoder has been registered for the type of *o*.
+        """
+        for type_ in type(o).__mro__:
+            encoder = self.encoders.get(type_)
+            if encoder is not None:
+                return encoder(o)
+        raise TypeError(
+            "Object of type '{}' is not JSON serializable."\
+            .format(type(o).__name__)
+        )
+
+    def dumps(self, o, indent=False):
+        """
+        **Must be overridden**
+
+        Encodes *o* and returns the JSON document as *bytes*.
+
+        :arg o:
+        :arg bool indent:
+            If true, the output is indented (used in the debug mode).
+        """
+        raise NotImplementedError()
+
+    def loads(self, data):
+        """
+        **Must be overridden**
+
+        Decodes the JSON document *data*.
+
+        :arg bytes data:
+            The JSON document as *bytes* or *str*.
+        :raises ValueError:
+            If *data* is not a valid JSON document.
+        """
+        raise NotImplementedError()
+
+
+class StdlibCodec(Codec):
+    """
+    Uses the :mod:`json` module of the standard library.
+    """
+
+    name = "json"
+
+    def dumps(self, o, indent=False):
+        """
+        """
+        s = json.dumps(
+            o, default=self.default, ensure_ascii=False,
+            indent=1 if indent else None,
+            separators=None if indent else (",", ":")
+        )
+        return s.encode("utf-8")
+
+    def loads(self, data):
+        """
+        """
+        return json.loads(data)
+
+
+class UJSONCodec(Codec):
+    """
+    Uses *ujson*.
+    """
+
+    name = "ujson"
+
+    def dumps(self, o, indent=False):
+        """
+        """
+        s = ujson.dumps(
+            o, default=self.default, ensure_ascii=False,
+            indent=1 if indent else 0
+        )
+        return s.encode("utf-8")
+
+    def loads(self, data):
+        """
+        """
+        return ujson.loads(data)
+
+
+class ORJSONCodec(Codec):
+    """
+    Uses *orjson*, which encodes :class:`datetime.datetime`,
+    :class:`uuid.UUID`, ... natively, so their encoders are only used by
+    the other codecs.
+    """
+
+    name = "orjson"
+
+    def dumps(self, o, indent=False):
+        """
+        """
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(o, default=self.default, option=option)
+
+    def loads(self, data):
+        """
+        """
+        return orjson.loads(data)
+
+
+class MsgPackCodec(Codec):
+    """
+    Encodes the documents with *MessagePack*.
+    """
+
+    name = "msgpack"
+    media_type = "application/vnd.api+msgpack"
+
+    def dumps(self, o, indent=False):
+        """
+        """
+        return msgpack.packb(o, default=self.default, use_bin_type=True)
+
+    def loads(self, data):
+        """
+        """
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as err:
+            raise ValueError(str(err))
+
+
+class CBORCodec(Codec):
+    """
+    Encodes the documents with *CBOR* (RFC 7049).
+    """
+
+    name = "cbor"
+    media_type = "application/vnd.api+cbor"
+
+    def _cbor_default(self, encoder, o):
+        """
+        The *default* hook of *cbor2*.
+        """
+        encoder.encode(self.default(o))
+        return None
+
+    def dumps(self, o, indent=False):
+        """
+        """
+        return cbor2.dumps(o, default=self._cbor_default)
+
+    def loads(self, data):
+        """
+        """
+        try:
+            return cbor2.loads(data)
+        except Exception as err:
+            raise ValueError(str(err))
+
+
+#: Maps the name of a codec to the codec class. The codecs are ordered by
+#: their preference, if they are available.
+CODECS = dict()
+if orjson:
+    CODECS[ORJSONCodec.name] = ORJSONCodec
+if ujson:
+    CODECS[UJSONCodec.name] = UJSONCodec
+CODECS[StdlibCodec.name] = StdlibCodec
+
+#: Maps the name of an available binary codec to the codec class.
+BINARY_CODECS = dict()
+if msgpack:
+    BINARY_CODECS[MsgPackCodec.name] = MsgPackCodec
+if cbor2:
+    BINARY_CODECS[CBORCodec.name] = CBORCodec
+
+
+def get_codec(codec=None):
+    """
+    Returns a new instance of the codec *codec*.
+
+    :arg codec:
+        The name of a codec in :data:`CODECS`, a :class:`Codec` instance,
+        which is returned unchanged, or None. If None, the fastest available
+        codec is returned.
+
+    :raises ValueError:
+        If the codec is not available.
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec is None:
+        codec = next(iter(CODECS))
+    if not codec in CODECS:
+        raise ValueError("The JSON codec '{}' is not available.".format(codec))
+    return CODECS[codec]()
+
+
+def get_binary_codecs(codecs=None):
+    """
+    Returns a list with new instances of the binary codecs *codecs*.
+
+    :arg codecs:
+        A list with the names of codecs in :data:`BINARY_CODECS` or
+        :class:`Codec` instances, which are returned unchanged. If None,
+        all available binary codecs are returned.
+
+    :raises ValueError:
+        If a codec is not available.
+    """
+    if codecs is None:
+        codecs = list(BINARY_CODECS)
+
+    result = list()
+    for codec in codecs:
+        if isinstance(codec, Codec):
+            result.append(codec)
+        elif codec in BINARY_CODECS:
+            result.append(BINARY_CODECS[codec]())
+        else:
+            raise ValueError(
+                "The binary codec '{}' is not available.".format(codec)
+            )
+    return result
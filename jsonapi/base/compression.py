@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.compression
+========================
+
+Negotiates the content coding of the responses with the *Accept-Encoding*
+header of the request. The compression is enabled with the
+``settings["compression"]`` option of the API, which is either True or a
+dictionary with the arguments for :class:`Compression`:
+
+.. code-block:: python3
+
+    api = API("/api", db, settings={
+        "compression": {"min_size": 1024, "level": 6}
+    })
+
+Responses smaller than *min_size* are sent uncompressed, because the
+compression would not pay off. A streamed body is always compressed.
+"""
+
+# local
+from . import conditional
+
+
+__all__ = [
+    "parse_accept_encoding",
+    "Compression"
+]
+
+
+def parse_accept_encoding(value):
+    """
+    Returns a dictionary, which maps the content codings in the
+    *Accept-Encoding* header *value* to their quality value.
+
+    .. code-block:: python3
+
+        >>> parse_accept_encoding("gzip;q=0.8, deflate, *;q=0")
+        {"gzip": 0.8, "deflate": 1.0, "*": 0.0}
+
+    :arg str value:
+    """
+    codings = dict()
+    for item in value.split(","):
+        coding, *parameters = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for parameter in parameters:
+            key, _, param_value = parameter.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+class Compression(object):
+    """
+    Compresses the responses with the content coding preferred by the
+    client.
+
+    :arg int min_size:
+        The minimum size of a body in bytes, which is compressed.
+    :arg int level:
+        The compression level (1-9).
+    :arg encodings:
+        The supported content codings in the order of the server's
+        preference (*gzip*, *deflate*).
+    """
+
+    def __init__(self, min_size=1024, level=6, encodings=("gzip", "deflate")):
+        """
+        """
+        self.min_size = min_size
+        self.level = level
+        self.encodings = tuple(encodings)
+        return None
+
+    def negotiate(self, request):
+        """
+        Returns the content coding, which is accepted by the client with the
+        highest quality value, or None.
+
+        :arg jsonapi.base.request.Request request:
+        """
+        accept_encoding = request.headers.get("accept-encoding")
+        if not accept_encoding:
+            return None
+
+        codings = parse_accept_encoding(accept_encoding)
+        default = codings.get("*", 0.0)
+
+        best = None
+        best_quality = 0.0
+        for encoding in self.encodings:
+            quality = codings.get(encoding, default)
+            if quality > best_quality:
+                best = encoding
+                best_quality = quality
+        return best
+
+    def compressible(self, response):
+        """
+        Returns true, if the *response* has a body, which is large enough
+        and not encoded yet.
+
+        :arg jsonapi.base.response.Response response:
+        """
+        if not response.has_body or "content-encoding" in response.headers:
+            return False
+        return response.is_stream or len(response.body) >= self.min_size
+
+    def compress(self, request, response):
+        """
+        Compresses the *response* for the *request*, if the client accepts a
+        content coding and the body is large enough. A strong *ETag*, which
+        the response already has, gets the content coding as suffix
+        (:func:`~jsonapi.base.conditional.coding_etag`).
+
+        :arg jsonapi.base.request.Request request:
+        :arg jsonapi.base.response.Response response:
+        """
+        if not self.compressible(response):
+            return None
+
+        # The representation depends on the *Accept-Encoding* header.
+        vary = response.headers.get("vary")
+        response.headers["vary"] = vary + ", Accept-Encoding" if vary\
+            else "Accept-Encoding"
+
+        encoding = self.negotiate(request)
+        if encoding is not None:
+            response.compress(encoding, self.level)
+
+            etag = response.headers.get("etag")
+            if etag is not None:
+                response.headers["etag"] = conditional.coding_etag(
+                    etag, encoding
+                )
+        return None
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.conditional
+========================
+
+Conditional GET requests (*If-None-Match* and *If-Modified-Since*):
+
+*   Every GET response with a body gets an *ETag*, which is the hash of the
+    body as it is sent, i.e. after the content coding. So the *gzip*,
+    *deflate* and *identity* representations have different *ETags*. A
+    matching conditional request is answered with ``304 Not Modified`` and
+    the body is not sent.
+*   If ``settings["version_etag"]`` is true, the handlers derive a weak
+    *ETag* from the :attr:`~jsonapi.base.schema.Schema.version_attribute`
+    of the resources in the document. A matching request is then answered
+    before the resources are serialized. If the versions are timestamps,
+    the most recent one is sent as *Last-Modified* too.
+
+    The version of a resource must change with every change of its
+    representation. This includes the to-many relationships, so the version
+    of a *Post* must be updated, when a new *Comment* is added to it.
+"""
+
+# std
+import datetime
+import email.utils
+import hashlib
+
+
+__all__ = [
+    "NOT_MODIFIED_HEADERS",
+    "body_etag",
+    "coding_etag",
+    "version_etag",
+    "last_modified",
+    "http_date",
+    "parse_etags",
+    "is_not_modified",
+    "not_modified",
+    "add_body_etag",
+    "evaluate"
+]
+
+
+#: The headers, which are sent with a ``304 Not Modified`` response
+#: (RFC 7232, section 4.1).
+NOT_MODIFIED_HEADERS = frozenset([
+    "cache-control", "content-location", "date", "etag", "expires",
+    "last-modified", "vary"
+])
+
+
+def body_etag(body):
+    """
+    Returns a strong *ETag* for the *body*.
+
+    :arg bytes body:
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+def coding_etag(etag, encoding):
+    """
+    Returns the *ETag* of the representation, which has been encoded with
+    the content coding *encoding*. A strong *ETag* must differ for each
+    coding, so the coding is appended to it (``"<hash>-gzip"``). A weak
+    *ETag* only claims semantic equivalence and is returned unchanged.
+
+    :arg str etag:
+    :arg str encoding:
+    """
+    if etag.startswith("W/"):
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def version_etag(request, resources, extra=None):
+    """
+    Returns a weak *ETag* for a document, which contains the *resources*, or
+    None, if the schema of a resource has no version attribute.
+
+    The *ETag* depends on the query string and the *Accept* header of the
+    *request*, so that a different fieldset, include path or media type
+    results in a different *ETag*.
+
+    :arg jsonapi.base.request.Request request:
+    :arg resources:
+    :arg extra:
+        Something else, which is part of the document (e.g. the number of
+        all resources in a collection). It is added with :func:`repr`.
+    """
+    h = hashlib.sha1()
+    h.update(repr((
+        request.parsed_uri.query, request.headers.get("accept"), extra
+    )).encode("utf-8"))
+
+    for resource in resources:
+        schema = resource._jsonapi["schema"]
+        if schema.version_attribute is None:
+            return None
+        h.update(repr((
+            schema.typename, schema.id_attribute.get(resource),
+            schema.version_attribute.get(resource)
+        )).encode("utf-8"))
+    return 'W/"{}"'.format(h.hexdigest())
+
+
+def last_modified(resources):
+    """
+    Returns the most recent version of the *resources*, if all versions are
+    :class:`datetime.datetime` objects, otherwise None. Naive datetimes
+    are considered to be in UTC.
+
+    :arg resources:
+    """
+    result = None
+    for resource in resources:
+        schema = resource._jsonapi["schema"]
+        if schema.version_attribute is None:
+            return None
+
+        version = schema.version_attribute.get(resource)
+        if not isinstance(version, datetime.datetime):
+            return None
+        if version.tzinfo is None:
+            version = version.replace(tzinfo=datetime.timezone.utc)
+        if result is None or version > result:
+            result = version
+    return result
+
+
+def http_date(dt):
+    """
+    Formats the datetime *dt* for the *Last-Modified* header.
+
+    :arg datetime.datetime dt:
+    """
+    return email.utils.format_datetime(
+        dt.astimezone(datetime.timezone.utc), usegmt=True
+    )
+
+
+def parse_etags(value):
+    """
+    Returns the set of the (opaque) entity tags in an *If-None-Match*
+    header. The weak indicator is removed, because *If-None-Match* uses the
+    weak comparison.
+
+    :arg str value:
+    """
+    etags = set()
+    for etag in value.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        if etag:
+            etags.add(etag)
+    return etags
+
+
+def _parse_http_date(value):
+    """
+    Returns the aware datetime in the HTTP date *value* or None, if the
+    date is invalid.
+    """
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def is_not_modified(request, etag=None, modified=None):
+    """
+    Returns true, if the client's copy of the document with the *etag*,
+    which has been *modified* last, is still fresh. *If-Modified-Since* is
+    only evaluated, if the request has no *If-None-Match* header.
+
+    :arg jsonapi.base.request.Request request:
+    :arg str etag:
+    :arg datetime.datetime modified:
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        etags = parse_etags(if_none_match)
+        return "*" in etags or parse_etags(etag) <= etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and modified is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified(response):
+    """
+    Turns the *response* into a ``304 Not Modified`` response. Only the
+    headers listed in :data:`NOT_MODIFIED_HEADERS` are kept.
+
+    :arg jsonapi.base.response.Response response:
+    """
+    response.status = 304
+    response.headers = {
+        key: value for key, value in response.headers.items()\
+        if key.lower() in NOT_MODIFIED_HEADERS
+    }
+    response.body = None
+    response.file = None
+    response.cache_tags = None
+    return None
+
+
+def add_body_etag(request, response):
+    """
+    Adds the *ETag* of the body to a successful GET *response*, if it has
+    none yet. Streamed responses are not hashed.
+
+    This function must be called after the body has been compressed, so
+    that the *ETag* belongs to the content coding of the response.
+
+    :arg jsonapi.base.request.Request request:
+    :arg jsonapi.base.response.Response response:
+    """
+    if request.method == "get" and response.status == 200 \
+        and "etag" not in response.headers \
+        and response.has_body and not response.is_stream:
+        response.headers["etag"] = body_etag(response.body)
+    return None
+
+
+def evaluate(request, response):
+    """
+    Turns a successful GET *response* into ``304 Not Modified``, if the
+    client has a fresh copy of it.
+
+    :arg jsonapi.base.request.Request request:
+    :arg jsonapi.base.response.Response response:
+    """
+    if request.method != "get" or response.status != 200:
+        return None
+
+    modified = response.headers.get("last-modified")
+    if modified is not None:
+        modified = _parse_http_date(modified)
+
+    if is_not_modified(request, response.headers.get("etag"), modified):
+        not_modified(response)
+    return None
@@ -36,15 +36,215 @@ can take a look at the existing database adapters, if you need an example.
 
 # local
 from . import errors
-from .utilities import relative_identifiers
+from .utilities import (
+    build_include_tree, ensure_identifier, relatives, relative_identifiers
+)
 
 
 __all__ = [
+    "IdentityMap",
     "Database",
     "Session"
 ]
 
 
+def _collect_relatives(level, known):
+    """
+    Collects the relatives of all nodes in one level of the include tree.
+
+    :arg list level:
+        A list of triples ``(path, tree, resources)``. *tree* contains the
+        relationships, which must be followed starting from *resources*.
+    :arg dict known:
+        Maps the identifiers of all resources, which have already been loaded,
+        to the resource. Relatives, which are already loaded by the
+        relationship, are added.
+
+    :returns:
+        A list with the triples ``(path, subtree, identifiers)`` for each
+        node in the next level and a set with the identifiers of the
+        relatives, which must still be fetched from the database.
+
+    :raises jsonapi.base.errors.UnresolvableIncludePath:
+    """
+    nodes = list()
+    missing = set()
+    for path, tree, resources in level:
+        for relname, subtree in tree.items():
+            relpath = path + [relname]
+
+            identifiers = set()
+            for resource in resources:
+                try:
+                    items = relatives(relname, resource)
+                except errors.RelationshipNotFound:
+                    raise errors.UnresolvableIncludePath(relpath)
+
+                for item in items:
+                    identifier = ensure_identifier(item)
+                    identifiers.add(identifier)
+
+                    # The relationship returned only an identifier, so we
+                    # must fetch the resource.
+                    if isinstance(item, (tuple, dict)):
+                        missing.add(identifier)
+                    else:
+                        known.setdefault(identifier, item)
+
+            nodes.append((relpath, subtree, identifiers))
+
+    missing.difference_update(known)
+    return nodes, missing
+
+
+class IdentityMap(object):
+    """
+    Maps the identifiers of the resources, which have been loaded in a
+    :class:`Session`, to the resource objects. This way, a resource is only
+    loaded once per session and the same object is returned for repeated
+    lookups.
+
+    A resource, which has been loaded with a sparse fieldset, is only
+    returned for the same or a smaller fieldset.
+    """
+
+    def __init__(self):
+        """
+        """
+        # Maps the identifier to the two tuple ``(resource, fields)``.
+        # *fields* is a frozenset with the loaded fields or None, if all
+        # fields have been loaded.
+        self._resources = dict()
+
+        #: The number of lookups, which have been answered from the map.
+        self.hits = 0
+
+        #: The number of lookups, which must be loaded from the database.
+        self.misses = 0
+        return None
+
+    def __len__(self):
+        return len(self._resources)
+
+    def __contains__(self, identifier):
+        return identifier in self._resources
+
+    @staticmethod
+    def _type_fields(typename, fields):
+        """
+        Returns the sparse fieldset for the type *typename* as frozenset or
+        None, if all fields are loaded.
+        """
+        if not fields or not typename in fields:
+            return None
+        return frozenset(fields[typename])
+
+    def get(self, identifier, fields=None):
+        """
+        Returns the resource with the *identifier* or None, if it has not
+        been loaded yet or not with all fields in *fields*.
+
+        :arg tuple identifier:
+        :arg dict fields:
+            The sparse fieldset
+        """
+        entry = self._resources.get(identifier)
+        if entry is not None:
+            resource, loaded = entry
+            required = self._type_fields(identifier[0], fields)
+            if loaded is None or (required is not None and required <= loaded):
+                self.hits += 1
+                return resource
+        self.misses += 1
+        return None
+
+    def get_many(self, identifiers, fields=None):
+        """
+        Looks up all *identifiers* and returns a dictionary with the loaded
+        resources and a list with the identifiers, which must still be
+        loaded from the database.
+
+        :arg identifiers:
+        :arg dict fields:
+        """
+        resources = dict()
+        missing = list()
+        for identifier in identifiers:
+            resource = self.get(identifier, fields)
+            if resource is None:
+                missing.append(identifier)
+            else:
+                resources[identifier] = resource
+        return (resources, missing)
+
+    def add(self, resource, fields=None):
+        """
+        Adds the *resource*, which has been loaded with the sparse fieldset
+        *fields*, to the map and returns the resource object, which must be
+        used from now on. This is the already known object, if it has been
+        loaded with at least the same fields.
+
+        :arg resource:
+        :arg dict fields:
+        """
+        identifier = ensure_identifier(resource)
+        if identifier[1] is None:
+            return resource
+
+        loaded = self._type_fields(identifier[0], fields)
+        entry = self._resources.get(identifier)
+        if entry is not None:
+            known, known_fields = entry
+            if known is resource:
+                if loaded is None or known_fields is None:
+                    loaded = None
+                else:
+                    loaded = loaded | known_fields
+            elif known_fields is None \
+                or (loaded is not None and loaded <= known_fields):
+                return known
+
+        self._resources[identifier] = (resource, loaded)
+        return resource
+
+    def add_all(self, resources, fields=None):
+        """
+        Adds all *resources* (see :meth:`add`) and returns a list with the
+        resource objects, which must be used from now on.
+
+        :arg list resources:
+        :arg dict fields:
+        """
+        return [self.add(resource, fields) for resource in resources]
+
+    def discard(self, identifier):
+        """
+        Removes the resource with the *identifier* from the map.
+
+        :arg tuple identifier:
+        """
+        self._resources.pop(identifier, None)
+        return None
+
+    def clear(self):
+        """
+        Removes all resources from the map.
+        """
+        self._resources.clear()
+        return None
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of resources in the map and the
+        hit and miss counters.
+        """
+        return {
+            "resources": len(self._resources),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
 class Database(object):
     """
     This class defines the base for a database adapter.
@@ -86,7 +286,10 @@ class Session(object):
     database, when :meth:`commit` is called.
 
     If a resource is queried twice, the same object must be returned (The
-    Python :func:`id` must be equal).
+    Python :func:`id` must be equal). An adapter should use the
+    :attr:`identity_map` for this purpose: :meth:`get` and :meth:`get_many`
+    look the resources up first and load only the missing ones, which are
+    added to the map together with the results of :meth:`query`.
 
     :arg jsonapi.base.api.API api:
     """
@@ -95,15 +298,252 @@ class Session(object):
         """
         """
         self.api = api
+
+        #: The :class:`IdentityMap` with all resources loaded in this
+        #: session.
+        self.identity_map = IdentityMap()
+
+        # The identifiers (and typenames) of the resources, whose cache
+        # entries must be invalidated again after the commit.
+        self._invalidated_tags = set()
+        self._invalidated_resources = set()
+        return None
+
+    def changed_identifiers(self, resources):
+        """
+        **May be overridden** for performance reasons.
+
+        Returns the identifiers of the *resources* and of all resources,
+        whose relationships may have changed together with them. These are
+        all relatives of the *resources*.
+
+        An adapter may return only the relatives, which have been added or
+        removed since the resources have been loaded.
+
+        :arg list resources:
+        """
+        identifiers = set()
+        for resource in resources:
+            identifiers.add(ensure_identifier(resource))
+
+            schema = resource._jsonapi["schema"]
+            for relname in schema.relationships:
+                identifiers.update(relative_identifiers(relname, resource))
+        return identifiers
+
+    def invalidate_caches(self, resources, identifiers=None):
+        """
+        Removes the cached resource objects of the *resources* and of the
+        resources, whose relationships may have changed with them (see
+        :meth:`changed_identifiers`) from the
+        :attr:`~jsonapi.base.api.API.fragment_cache` and the
+        :attr:`~jsonapi.base.api.API.read_cache` and the responses tagged
+        with one of these identifiers or the resources' types from the
+        :attr:`~jsonapi.base.api.API.response_cache`.
+
+        The relatives must be invalidated in the read cache too, because
+        their state may contain the foreign key of a changed relationship.
+
+        The identifiers are remembered and invalidated again by
+        :meth:`invalidate_committed_caches`, so that no stale entry is
+        cached between the save and the commit.
+
+        An adapter must call this method in :meth:`save` and :meth:`delete`.
+
+        :arg list resources:
+        :arg set identifiers:
+            If given, these identifiers are used instead of the result of
+            :meth:`changed_identifiers`.
+        """
+        fragment_cache = self.api.fragment_cache
+        response_cache = self.api.response_cache
+        read_cache = self.api.read_cache
+        if fragment_cache is None and response_cache is None \
+            and read_cache is None:
+            return None
+
+        if identifiers is None:
+            identifiers = self.changed_identifiers(resources)
+        self._invalidated_tags.update(identifiers)
+
+        if fragment_cache is not None:
+            fragment_cache.invalidate(identifiers)
+
+        # The collections of the resources' types change, too.
+        if response_cache is not None:
+            self._invalidated_tags.update(
+                ensure_identifier(resource)[0] for resource in resources
+            )
+            response_cache.invalidate(self._invalidated_tags)
+
+        # New resources have no id yet.
+        if read_cache is not None:
+            identifiers = [
+                identifier for identifier in identifiers\
+                if identifier[1] is not None
+            ]
+            read_cache.invalidate(identifiers)
+            self._invalidated_resources.update(identifiers)
+        return None
+
+    def invalidate_committed_caches(self):
+        """
+        Removes the cache entries of all resources, which have been passed
+        to :meth:`invalidate_caches` since the last commit, and of their
+        relatives.
+
+        An adapter must call this method after the changes have been
+        committed in :meth:`commit`.
+        """
+        if self._invalidated_tags:
+            fragment_cache = self.api.fragment_cache
+            if fragment_cache is not None:
+                fragment_cache.invalidate(self._invalidated_tags)
+
+            response_cache = self.api.response_cache
+            if response_cache is not None:
+                response_cache.invalidate(self._invalidated_tags)
+        self._invalidated_tags.clear()
+
+        read_cache = self.api.read_cache
+        if read_cache is not None and self._invalidated_resources:
+            read_cache.invalidate(self._invalidated_resources)
+        self._invalidated_resources.clear()
+        return None
+
+    def related_typename(self, typename, relname):
+        """
+        **May be overridden** to support the
+        :attr:`~jsonapi.base.api.API.response_cache` for filters and sort
+        criteria across relationships.
+
+        Returns the typename of the resources in the relationship *relname*
+        of the type *typename* or None, if it is not known. This is the
+        default.
+
+        :arg str typename:
+        :arg str relname:
+        """
+        return None
+
+    def path_typenames(self, typename, fieldnames):
+        """
+        Returns the typenames of all relationships, which are followed by the
+        field paths *fieldnames* (e.g. ``author.country``), or None, if one
+        of them is not known (see :meth:`related_typename`).
+
+        A response, which depends on the filters or sort criteria across
+        relationships, must be tagged with these typenames, so that it is
+        invalidated, when a related resource changes.
+
+        :arg str typename:
+        :arg fieldnames:
+        """
+        typenames = set()
+        for fieldname in fieldnames:
+            current_typename = typename
+            for relname in fieldname.split(".")[:-1]:
+                current_typename = self.related_typename(
+                    current_typename, relname
+                )
+                if current_typename is None:
+                    return None
+                typenames.add(current_typename)
+        return typenames
+
+    def dump_resource(self, resource):
+        """
+        **May be overridden** to support the
+        :attr:`~jsonapi.base.api.API.read_cache`.
+
+        Returns the state of the *resource*, which is stored in the read
+        cache. The state must be picklable and contain everything
+        :meth:`load_resource` needs to rebuild the resource. If None is
+        returned, the resource is not cached. This is the default.
+
+        :arg resource:
+        """
+        return None
+
+    def load_resource(self, typename, state):
+        """
+        **May be overridden** to support the
+        :attr:`~jsonapi.base.api.API.read_cache`.
+
+        Rebuilds a resource of the type *typename* from the *state* returned
+        by :meth:`dump_resource` and attaches it to the session, without
+        querying the database.
+
+        :arg str typename:
+        :arg state:
+        """
+        raise NotImplementedError()
+
+    def read_cache_get_many(self, identifiers):
+        """
+        Looks the *identifiers* up in the
+        :attr:`~jsonapi.base.api.API.read_cache` and returns a dictionary
+        with the rebuilt resources and a list with the identifiers, which
+        must still be loaded from the database.
+
+        The rebuilt resources are added to the :attr:`identity_map`.
+
+        :arg list identifiers:
+        """
+        read_cache = self.api.read_cache
+        if read_cache is None:
+            return (dict(), list(identifiers))
+
+        states = read_cache.get_many(identifiers)
+        resources = {
+            identifier: self.identity_map.add(
+                self.load_resource(identifier[0], state)
+            )\
+            for identifier, state in states.items()
+        }
+        missing = [
+            identifier for identifier in identifiers\
+            if not identifier in resources
+        ]
+        return (resources, missing)
+
+    def read_cache_set_many(self, resources, fields=None):
+        """
+        Stores the state of the *resources* in the
+        :attr:`~jsonapi.base.api.API.read_cache`. Resources, which have been
+        loaded with a sparse fieldset *fields*, are not cached.
+
+        :arg list resources:
+        :arg dict fields:
+        """
+        read_cache = self.api.read_cache
+        if read_cache is None:
+            return None
+
+        states = dict()
+        for resource in resources:
+            identifier = ensure_identifier(resource)
+            if fields and identifier[0] in fields:
+                continue
+            if identifier[1] is None or not read_cache.enabled(identifier[0]):
+                continue
+
+            state = self.dump_resource(resource)
+            if state is not None:
+                states[identifier] = state
+
+        if states:
+            read_cache.set_many(states)
         return None
 
     def query(self, typename,
-        *, sorting=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
         **Must be overridden**
 
-        *   sorting
+        *   order
 
             Is a list of two tuples of the form:
 
@@ -150,13 +590,60 @@ class Session(object):
 
                 *   :attr:`jsonapi.base.request.Request.japi_filters`
 
+        *   fields (None or dictionary)
+
+            Maps a typename to the names of the fields, which will be
+            serialized (sparse fieldset). An adapter may load only these
+            attributes from the database. Types, which are not in the
+            dictionary, must be loaded completely.
+
+            This value may be ignored.
+
+            .. seealso::
+
+                *   :attr:`jsonapi.base.request.Request.japi_fields`
+                *   http://jsonapi.org/format/#fetching-sparse-fieldsets
+
+        *   include (None or list)
+
+            A list of include paths (lists of relationship names). An adapter
+            may eager load these relationships together with the resources,
+            so that :meth:`get_relatives` does not need to fetch them
+            afterwards.
+
+            This value may be ignored.
+
+            .. seealso::
+
+                *   :attr:`jsonapi.base.request.Request.japi_include`
+                *   http://jsonapi.org/format/#fetching-includes
+
+        *   cursor (None or :class:`~jsonapi.base.pagination.Cursor`)
+
+            If given, only the resources after (or before) the cursor must
+            be returned (keyset pagination). The resources must be sorted by
+            :attr:`~jsonapi.base.pagination.Cursor.query_order` and the range
+            predicate is described by
+            :meth:`~jsonapi.base.pagination.Cursor.keyset`. If the
+            resources *before* the cursor are requested, the result must be
+            reversed again, so that it is in the order described by *order*.
+            *offset* is None, when a cursor is given.
+
+            This value must not be ignored. Raise a
+            :exc:`~jsonapi.base.errors.BadRequest` error, if the adapter does
+            not support the cursor pagination.
+
+            .. seealso::
+
+                *   :attr:`jsonapi.base.request.Request.japi_page_cursor`
+
         :raises errors.UnsortableField:
         :raises errors.UnfilterableField:
         """
         raise NotImplementedError()
 
     def query_size(self, typename,
-        *, sorting=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None
         ):
         """
         **Must be overridden**
@@ -166,7 +653,47 @@ class Session(object):
         """
         raise NotImplementedError()
 
-    def get(self, identifier, required=False):
+    def query_with_size(self, typename,
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None
+        ):
+        """
+        **May be overridden** for performance reasons.
+
+        Returns a tuple with the result of :meth:`query` and the total number
+        of resources, which match the *filters* (ignoring *limit* and
+        *offset*). This method is used by the *window* count strategy.
+
+        The default implementation calls :meth:`query` and
+        :meth:`query_size`. An adapter may fetch the number in the same
+        round trip, e.g. with a ``COUNT(*) OVER()`` column.
+
+        :seealso: :data:`jsonapi.base.pagination.COUNT_STRATEGIES`
+        """
+        resources = self.query(
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include
+        )
+        total = self.query_size(typename, filters=filters)
+        return (resources, total)
+
+    def estimate_size(self, typename, *, filters=None):
+        """
+        **May be overridden** for performance reasons.
+
+        Returns a tuple with an estimate of the number of resources, which
+        match the *filters*, and True, if the number is only an estimate, or
+        False, if it is exact. This method is used by the *estimate* count
+        strategy. An adapter may use the statistics of the database planner.
+
+        The default implementation returns the exact number
+        (:meth:`query_size`).
+
+        :seealso: :data:`jsonapi.base.pagination.COUNT_STRATEGIES`
+        """
+        return (self.query_size(typename, filters=filters), False)
+
+    def get(self, identifier, required=False, fields=None, include=None):
         """
         **Must be overridden**
 
@@ -178,12 +705,16 @@ class Session(object):
         :arg bool required:
             If true, throw a ResourceNotFound error if the resource with the
             id does not exist.
+        :arg dict fields:
+            The sparse fieldset (see :meth:`query`). This value may be ignored.
+        :arg list include:
+            The include paths (see :meth:`query`). This value may be ignored.
 
         :raises jsonapi.base.errors.ResourceNotFound:
         """
         raise NotImplementedError()
 
-    def get_many(self, identifiers, required=False):
+    def get_many(self, identifiers, required=False, fields=None):
         """
         **Must be overridden**
 
@@ -203,6 +734,8 @@ class Session(object):
         :arg bool required:
             If true, throw a ResourceNotFound error if a resource does not
             exist.
+        :arg dict fields:
+            The sparse fieldset (see :meth:`query`). This value may be ignored.
 
         :raises jsonapi.base.errors.ResourceNotFound:
         """
@@ -240,7 +773,17 @@ class Session(object):
         """
         raise NotImplementedError()
 
-    def get_relatives(self, resources, paths):
+    def close(self):
+        """
+        **Can be overridden**
+
+        Called by the API, when the request has been handled (or the body
+        of a streamed response has been sent), also after an error. An
+        adapter should release its connection here.
+        """
+        return None
+
+    def get_relatives(self, resources, paths, fields=None):
         """
         **May be overridden** for performance reasons.
 
@@ -250,6 +793,13 @@ class Session(object):
         *resources*. This method returns then all resources, which are related
         to at least one of the *resources*.
 
+        The *paths* are merged into a prefix tree, which is resolved
+        breadth-first. So a shared prefix like *comments* in
+        ``include=comments,comments.author`` is only fetched once. The
+        resources in *resources* are never fetched again and they are not
+        contained in the result, because they are already part of the primary
+        data.
+
         E.g.:
 
         .. code-block:: python3
@@ -261,9 +811,13 @@ class Session(object):
 
         :arg list resources:
             A list of resources.
-        :arg list path:
-            A list of relationship names. The first relationship must exist
-            on every resource in *resources*.
+        :arg list paths:
+            A list of paths (lists of relationship names) or an include tree
+            (see :attr:`~jsonapi.base.request.Request.japi_include_tree`).
+            The first relationship must exist on every resource in
+            *resources*.
+        :arg dict fields:
+            The sparse fieldset, which is passed to :meth:`get_many`.
 
         :raises UnresolvableIncludePath:
             If a relationship is not defined on any of the intermediate
@@ -279,27 +833,27 @@ class Session(object):
             *get_relatives()* is not an expressive name for the functionality
             of this method.
         """
-        all_relatives = dict()
-        root_resources = resources
-
-        for path in paths:
-            resources = root_resources
-            for relname in path:
-                # Collect the ids of all related resources.
-                relids = set()
-                for resource in resources:
-                    try:
-                        tmp = relative_identifiers(relname, resource)
-                    except errors.RelationshipNotFound:
-                        raise errors.UnresolvableIncludePath(path)
-                    else:
-                        relids.update(tmp)
-
-                # Query the relatives from the database.
-                relatives = self.get_many(relids, required=True)
-                all_relatives.update(relatives)
-
-                # The next relationship name in the path is defined on the
-                # previously fetched relatives.
-                resources = relatives.values()
+        # The resources in the primary data are neither fetched again nor
+        # contained in the result.
+        primary = {ensure_identifier(resource): resource for resource in resources}
+        known = dict(primary)
+
+        # We walk the include tree breadth-first and fetch all relatives in
+        # the same level with one *get_many()* call.
+        level = [(list(), build_include_tree(paths), list(resources))]
+        while level:
+            nodes, missing = _collect_relatives(level, known)
+            if missing:
+                known.update(self.get_many(missing, required=True, fields=fields))
+
+            # Continue with the relatives of the nodes, which have children.
+            level = [
+                (path, subtree, [known[identifier] for identifier in identifiers])\
+                for path, subtree, identifiers in nodes if subtree
+            ]
+
+        all_relatives = {
+            identifier: resource for identifier, resource in known.items()\
+            if not identifier in primary
+        }
         return all_relatives
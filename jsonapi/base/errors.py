@@ -174,6 +174,21 @@ class ErrorList(Exception):
         """
         return bool(self.errors)
 
+    @property
+    def http_status(self):
+        """
+        The most specific http status code for all errors in this list:
+        The common status of all errors, if they are equal, otherwise
+        *400* for client errors or *500*, if at least one server error occured.
+        """
+        statuses = {err.http_status for err in self.errors}
+        if len(statuses) == 1:
+            return statuses.pop()
+        elif any(status >= 500 for status in statuses):
+            return 500
+        else:
+            return 400
+
     def append(self, error):
         """
         """
@@ -181,7 +196,7 @@ class ErrorList(Exception):
         self.errors.append(error)
 
         # Invalidate the cache.
-        del self.json
+        self.__dict__.pop("json", None)
         return None
 
     def extend(self, error):
@@ -191,7 +206,7 @@ class ErrorList(Exception):
         self.errors.extend(error.errors)
 
         # Invalidate the cache.
-        del self.json
+        self.__dict__.pop("json", None)
         return None
 
     @cached_property
@@ -366,8 +381,8 @@ class UnfilterableField(BadRequest):
         self.filtername = filtername
         self.fieldname = fieldname
 
-        detail = "The filter '{}' is not supported on the '{}' field of '{}.'"\
-            .format(filtername, fieldname)
+        detail = "The filter '{}' is not supported on the '{}' field of '{}'."\
+            .format(filtername, fieldname, typename)
         super().__init__(detail=detail, **kargs)
         return None
 
@@ -29,12 +29,14 @@ jsonapi.base.handler.collection
 
 # std
 from collections import OrderedDict
+import itertools
 
 # local
 from .. import errors
 from .. import validators
-from ..serializer import serialize_many
-from ..pagination import Pagination
+from ..serializer import iter_serialize_many, serialize_many
+from ..pagination import Cursor, CursorPagination, Pagination
+from ..utilities import ensure_identifier
 from .base import BaseHandler
 
 
@@ -43,6 +45,8 @@ class CollectionHandler(BaseHandler):
     Handles the collection endpoint.
     """
 
+    __slots__ = ("typename",)
+
     def __init__(self, api, db, request):
         """
         """
@@ -53,7 +57,7 @@ class CollectionHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
@@ -66,52 +70,166 @@ class CollectionHandler(BaseHandler):
 
         http://jsonapi.org/format/#fetching-resources
         """
+        # A HEAD request without a version *ETag* needs no query at all.
+        if not self.load_document:
+            self.response.headers["content-type"] = \
+                self.request.accept_media_type
+            self.response.status = 200
+            return None
+
         # Fetch the requested resources.
-        if self.request.japi_paginate:
+        cursor = None
+        count_strategy = None
+        if self.request.japi_cursor_paginate:
+            # We fetch one resource more, to see if there is a next page.
+            cursor = self.request.japi_page_cursor
+            offset = None
+            limit = self.request.japi_page_size + 1
+        elif self.request.japi_paginate:
+            count_strategy = self.api.get_count_strategy(self.typename)
             offset = self.request.japi_page_offset
             limit = self.request.japi_page_limit
+
+            # Without the total number, we fetch one resource more, to see if
+            # there is a next page.
+            if count_strategy == "none":
+                limit += 1
         else:
             offset = self.request.japi_offset
             limit = self.request.japi_limit
 
-        resources = self.db.query(
-            self.typename, order=self.request.japi_sort, limit=limit,
-            offset=offset, filters=self.request.japi_filters
-        )
+        total_resources = None
+        approximate = False
+        if count_strategy == "window":
+            resources, total_resources = self.db.query_with_size(
+                self.typename, order=self.request.japi_sort, limit=limit,
+                offset=offset, filters=self.request.japi_filters,
+                fields=self.request.japi_fields,
+                include=self.request.japi_include
+            )
+        else:
+            resources = self.db.query(
+                self.typename, order=self.request.japi_sort, limit=limit,
+                offset=offset, filters=self.request.japi_filters,
+                fields=self.request.japi_fields,
+                include=self.request.japi_include, cursor=cursor
+            )
+
+        # Remove the look-ahead resource.
+        has_next = False
+        if cursor is not None:
+            # The look-ahead resource of a *before* page is in front of it,
+            # so we look for a resource behind the page.
+            if cursor.before and resources:
+                next_resources = self.db.query(
+                    self.typename, order=self.request.japi_sort, limit=1,
+                    filters=self.request.japi_filters,
+                    cursor=Cursor.from_resource(resources[-1], cursor.order)
+                )
+                has_next = bool(next_resources)
+
+            pagination = CursorPagination(
+                self.request, resources, has_next=has_next
+            )
+            resources = pagination.resources
+        elif count_strategy == "none":
+            has_next = len(resources) > self.request.japi_page_size
+            resources = resources[:self.request.japi_page_size]
 
         # Fetch all related resources, which should be included.
         included_resources = self.db.get_relatives(
-            resources, self.request.japi_include
+            resources, self.request.japi_include_tree,
+            fields=self.request.japi_fields
         )
 
         # Build the response.
-        data = serialize_many(resources, fields=self.request.japi_fields)
-        included = serialize_many(
-            included_resources.values(), fields=self.request.japi_fields
-        )
         meta = OrderedDict()
         links = OrderedDict()
 
         # Add the pagination links, if necessairy.
-        if self.request.japi_paginate:
-            total_resources = self.db.query_size(
-                self.typename, filters=self.request.japi_filters
-            )
+        if cursor is not None:
+            meta.update(pagination.json_meta)
+            links.update(pagination.json_links)
+        elif self.request.japi_paginate:
+            filters = self.request.japi_filters
+            if count_strategy == "exact":
+                total_resources = self.db.query_size(
+                    self.typename, filters=filters
+                )
+            elif count_strategy == "cached":
+                total_resources = self.api.count_cache.get(
+                    self.typename, filters
+                )
+                if total_resources is None:
+                    total_resources = self.db.query_size(
+                        self.typename, filters=filters
+                    )
+                    self.api.count_cache.set(
+                        self.typename, filters, total_resources
+                    )
+            elif count_strategy == "estimate":
+                total_resources, approximate = self.db.estimate_size(
+                    self.typename, filters=filters
+                )
 
-            pagination = Pagination(self.request, total_resources)
+            pagination = Pagination(
+                self.request, total_resources,
+                approximate=approximate, has_next=has_next
+            )
             meta.update(pagination.json_meta)
             links.update(pagination.json_links)
 
+        # The client may still have a fresh copy of the document.
+        if self.check_not_modified(
+            itertools.chain(resources, included_resources.values()),
+            extra=(total_resources, has_next)
+            ):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
+        # Large documents are serialized lazily and streamed to the client.
+        stream = self.api.stream_threshold is not None \
+            and len(resources) + len(included_resources) \
+                >= self.api.stream_threshold
+        serialize = iter_serialize_many if stream else serialize_many
+
+        data = serialize(resources, fields=self.request.japi_fields)
+        included = serialize(
+            included_resources.values(), fields=self.request.japi_fields
+        )
+
+        # The filters and sort criteria across relationships depend on the
+        # related resources, too. If their types are not known, the response
+        # is not cached.
+        path_typenames = self.db.path_typenames(
+            self.typename, itertools.chain(
+                (fieldname for fieldname, filtername, value\
+                    in self.request.japi_filters),
+                (fieldname for direction, fieldname in self.request.japi_sort)
+            )
+        )
+
         # Put all together
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        if path_typenames is not None:
+            self.response.cache_tags = {self.typename}
+            self.response.cache_tags.update(path_typenames)
+            self.response.cache_tags.update(map(ensure_identifier, resources))
+            self.response.cache_tags.update(included_resources)
+        document = OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
             ("links", links),
             ("jsonapi", self.api.jsonapi_object)
-        ]))
+        ])
+        if stream:
+            self.response.body = self.dump_iter(document)
+        else:
+            self.response.body = self.dump(document)
         return None
 
     def post(self):
@@ -151,10 +269,10 @@ class CollectionHandler(BaseHandler):
         )
 
         # Put everything together.
-        self.response.headers["content-type"] = "application/vnd.api+json"
+        self.response.headers["content-type"] = self.request.accept_media_type
         self.response.headers["location"] = links["self"]
-        self.response.status_code = 201
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.status = 201
+        self.response.body = self.dump(OrderedDict([
             ("data", data),
             ("links", links),
             ("jsonapi", self.api.jsonapi_object)
@@ -34,6 +34,7 @@ from collections import OrderedDict
 from .. import errors
 from .. import validators
 from ..serializer import serialize_many
+from ..utilities import ensure_identifier
 from .base import BaseHandler
 
 
@@ -42,6 +43,11 @@ class RelationshipHandler(BaseHandler):
     Handles the relationship endpoint.
     """
 
+    __slots__ = (
+        "typename", "relname", "real_typename", "resource_id", "resource",
+        "relationship"
+    )
+
     def __init__(self, api, db, request):
         """
         """
@@ -60,7 +66,7 @@ class RelationshipHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
@@ -101,7 +107,7 @@ class RelationshipHandler(BaseHandler):
 
         document.setdefault("jsonapi", self.api.jsonapi_object)
 
-        body = self.api.dump_json(document)
+        body = self.dump(document)
         return body
 
     def get(self):
@@ -110,8 +116,16 @@ class RelationshipHandler(BaseHandler):
 
         http://jsonapi.org/format/#fetching-relationships
         """
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        # The linkage is part of the resource, so its version is used.
+        if self.check_not_modified([self.resource]):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
+        self.response.cache_tags = {ensure_identifier(self.resource)}
         self.response.body = self.build_body()
         return None
 
@@ -142,8 +156,8 @@ class RelationshipHandler(BaseHandler):
         self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
 
@@ -168,8 +182,8 @@ class RelationshipHandler(BaseHandler):
         self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
 
@@ -185,7 +199,7 @@ class RelationshipHandler(BaseHandler):
         self.db.commit()
 
         # Build the response
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
         self.response.body = self.build_body()
         return None
@@ -29,11 +29,13 @@ jsonapi.base.handler.resource
 
 # std
 from collections import OrderedDict
+import itertools
 
 # local
 from .. import errors
 from .. import validators
 from ..serializer import serialize_many
+from ..utilities import ensure_identifier
 from .base import BaseHandler
 
 
@@ -42,6 +44,8 @@ class ResourceHandler(BaseHandler):
     Handles a resource endpoint.
     """
 
+    __slots__ = ("typename", "real_typename", "resource_id", "resource")
+
     def __init__(self, api, db, request):
         """
         """
@@ -61,13 +65,27 @@ class ResourceHandler(BaseHandler):
     def prepare(self):
         """
         """
-        if self.request.content_type[0] != "application/vnd.api+json":
+        if not self.request.content_type[0] in self.api.media_codecs:
             raise errors.UnsupportedMediaType()
         if not self.api.has_type(self.typename):
             raise errors.NotFound()
 
-        # Load the resource
-        self.resource = self.db.get((self.typename, self.resource_id))
+        # Load the resource. Only a GET request is answered with the sparse
+        # fieldset and the included resources, so we must load the complete
+        # resource otherwise. A HEAD request needs the included resources
+        # only for the *ETag*.
+        if self.request.method == "get":
+            fields = self.request.japi_fields
+            include = self.request.japi_include
+        elif self.request.method == "head":
+            fields = self.request.japi_fields
+            include = self.request.japi_include if self.load_document else None
+        else:
+            fields = None
+            include = None
+        self.resource = self.db.get(
+            (self.typename, self.resource_id), fields=fields, include=include
+        )
         if self.resource is None:
             raise errors.NotFound()
 
@@ -81,10 +99,23 @@ class ResourceHandler(BaseHandler):
         http://jsonapi.org/format/#fetching-resources
         """
         # Fetch the included resources.
+        include = self.request.japi_include_tree if self.load_document \
+            else dict()
         included_resources = self.db.get_relatives(
-            [self.resource], self.request.japi_include
+            [self.resource], include, fields=self.request.japi_fields
         )
 
+        # The client may still have a fresh copy of the document.
+        if self.check_not_modified(
+            itertools.chain([self.resource], included_resources.values())
+            ):
+            return None
+
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        if self.request.method == "head":
+            return None
+
         # Build the response document.
         serializer = self.api.get_serializer(self.real_typename)
         data = serializer.serialize_resource(
@@ -99,9 +130,9 @@ class ResourceHandler(BaseHandler):
         links = OrderedDict()
 
         # Put all together
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.cache_tags = {ensure_identifier(self.resource)}
+        self.response.cache_tags.update(included_resources)
+        self.response.body = self.dump(OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
@@ -138,9 +169,9 @@ class ResourceHandler(BaseHandler):
         links = OrderedDict()
 
         # Put all together.
-        self.response.headers["content-type"] = "application/vnd.api+json"
-        self.response.status_code = 200
-        self.response.body = self.api.dump_json(OrderedDict([
+        self.response.headers["content-type"] = self.request.accept_media_type
+        self.response.status = 200
+        self.response.body = self.dump(OrderedDict([
             ("data", data),
             ("included", included),
             ("meta", meta),
@@ -157,5 +188,5 @@ class ResourceHandler(BaseHandler):
         self.db.commit()
 
         # Create the response.
-        self.response.status_code = 204
+        self.response.status = 204
         return None
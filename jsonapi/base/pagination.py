@@ -26,19 +26,156 @@
 jsonapi.base.pagination
 =======================
 
-This module contains only a helper for the pagination feature:
+This module contains the helpers for the pagination feature:
 http://jsonapi.org/format/#fetching-pagination
+
+Two strategies are supported:
+
+*   :class:`Pagination` uses the ``page[number]`` and ``page[size]`` query
+    parameters and translates them into an *offset* and *limit*.
+*   :class:`CursorPagination` uses the ``page[after]``, ``page[before]`` and
+    ``page[size]`` query parameters. The position in the collection is
+    encoded in an opaque :class:`Cursor` token, which the database adapters
+    translate into a range predicate on the sort fields (keyset pagination).
+    So deep pages are as fast as the first one and no count query is needed.
+
+The total number of resources, which is needed by :class:`Pagination`, can
+be determined with different :data:`COUNT_STRATEGIES`. The strategy is
+chosen per type with :meth:`jsonapi.base.api.API.get_count_strategy`.
 """
 
 # std
+import base64
+import binascii
 from collections import OrderedDict
 import math
+import threading
+import time
 import urllib
 
 # third party
 from cached_property import cached_property
 
 
+__all__ = [
+    "COUNT_STRATEGIES",
+    "CountCache",
+    "Pagination",
+    "Cursor",
+    "CursorPagination"
+]
+
+
+#: The strategies, which can be used to count the resources of a paginated
+#: collection:
+#:
+#: *   *exact*
+#:      A second query (:meth:`~jsonapi.base.database.Session.query_size`)
+#:      counts the resources.
+#: *   *window*
+#:      The total number is fetched together with the page
+#:      (:meth:`~jsonapi.base.database.Session.query_with_size`), e.g. with a
+#:      ``COUNT(*) OVER()`` column.
+#: *   *cached*
+#:      The result of :meth:`~jsonapi.base.database.Session.query_size` is
+#:      cached in the :class:`CountCache` of the API for a few seconds.
+#: *   *estimate*
+#:      The database estimates the number
+#:      (:meth:`~jsonapi.base.database.Session.estimate_size`). If the
+#:      number is only an estimate, it is flagged as approximate in the
+#:      *meta* object.
+#: *   *none*
+#:      The resources are not counted at all. The *last* link and the
+#:      totals in the *meta* object are omitted.
+COUNT_STRATEGIES = ("exact", "window", "cached", "estimate", "none")
+
+
+class CountCache(object):
+    """
+    A thread safe cache for the total number of resources in a collection,
+    which is used by the *cached* count strategy. The entries are keyed by
+    the typename and the filters and expire after *ttl* seconds.
+
+    :arg float ttl:
+        The number of seconds an entry is valid.
+    :arg int max_entries:
+        The maximum number of entries in the cache.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024):
+        """
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries = dict()
+        self._lock = threading.Lock()
+        return None
+
+    @staticmethod
+    def _key(typename, filters):
+        return (typename, repr(filters or list()))
+
+    def get(self, typename, filters=None):
+        """
+        Returns the cached number of resources or None, if there is no
+        valid entry.
+
+        :arg str typename:
+        :arg list filters:
+            The filters (see :attr:`jsonapi.base.request.Request.japi_filters`)
+        """
+        key = self._key(typename, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, count = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+        return count
+
+    def set(self, typename, filters, count):
+        """
+        Caches the number of resources *count*.
+
+        :arg str typename:
+        :arg list filters:
+        :arg int count:
+        """
+        key = self._key(typename, filters)
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Remove the expired entries first and then the oldest one.
+                for old_key, (expires, old_count) in list(self._entries.items()):
+                    if expires < now:
+                        del self._entries[old_key]
+                if len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+
+            self._entries[key] = (now + self.ttl, count)
+        return None
+
+    def clear(self, typename=None):
+        """
+        Removes all entries for the type *typename* or all entries, if no
+        typename is given.
+
+        :arg str typename:
+        """
+        with self._lock:
+            if typename is None:
+                self._entries.clear()
+            else:
+                for key in list(self._entries):
+                    if key[0] == typename:
+                        del self._entries[key]
+        return None
+
+
 class Pagination(object):
     """
     A helper class for the pagination.
@@ -49,17 +186,24 @@ class Pagination(object):
         The current jsonapi request
     :arg int total_resources:
         The total number of resources, which would have been returned without
-        the pagination.
+        the pagination or None, if the resources have not been counted.
+    :arg bool approximate:
+        True, if *total_resources* is only an estimate.
+    :arg bool has_next:
+        Tells if there is a next page, when *total_resources* is None.
 
     .. seealso::
 
         *   :attr:`jsonapi.base.request.Request.japi_page_size`
         *   :attr:`jsonapi.base.request.Request.japi_page_number`
         *   :attr:`jsonapi.base.request.Request.japi_paginate`
+        *   :data:`COUNT_STRATEGIES`
         *   http://jsonapi.org/format/#fetching-pagination
     """
 
-    def __init__(self, request, total_resources):
+    def __init__(self, request, total_resources, approximate=False,
+        has_next=False
+        ):
         """
         """
         assert request.japi_paginate
@@ -72,17 +216,27 @@ class Pagination(object):
 
         # Get the number of resources
         self.total_resources = total_resources
-        self.total_pages = math.ceil(self.total_resources/self.page_size)
+        self.approximate = approximate
+        if total_resources is not None:
+            self.total_pages = math.ceil(self.total_resources/self.page_size)
+        else:
+            self.total_pages = None
 
         # Build all links
         self.link_self = self._page_link(self.current_page, self.page_size)
         self.link_first = self._page_link(1, self.page_size)
-        self.link_last = self._page_link(self.total_pages, self.page_size)
+        if self.total_pages is not None:
+            self.link_last = self._page_link(self.total_pages, self.page_size)
+        else:
+            self.link_last = None
 
         self.has_prev = (self.current_page > 1)
         self.link_prev = self._page_link(self.current_page - 1, self.page_size)
 
-        self.has_next = (self.current_page < self.total_pages)
+        if self.total_pages is not None:
+            self.has_next = (self.current_page < self.total_pages)
+        else:
+            self.has_next = has_next
         self.link_next = self._page_link(self.current_page + 1, self.page_size)
         return None
 
@@ -106,8 +260,11 @@ class Pagination(object):
         Must be included in the top-level meta object.
         """
         d = OrderedDict()
-        d["total-pages"] = self.total_pages
-        d["total-resources"] = self.total_resources
+        if self.total_resources is not None:
+            d["total-pages"] = self.total_pages
+            d["total-resources"] = self.total_resources
+            if self.approximate:
+                d["total-approximate"] = True
         d["page"] = self.current_page
         d["page-size"] = self.page_size
         return d
@@ -120,7 +277,322 @@ class Pagination(object):
         d = OrderedDict()
         d["self"] = self.link_self
         d["first"] = self.link_first
-        d["last"] = self.link_last
+        if self.link_last is not None:
+            d["last"] = self.link_last
+        if self.has_prev:
+            d["prev"] = self.link_prev
+        if self.has_next:
+            d["next"] = self.link_next
+        return d
+
+
+class Cursor(object):
+    """
+    Describes the position of a resource in a sorted collection and is used
+    for the keyset pagination.
+
+    The *id* of the resource is always used as last sort criterion, so that
+    the position is unique, even if the values of the sort fields are not.
+
+    :arg list order:
+        The sort criteria (see :attr:`jsonapi.base.request.Request.japi_sort`)
+    :arg list values:
+        The values of the sort fields of the resource at the cursor's
+        position or None, if the cursor points to the start of the
+        collection.
+    :arg str resource_id:
+        The id of the resource at the cursor's position.
+    :arg bool before:
+        If true, the resources *before* the cursor are requested, otherwise
+        the resources *after* the cursor.
+
+    .. seealso::
+
+        *   :attr:`jsonapi.base.request.Request.japi_page_cursor`
+        *   :class:`CursorPagination`
+    """
+
+    def __init__(self, order, values=None, resource_id=None, before=False):
+        """
+        """
+        self.order = list(order)
+        self.values = values
+        self.resource_id = resource_id
+        self.before = before
+        return None
+
+    @classmethod
+    def from_resource(cls, resource, order, before=False):
+        """
+        Creates a cursor, which points to *resource*.
+
+        :arg resource:
+        :arg list order:
+        :arg bool before:
+        """
+        schema = resource._jsonapi["schema"]
+        values = [
+            schema.attributes[fieldname].get(resource)\
+            for direction, fieldname in order
+        ]
+        resource_id = schema.id_attribute.get(resource)
+        return cls(order, values, resource_id, before)
+
+    @classmethod
+    def decode(cls, api, token, order, before=False):
+        """
+        Decodes the *token* created by :meth:`encode`.
+
+        :arg jsonapi.base.api.API api:
+        :arg str token:
+        :arg list order:
+            The sort criteria of the current request. They must be the same
+            as the one used to create the token.
+        :arg bool before:
+
+        :raises ValueError:
+            If the token is invalid or has been created for another order.
+        """
+        try:
+            token = token + "="*(-len(token)%4)
+            d = api.load_json(base64.urlsafe_b64decode(token))
+        except (binascii.Error, ValueError):
+            raise ValueError("The cursor is not valid.")
+
+        if not isinstance(d, dict) \
+            or not isinstance(d.get("values"), list) \
+            or not isinstance(d.get("id"), str):
+            raise ValueError("The cursor is not valid.")
+        if d.get("sort") != cls._sort_string(order) \
+            or len(d["values"]) != len(order):
+            raise ValueError("The cursor has been created for another order.")
+        return cls(order, d["values"], d["id"], before)
+
+    @staticmethod
+    def _sort_string(order):
+        return ",".join(direction + fieldname for direction, fieldname in order)
+
+    def encode(self, api):
+        """
+        Returns the cursor as opaque, url safe token.
+
+        :arg jsonapi.base.api.API api:
+        """
+        d = OrderedDict([
+            ("sort", self._sort_string(self.order)),
+            ("values", self.values),
+            ("id", self.resource_id)
+        ])
+        token = base64.urlsafe_b64encode(api.dump_json(d))
+        return token.decode().rstrip("=")
+
+    @property
+    def query_order(self):
+        """
+        The sort criteria, which must be used to query the resources. The
+        fieldname *None* refers to the id of the resources.
+
+        *NULL* is the smallest value of a sort field, so it comes first in
+        ascending and last in descending order. The adapters must sort it
+        this way, so that it matches the :meth:`keyset`.
+
+        If the resources :attr:`before` the cursor are requested, all
+        directions are flipped and the query result must be reversed.
+        """
+        order = self.order + [("+", None)]
+        if self.before:
+            order = [
+                ("-" if direction == "+" else "+", fieldname)\
+                for direction, fieldname in order
+            ]
+        return order
+
+    def keyset(self):
+        """
+        Returns the range predicate, which selects the resources after (or
+        before) the cursor, as a disjunction of conjunctions:
+
+        .. code-block:: python3
+
+            # sort=name,-age
+            # (name > v0) or (name = v0 and age < v1)
+            #   or (name = v0 and age = v1 and id > v2)
+            [
+                [("name", "gt", v0)],
+                [("name", "eq", v0), ("age", "lt", v1)],
+                [("name", "eq", v0), ("age", "eq", v1), (None, "gt", v2)]
+            ]
+
+        The fieldname *None* refers to the id of the resources. If the cursor
+        points to the start of the collection, an empty list is returned.
+
+        A *None* value is the smallest value (see :attr:`query_order`). It
+        is compared with the operators *null* and *notnull*:
+
+        .. code-block:: python3
+
+            # sort=name, v0 is None
+            # (name IS NOT NULL) or (name IS NULL and id > v1)
+            [
+                [("name", "notnull", None)],
+                [("name", "null", None), (None, "gt", v1)]
+            ]
+
+            # sort=-name, v0 is not None
+            # (name < v0) or (name IS NULL) or (name = v0 and id > v1)
+            [
+                [("name", "lt", v0)],
+                [("name", "null", None)],
+                [("name", "eq", v0), (None, "gt", v1)]
+            ]
+        """
+        if self.values is None:
+            return list()
+
+        keys = list(zip(self.query_order, self.values + [self.resource_id]))
+
+        branches = list()
+        prefix = list()
+        for (direction, fieldname), value in keys:
+            if value is None:
+                # Only the other values are greater than NULL and no value
+                # is less than NULL.
+                if direction == "+":
+                    branches.append(prefix + [(fieldname, "notnull", None)])
+                prefix.append((fieldname, "null", None))
+            else:
+                if direction == "+":
+                    branches.append(prefix + [(fieldname, "gt", value)])
+                else:
+                    branches.append(prefix + [(fieldname, "lt", value)])
+                    branches.append(prefix + [(fieldname, "null", None)])
+                prefix.append((fieldname, "eq", value))
+        return branches
+
+
+class CursorPagination(object):
+    """
+    A helper class for the cursor (keyset) pagination.
+
+    The database is queried for ``page[size] + 1`` resources. The additional
+    resource only tells us, that there is another page and is removed
+    from :attr:`resources`. So the links can be created without counting the
+    resources.
+
+    :arg jsonapi.base.request.Request request:
+        The current jsonapi request
+    :arg list resources:
+        The resources returned by the database for the
+        :attr:`~jsonapi.base.request.Request.japi_page_cursor`. It may contain
+        one resource more than the page size.
+    :arg bool has_next:
+        Tells if there are resources after a page, which has been requested
+        with ``page[before]``. The look-ahead resource is *before* such a
+        page, so the handler must look for them with another query.
+
+    .. seealso::
+
+        *   :attr:`jsonapi.base.request.Request.japi_page_cursor`
+        *   :attr:`jsonapi.base.request.Request.japi_cursor_paginate`
+        *   http://jsonapi.org/profiles/ethanresnick/cursor-pagination/
+    """
+
+    def __init__(self, request, resources, has_next=False):
+        """
+        """
+        assert request.japi_cursor_paginate
+
+        self.request = request
+        self.cursor = request.japi_page_cursor
+        self.page_size = request.japi_page_size
+
+        # Remove the look-ahead resource.
+        has_more = len(resources) > self.page_size
+        if self.cursor.before:
+            self.resources = resources[-self.page_size:]
+            self.has_prev = has_more
+            self.has_next = has_next
+        else:
+            self.resources = resources[:self.page_size]
+            self.has_prev = self.cursor.values is not None
+            self.has_next = has_more
+
+        # We can not create a cursor without a resource.
+        if not self.resources:
+            self.has_prev = False
+            self.has_next = False
+
+        # Build all links
+        self.link_self = self._page_link(
+            after=self.request.get_query_argument("page[after]"),
+            before=self.request.get_query_argument("page[before]")
+        )
+        self.link_first = self._page_link()
+
+        if self.has_prev:
+            cursor = Cursor.from_resource(
+                self.resources[0], self.cursor.order, before=True
+            )
+            self.link_prev = self._page_link(
+                before=cursor.encode(self.request.api)
+            )
+        else:
+            self.link_prev = None
+
+        if self.has_next:
+            cursor = Cursor.from_resource(
+                self.resources[-1], self.cursor.order
+            )
+            self.link_next = self._page_link(
+                after=cursor.encode(self.request.api)
+            )
+        else:
+            self.link_next = None
+        return None
+
+    def _page_link(self, after=None, before=None):
+        """
+        Returns the uri of the current request with the new cursor. All other
+        query parameters (sorting, filters, ...) are kept.
+        """
+        parsed_uri = self.request.parsed_uri
+
+        query = [
+            (key, value) for key, values in self.request.query.items()\
+            if not key in ("page[after]", "page[before]", "page[size]")\
+            for value in values
+        ]
+        query.append(("page[size]", self.page_size))
+        if after is not None:
+            query.append(("page[after]", after))
+        if before is not None:
+            query.append(("page[before]", before))
+
+        uri = "{scheme}://{netloc}{path}?{query}".format(
+            scheme=parsed_uri.scheme,
+            netloc=parsed_uri.netloc,
+            path=parsed_uri.path,
+            query=urllib.parse.urlencode(query)
+        )
+        return uri
+
+    @cached_property
+    def json_meta(self):
+        """
+        Must be included in the top-level meta object.
+        """
+        d = OrderedDict()
+        d["page-size"] = self.page_size
+        return d
+
+    @cached_property
+    def json_links(self):
+        """
+        Must be included in the top-level links object.
+        """
+        d = OrderedDict()
+        d["self"] = self.link_self
+        d["first"] = self.link_first
         if self.has_prev:
             d["prev"] = self.link_prev
         if self.has_next:
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.query
+==================
+
+The parser for the query string of a request. The query string is scanned
+only once and the result is an immutable :class:`ParsedQuery`, which
+contains the pagination, filters, sparse fieldsets, includes and sort
+criteria.
+
+Clients usually send only a few different query strings, so the API
+memoizes the parsed queries in an LRU cache keyed by the raw query string
+(:attr:`jsonapi.base.api.API.query_cache`). Its size can be configured
+with ``settings["query_cache_size"]`` (512 by default, 0 disables the
+cache):
+
+.. code-block:: python3
+
+    api = API("/api", db, settings={"query_cache_size": 1024})
+"""
+
+# std
+import logging
+import re
+import types
+import urllib.parse
+
+# local
+from . import errors
+from .utilities import build_include_tree
+
+
+__all__ = [
+    "FILTER_KEY_RE",
+    "FILTER_VALUE_RE",
+    "FIELDS_KEY_RE",
+    "ParsedQuery",
+    "parse_query"
+]
+
+
+LOG = logging.getLogger(__file__)
+
+
+#: Matches a filter parameter, e.g. ``filter[name]`` or
+#: ``filter[author.country]``. The group captures the field name, which may
+#: be a path over relationships.
+FILTER_KEY_RE = re.compile(
+    r"filter\[([A-Za-z0-9_]+(?:\.[A-Za-z0-9_]+)*)\]"
+)
+
+#: Matches the value of a filter parameter, e.g. ``startswith:"Homer"``. The
+#: first group captures the filter name, the second the (JSON) value.
+FILTER_VALUE_RE = re.compile(
+    r"(eq|ne|lt|lte|gt|gte|in|nin|all|size|exists|iexact|contains|icontains"\
+    r"|startswith|istartswith|endswith|iendswith|match):(.*)",
+    re.DOTALL
+)
+
+#: Matches a sparse fieldset parameter, e.g. ``fields[User]``. The group
+#: captures the typename.
+FIELDS_KEY_RE = re.compile(r"fields\[([A-Za-z0-9_]+)\]")
+
+
+class ParsedQuery(object):
+    """
+    The immutable result of :func:`parse_query`. Two parsed queries are equal,
+    if their raw query strings are equal, so they can be used as dictionary
+    keys.
+
+    Invalid parameters do not raise an exception during the parsing. The
+    error is recorded instead and raised by :meth:`check`, when the parameter
+    is used. So a request, which does not need the parameter, does not fail.
+
+    :arg str raw:
+        The raw query string
+    :arg tuple arguments:
+        A tuple with the ``(key, values)`` pairs of the query string
+    :arg int page_number:
+    :arg int page_size:
+    :arg int offset:
+    :arg int limit:
+    :arg tuple filters:
+        A tuple with the ``(field, filtername, value)`` triples
+    :arg tuple fields:
+        A tuple with the ``(typename, fieldnames)`` pairs
+    :arg tuple include:
+        A tuple with the include paths
+    :arg include_tree:
+        The include paths merged into a read-only prefix tree (see
+        :func:`~jsonapi.base.utilities.build_include_tree`)
+    :arg tuple sort:
+        A tuple with the ``(direction, field)`` pairs
+    :arg dict errors:
+        Maps the name of an invalid parameter to the description of the
+        problem.
+    """
+
+    __slots__ = (
+        "raw", "arguments", "page_number", "page_size", "offset", "limit",
+        "filters", "fields", "include", "include_tree", "sort", "_errors",
+        "_hash"
+    )
+
+    def __init__(self, raw, arguments=(), page_number=None, page_size=None,
+        offset=None, limit=None, filters=(), fields=(), include=(),
+        include_tree=None, sort=(), errors=None
+        ):
+        """
+        """
+        setattr_ = super().__setattr__
+        setattr_("raw", raw)
+        setattr_("arguments", arguments)
+        setattr_("page_number", page_number)
+        setattr_("page_size", page_size)
+        setattr_("offset", offset)
+        setattr_("limit", limit)
+        setattr_("filters", filters)
+        setattr_("fields", fields)
+        setattr_("include", include)
+        setattr_("include_tree", include_tree or _EMPTY_TREE)
+        setattr_("sort", sort)
+        setattr_("_errors", errors or dict())
+        setattr_("_hash", hash(raw))
+        return None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'ParsedQuery' objects are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("'ParsedQuery' objects are immutable.")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, ParsedQuery):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __repr__(self):
+        return "ParsedQuery({!r})".format(self.raw)
+
+    def get(self, name, fallback=None):
+        """
+        Returns the (first) value of the query argument *name* or *fallback*,
+        if the argument does not exist.
+
+        :arg str name:
+        :arg fallback:
+        """
+        for key, values in self.arguments:
+            if key == name:
+                return values[0]
+        return fallback
+
+    def check(self, *names):
+        """
+        Raises the :exc:`~jsonapi.base.errors.BadRequest`, if one of the
+        parameters *names* is invalid. A name ending with ``[`` checks all
+        parameters with this prefix, e.g. ``filter[``.
+
+        :arg str names:
+        """
+        if not self._errors:
+            return None
+        for name in names:
+            if name.endswith("["):
+                keys = [key for key in self._errors if key.startswith(name)]
+            else:
+                keys = [name] if name in self._errors else []
+            for key in keys:
+                raise errors.BadRequest(
+                    detail=self._errors[key], source_parameter=key
+                )
+        return None
+
+
+#: The include tree of a query without include parameter.
+_EMPTY_TREE = types.MappingProxyType(dict())
+
+
+def _freeze_tree(tree):
+    """
+    Returns a read-only copy of the include *tree*.
+    """
+    return types.MappingProxyType({
+        relname: _freeze_tree(subtree) for relname, subtree in tree.items()
+    })
+
+
+def _parse_int(key, value, minimum, errors_):
+    """
+    Converts the *value* of the parameter *key* to an integer, which is at
+    least *minimum*. If this is not possible, the error is recorded in
+    *errors_* and None is returned.
+    """
+    try:
+        value = int(value)
+    except ValueError:
+        errors_[key] = "The '{}' must be an integer.".format(key)
+        return None
+
+    if value < minimum:
+        errors_[key] = "The '{}' must be >= {}.".format(key, minimum)
+        return None
+    return value
+
+
+def parse_query(raw, load_json):
+    """
+    Parses the query string *raw* in a single pass and returns a
+    :class:`ParsedQuery`.
+
+    :arg str raw:
+        The query string, e.g. ``include=author&sort=-created``
+    :arg load_json:
+        The function, which decodes the (JSON) filter values. Usually
+        :meth:`jsonapi.base.api.API.load_json`.
+    """
+    arguments = dict()
+    kwargs = dict()
+    filters = list()
+    fields = list()
+    errors_ = dict()
+
+    for item in raw.split("&"):
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            continue
+        key = urllib.parse.unquote_plus(key)
+        value = urllib.parse.unquote_plus(value)
+
+        # Only the first value of a parameter is used, but all values are
+        # kept in the *arguments*.
+        values = arguments.get(key)
+        if values is not None:
+            values.append(value)
+            continue
+        arguments[key] = [value]
+
+        if key == "page[number]":
+            kwargs["page_number"] = _parse_int(key, value, 1, errors_)
+        elif key == "page[size]":
+            kwargs["page_size"] = _parse_int(key, value, 1, errors_)
+        elif key == "offset":
+            kwargs["offset"] = _parse_int(key, value, 0, errors_)
+        elif key == "limit":
+            kwargs["limit"] = _parse_int(key, value, 1, errors_)
+        elif key == "include":
+            kwargs["include"] = tuple(
+                tuple(path.split(".")) for path in value.split(",") if path
+            )
+            kwargs["include_tree"] = _freeze_tree(
+                build_include_tree(kwargs["include"])
+            )
+        elif key == "sort":
+            sort = list()
+            for field in value.split(","):
+                field = field.strip()
+                if not field:
+                    continue
+                if field[0] == "-":
+                    sort.append(("-", field[1:]))
+                elif field[0] == "+":
+                    sort.append(("+", field[1:]))
+                else:
+                    sort.append(("+", field))
+            kwargs["sort"] = tuple(sort)
+        elif key.startswith("filter["):
+            key_match = FILTER_KEY_RE.fullmatch(key)
+            if key_match is None:
+                continue
+
+            value_match = FILTER_VALUE_RE.fullmatch(value)
+            if value_match is None:
+                errors_[key] = "The filter '{}' does not exist."\
+                    .format(value.partition(":")[0])
+                continue
+
+            filtername = value_match.group(1)
+            try:
+                filtervalue = load_json(value_match.group(2))
+            except Exception as err:
+                LOG.debug(err, exc_info=False)
+                errors_[key] = "The value of the filter '{}' is not a "\
+                    "JSON object.".format(filtername)
+                continue
+            filters.append((key_match.group(1), filtername, filtervalue))
+        elif key.startswith("fields["):
+            key_match = FIELDS_KEY_RE.fullmatch(key)
+            if key_match is None:
+                continue
+
+            type_fields = tuple(
+                item.strip() for item in value.split(",") if item.strip()
+            )
+            fields.append((key_match.group(1), type_fields))
+
+    return ParsedQuery(
+        raw,
+        arguments=tuple(
+            (key, tuple(values)) for key, values in arguments.items()
+        ),
+        filters=tuple(filters),
+        fields=tuple(fields),
+        errors=errors_,
+        **kwargs
+    )
@@ -29,14 +29,12 @@ jsonapi.base.request
 
 # std
 import logging
-import re
 import urllib.parse
 
-# third party
-from cached_property import cached_property
-
 # local
 from . import errors
+from .pagination import Cursor
+from .utilities import cached_slot_property
 
 
 LOG = logging.getLogger(__file__)
@@ -47,25 +45,56 @@ __all__ = [
 ]
 
 
+# Maps a header name to its lowercase version, so that the lowercase names
+# are shared by all requests. Clients may send arbitrary names, so only the
+# first names are memoized.
+_LOWER_HEADER_NAMES = dict()
+_LOWER_HEADER_NAMES_MAX = 256
+
+
+def _lower_header_name(name):
+    """
+    Returns the lowercase version of the header *name*.
+    """
+    lower = _LOWER_HEADER_NAMES.get(name)
+    if lower is None:
+        lower = name.lower()
+        if len(_LOWER_HEADER_NAMES) < _LOWER_HEADER_NAMES_MAX:
+            _LOWER_HEADER_NAMES[name] = lower
+    return lower
+
+
 class Request(object):
     """
     Wraps a request object, which can be used to call the View class.
 
     :arg str uri:
     :arg str method:
-    :arg dict headers:
+    :arg headers:
+        A :class:`dict` or the case insensitive headers object of the web
+        framework (see :attr:`headers`).
     :arg bytes body:
     :arg jsonapi.base.api.API api:
         The api, which handles this request. If None, the api will set the
         attribute in :meth:`jsonapi.base.api.API.handle_request`.
     """
 
+    __slots__ = (
+        "api", "uri", "method", "body", "japi_uri_arguments", "_raw_headers",
+        "_headers", "_parsed_uri", "_parsed_query", "_query", "_content_type",
+        "_accept_media_type", "_japi_page_number", "_japi_page_size",
+        "_japi_page_limit", "_japi_page_offset", "_japi_paginate",
+        "_japi_cursor_paginate", "_japi_page_cursor", "_japi_offset",
+        "_japi_limit", "_japi_filters", "_japi_fields", "_japi_include",
+        "_japi_include_tree", "_japi_sort", "_json", "_has_json"
+    )
+
     def __init__(self, uri, method, headers, body, api=None):
         self.api = api
         self.uri = uri
         self.method = method.lower()
-        self.headers = {key.lower(): value for key, value in headers.items()}
         self.body = body
+        self._raw_headers = headers
 
         #: Contains parameters, which are encoded into the URI.
         #: For example a resource uri: ``http://localhost:5000/api/User/1``
@@ -75,19 +104,49 @@ class Request(object):
         self.japi_uri_arguments = dict()
         return None
 
-    @cached_property
+    @cached_slot_property
+    def headers(self):
+        """
+        Returns the headers of the request. A :class:`dict` is copied with
+        lowercase keys, when the headers are used the first time, unless
+        all keys are already lowercase. Other mappings, like the headers of
+        *werkzeug* and *tornado*, are case insensitive and used directly.
+        """
+        headers = self._raw_headers
+        if isinstance(headers, dict) \
+            and not all(key.islower() for key in headers):
+            headers = {
+                _lower_header_name(key): value\
+                for key, value in headers.items()
+            }
+        self._raw_headers = None
+        return headers
+
+    @cached_slot_property
     def parsed_uri(self):
         """
         Returns a tuple with the uri components.
         """
         return urllib.parse.urlparse(self.uri)
 
-    @cached_property
+    @cached_slot_property
+    def parsed_query(self):
+        """
+        Returns the :class:`~jsonapi.base.query.ParsedQuery` of the query
+        string.
+
+        :seealso: :meth:`jsonapi.base.api.API.parse_query`
+        """
+        return self.api.parse_query(self.parsed_uri.query)
+
+    @cached_slot_property
     def query(self):
         """
         Returns a dictionary which maps a query key to its values.
         """
-        query = urllib.parse.parse_qs(self.parsed_uri.query)
+        query = {
+            key: list(values) for key, values in self.parsed_query.arguments
+        }
         return query
 
     def get_query_argument(self, name, fallback=None):
@@ -98,10 +157,9 @@ class Request(object):
         :arg str name:
         :arg fallback:
         """
-        value = self.query.get(name)
-        return value[0] if value else fallback
+        return self.parsed_query.get(name, fallback)
 
-    @cached_property
+    @cached_slot_property
     def content_type(self):
         """
         Returns a tuple, with the media type and the parameters.
@@ -125,7 +183,38 @@ class Request(object):
             parameters[i] = parameter
         return (type_, dict(parameters))
 
-    @cached_property
+    @cached_slot_property
+    def accept_media_type(self):
+        """
+        Returns the media type of the response document, which is negotiated
+        with the *Accept* header. This is the supported media type (see
+        :attr:`jsonapi.base.api.API.media_codecs`) with the highest quality
+        value and ``application/vnd.api+json`` by default.
+        """
+        best = "application/vnd.api+json"
+        best_quality = 0.0
+
+        accept = self.headers.get("accept", "")
+        for item in accept.split(","):
+            media_type, *parameters = item.split(";")
+            media_type = media_type.strip().lower()
+            if not media_type in self.api.media_codecs:
+                continue
+
+            quality = 1.0
+            for parameter in parameters:
+                key, _, value = parameter.partition("=")
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > best_quality:
+                best = media_type
+                best_quality = quality
+        return best
+
+    @cached_slot_property
     def japi_page_number(self):
         """
         Returns the number of the requested page or None.
@@ -139,26 +228,10 @@ class Request(object):
 
         :seealso: http://jsonapi.org/format/#fetching-pagination
         """
-        tmp = self.get_query_argument("page[number]")
-
-        # Try to convert it to an integer and make sure it is >= 1.
-        if tmp is not None:
-            try:
-                tmp = int(tmp)
-            except:
-                raise errors.BadRequest(
-                    detail="The 'page[number]' must be an integer.",
-                    source_parameter="page[number]"
-                )
-
-            if tmp < 1:
-                raise errors.BadRequest(
-                    detail="The 'page[number]' must be >= 1.",
-                    source_parameter="page[number]"
-                )
-        return tmp
-
-    @cached_property
+        self.parsed_query.check("page[number]")
+        return self.parsed_query.page_number
+
+    @cached_slot_property
     def japi_page_size(self):
         """
         Returns the size of the pages or None.
@@ -172,33 +245,17 @@ class Request(object):
 
         :seealso: http://jsonapi.org/format/#fetching-pagination
         """
-        tmp = self.get_query_argument("page[size]")
-
-        # Try to convert it to an integer and make sure, it is >= 1.
-        if tmp is not None:
-            try:
-                tmp = int(tmp)
-            except:
-                raise errors.BadRequest(
-                    detail="The 'page[size]' must be an integer.",
-                    source_parameter="page[size]"
-                )
-
-            if tmp < 1:
-                raise errors.BadRequest(
-                    detail="The 'page[size]' must be >= 1.",
-                    source_parameter="page[size]"
-                )
-        return tmp
-
-    @cached_property
+        self.parsed_query.check("page[size]")
+        return self.parsed_query.page_size
+
+    @cached_slot_property
     def japi_page_limit(self):
         """
         Returns the limit based on the :attr:`japi_page_size`
         """
         return self.japi_page_size if self.japi_paginate else None
 
-    @cached_property
+    @cached_slot_property
     def japi_page_offset(self):
         """
         Returns the offset based on the :attr:`japi_page_size` and
@@ -209,7 +266,7 @@ class Request(object):
         else:
             return None
 
-    @cached_property
+    @cached_slot_property
     def japi_paginate(self):
         """
         Returns True, if the result should be paginated.
@@ -225,7 +282,84 @@ class Request(object):
         return self.japi_page_size is not None \
             and self.japi_page_number is not None
 
-    @cached_property
+    @cached_slot_property
+    def japi_cursor_paginate(self):
+        """
+        Returns True, if the result should be paginated with a cursor. This
+        is the case, if ``page[after]`` or ``page[before]`` is present. If
+        :attr:`jsonapi.base.api.API.cursor_pagination` is enabled, a
+        ``page[size]`` without ``page[number]`` requests the first page, too.
+
+        :raises jsonapi.base.errors.BadRequest:
+            If ``page[number]`` is combined with a cursor.
+
+        .. seealso::
+
+            *   :attr:`japi_page_cursor`
+            *   :class:`jsonapi.base.pagination.CursorPagination`
+        """
+        query = self.parsed_query
+        has_cursor = query.get("page[after]") is not None \
+            or query.get("page[before]") is not None
+        if has_cursor and query.get("page[number]") is not None:
+            raise errors.BadRequest(
+                detail="The 'page[number]' can not be combined with a cursor.",
+                source_parameter="page[number]"
+            )
+        return has_cursor or (
+            self.api.cursor_pagination and self.japi_page_size is not None \
+            and self.japi_page_number is None
+        )
+
+    @cached_slot_property
+    def japi_page_cursor(self):
+        """
+        Returns the :class:`~jsonapi.base.pagination.Cursor`, which describes
+        the requested page, if :attr:`japi_cursor_paginate` is true and None
+        otherwise.
+
+        Query parameters: ``page[after]``, ``page[before]``
+
+        :raises jsonapi.base.errors.BadRequest:
+            If both, ``page[after]`` and ``page[before]`` are given
+        :raises jsonapi.base.errors.BadRequest:
+            If the cursor is invalid
+        :raises jsonapi.base.errors.BadRequest:
+            If ``page[size]`` is missing
+        """
+        if not self.japi_cursor_paginate:
+            return None
+
+        after = self.get_query_argument("page[after]")
+        before = self.get_query_argument("page[before]")
+        if after is not None and before is not None:
+            raise errors.BadRequest(
+                detail="Only one of 'page[after]' and 'page[before]' can be "\
+                    "used.",
+                source_parameter="page[before]"
+            )
+        if self.japi_page_size is None:
+            raise errors.BadRequest(
+                detail="The cursor pagination requires a 'page[size]'.",
+                source_parameter="page[size]"
+            )
+
+        if after is not None:
+            token, key = after, "page[after]"
+        elif before is not None:
+            token, key = before, "page[before]"
+        else:
+            return Cursor(self.japi_sort)
+
+        try:
+            cursor = Cursor.decode(
+                self.api, token, self.japi_sort, before=(before is not None)
+            )
+        except ValueError as err:
+            raise errors.BadRequest(detail=str(err), source_parameter=key)
+        return cursor
+
+    @cached_slot_property
     def japi_offset(self):
         """
         Return the offset when querying a collection.
@@ -239,31 +373,18 @@ class Request(object):
         :raises jsonapi.base.errors.BadRequest:
             If the offset is greater than the page size
         """
-        offset = self.get_query_argument("offset")
-
-        if offset is not None:
-            try:
-                offset = int(offset)
-            except:
-                raise errors.BadRequest(
-                    detail="The 'offset' must be an integer.",
-                    source_parameter="offset"
-                )
-
-            if offset < 0:
-                raise errors.BadRequest(
-                    detail="The 'offset' must be >= 0.",
-                    source_parameter="offset"
-                )
-
-            if self.japi_paginate and offset >= self.japi_page_size:
-                raise errors.BadRequest(
-                    detail="The 'offset' must be less than the 'page[size]'.",
-                    source_parameter="offset"
-                )
+        self.parsed_query.check("offset")
+        offset = self.parsed_query.offset
+
+        if offset is not None and self.japi_paginate \
+            and offset >= self.japi_page_size:
+            raise errors.BadRequest(
+                detail="The 'offset' must be less than the 'page[size]'.",
+                source_parameter="offset"
+            )
         return offset
 
-    @cached_property
+    @cached_slot_property
     def japi_limit(self):
         """
         Extracts the limit parameter from the url query string and returns it.
@@ -275,27 +396,14 @@ class Request(object):
         :raises jsonapi.base.errors.BadRequest:
             If the limit is not >= 0
         """
-        limit = self.get_query_argument("limit")
+        self.parsed_query.check("limit")
+        limit = self.parsed_query.limit
 
         if limit is None and self.japi_paginate:
             limit = self.japi_page_size
-        elif limit is not None:
-            try:
-                limit = int(limit)
-            except:
-                raise errors.BadRequest(
-                    detail="The 'limit' must be an integer.",
-                    source_parameter="limit"
-                )
-
-            if limit < 1:
-                raise errors.BadRequest(
-                    detail="The 'limit' must be >= 1.",
-                    source_parameter="limit"
-                )
         return limit
 
-    @cached_property
+    @cached_slot_property
     def japi_filters(self):
         """
         Returns a dictionary, which maps field names to the filter rules applied
@@ -338,60 +446,24 @@ class Request(object):
             >>> request.japi_filters
             ... [("email", "startswith", "lisa"), ("age", "lt", 20)]
 
+        The field name may be a path over relationships. The database
+        adapters, which support it, filter by the related resources:
+
+        .. code-block:: python3
+
+            >>> # /api/Post/?filter[author.country]=eq:'DE'
+            >>> request.japi_filters
+            ... [("author.country", "eq", "DE")]
+
         :raises jsonapi.base.errors.BadRequest:
             If a filtername is used, which does not exist.
         :raises jsonapi.base.errors.BadRequest:
             If the value of a filter is not a JSON object.
         """
-        filters = list()
-
-        KEY_RE = re.compile(r"filter\[([A-z0-9_]+)\]")
-
-        # The first group captures the filters, the second captures the value.
-        VALUE_RE = re.compile(
-            r"(eq:|ne:|lt:|lte:|gt:|gte:|in:|nin:|all:|exists:|iexact:"\
-            r"|contains:|icontains:|startswith:|istartswith:|endswith:"\
-            r"|iendswith:)(.*)"
-        )
+        self.parsed_query.check("filter[")
+        return list(self.parsed_query.filters)
 
-        for key, values in self.query.items():
-            key_match = re.fullmatch(KEY_RE, key)
-            value_match = re.fullmatch(VALUE_RE, values[0])
-
-            # If the key indicates a filter, but the filtername does not exist,
-            # throw a BadRequest exception.
-            if key_match and not value_match:
-                filtername = value_match.group(1)
-                filtername = filtername[:-1]
-                raise errors.BadRequest(
-                    detail="The filter '{}' does not exist.".format(filtername),
-                    source_parameter=key
-                )
-            # The key indicates a filter and the filternames exists.
-            elif key_match and value_match:
-                field = key_match.group(1)
-
-                # Remove the tailing ":" from the filter.
-                filtername = value_match.group(1)
-                filtername = filtername[:-1]
-
-                # The value may be encoded as json.
-                value = value_match.group(2)
-                try:
-                    value = self.api.load_json(value)
-                except Exception as err:
-                    LOG.debug(err, exc_info=False)
-                    raise errors.BadRequest(
-                        detail="The value of the filter '{}' is not a JSON "\
-                            "object.".format(filtername),
-                        source_parameter=key
-                    )
-
-                # Add the filter.
-                filters.append((field, filtername, value))
-        return filters
-
-    @cached_property
+    @cached_slot_property
     def japi_fields(self):
         """
         Returns the fields, which should be included in the response
@@ -405,23 +477,13 @@ class Request(object):
 
         :seealso: http://jsonapi.org/format/#fetching-sparse-fieldsets
         """
-        fields = dict()
-
-        FIELDS_RE = re.compile(r"fields\[([A-z0-9_]+)\]")
-
-        for key, value in self.query.items():
-            match = re.fullmatch(FIELDS_RE, key)
-            if match:
-                typename = match.group(1)
-                type_fields = value[0].split(",")
-                type_fields = [
-                    item.strip() for item in type_fields if item.strip()
-                ]
-
-                fields[typename] = type_fields
+        fields = {
+            typename: list(type_fields)\
+            for typename, type_fields in self.parsed_query.fields
+        }
         return fields
 
-    @cached_property
+    @cached_slot_property
     def japi_include(self):
         """
         Returns the names of the relationships, which should be included into
@@ -435,11 +497,26 @@ class Request(object):
 
         :seealso: http://jsonapi.org/format/#fetching-includes
         """
-        include = self.get_query_argument("include", "")
-        include = [path.split(".") for path in include.split(",") if path]
+        include = [list(path) for path in self.parsed_query.include]
         return include
 
-    @cached_property
+    @cached_slot_property
+    def japi_include_tree(self):
+        """
+        Returns the include paths merged into a read-only prefix tree. It is
+        built only once per query string.
+
+        .. code-block:: python3
+
+            >>> # /api/Post?include=author,comments.author
+            >>> req.japi_include_tree
+            ... {"author": {}, "comments": {"author": {}}}
+
+        :seealso: :func:`jsonapi.base.utilities.build_include_tree`
+        """
+        return self.parsed_query.include_tree
+
+    @cached_slot_property
     def japi_sort(self):
         """
         Returns a list with two tuples, describing how the output should be
@@ -450,40 +527,27 @@ class Request(object):
             >>> # /api/Post?sort=name,-age
             ... [("+", "name"), ("-", "age")]
 
+            >>> # /api/Post?sort=author.name
+            ... [("+", "author.name")]
+
         :seealso: http://jsonapi.org/format/#fetching-sorting
         """
-        tmp = self.get_query_argument("sort")
-        tmp = tmp.split(",") if tmp else list()
-
-        sort = list()
-        for field in tmp:
-            field = field.strip()
-            if field[0] == "-":
-                sort.append(("-", field[1:]))
-            elif field[0] == "+":
-                sort.append(("+", field[1:]))
-            else:
-                sort.append(("+", field))
-        return sort
-
-    @cached_property
+        return list(self.parsed_query.sort)
+
+    @cached_slot_property
     def json(self):
         """
-        Parses the :attr:`body` and returns the result.
+        Parses the :attr:`body` with the codec for its *Content-Type* and
+        returns the result.
 
         .. seealso::
 
             *   :attr:`has_json`
-            *   :meth:`jsonapi.base.api.API.load_json`
+            *   :meth:`jsonapi.base.api.API.load_document`
         """
         try:
-            if not isinstance(self.body, str):
-                text = self.body.decode()
-            else:
-                text = self.body
-
-            json = self.api.load_json(text)
-        except (UnicodeDecodeError, ValueError) as err:
+            json = self.api.load_document(self.body, self.content_type[0])
+        except ValueError as err:
             LOG.debug(err, exc_info=False)
             json = None
             self.has_json = False
@@ -491,7 +555,7 @@ class Request(object):
             self.has_json = True
         return json
 
-    @cached_property
+    @cached_slot_property
     def has_json(self):
         """
         Returns True, if the body contains a json document.
@@ -517,6 +581,7 @@ class Request(object):
         print("\t", "japi_page_number", self.japi_page_number)
         print("\t", "japi_page_size", self.japi_page_size)
         print("\t", "japi_paginate", self.japi_paginate)
+        print("\t", "japi_cursor_paginate", self.japi_cursor_paginate)
         print("\t", "japi_offset", self.japi_offset)
         print("\t", "japi_limit", self.japi_limit)
         print("\t", "japi_filters", self.japi_filters)
@@ -27,6 +27,9 @@ jsonapi.base.response
 =====================
 """
 
+# std
+import zlib
+
 __all__ = [
     "Response"
 ]
@@ -42,15 +45,24 @@ class Response(object):
         A dictionary containing all headers of the response.
     :arg bytes body:
         The body of the http response as bytes. This attribute maybe None.
+        A large body may also be an iterable, which yields the body in
+        chunks of bytes (see :attr:`is_stream`).
     :arg file:
         If not None, this is a file like object or a filename.
     """
 
+    __slots__ = ("status", "headers", "body", "file", "cache_tags")
+
     def __init__(self, status=200, headers=None, body=None, file=None):
         self.status = status
         self.headers = headers if headers is not None else dict()
         self.body = body
         self.file = file
+
+        #: A set with the typenames and identifiers of the resources, which
+        #: contributed to the body, or None. Only a tagged response can be
+        #: stored in the :class:`~jsonapi.base.cache.ResponseCache`.
+        self.cache_tags = None
         return None
 
     @property
@@ -60,6 +72,18 @@ class Response(object):
         """
         return self.body is not None
 
+    @property
+    def is_stream(self):
+        """
+        Returns true, if the body is an iterable, which yields the body in
+        chunks of bytes. The chunks should be sent to the client as soon as
+        they are available.
+
+        :seealso: :meth:`jsonapi.base.api.API.dump_json_iter`
+        """
+        return self.body is not None \
+            and not isinstance(self.body, (bytes, str))
+
     @property
     def is_file(self):
         """
@@ -68,6 +92,49 @@ class Response(object):
         """
         return self.file is not None
 
+    def compress(self, encoding, level=6):
+        """
+        Compresses the body with the content coding *encoding* and sets the
+        *Content-Encoding* header. A streamed body is compressed chunk by
+        chunk, while it is sent.
+
+        :arg str encoding:
+            *gzip* or *deflate*
+        :arg int level:
+            The compression level (1-9).
+        """
+        assert encoding in ("gzip", "deflate")
+        assert self.has_body
+
+        # gzip: 16 + window size, deflate: zlib format
+        wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+        if self.is_stream:
+            self.body = self._compress_stream(self.body, compressor)
+        else:
+            body = self.body
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.body = compressor.compress(body) + compressor.flush()
+
+        self.headers["content-encoding"] = encoding
+        return None
+
+    @staticmethod
+    def _compress_stream(chunks, compressor):
+        """
+        Yields the compressed *chunks*.
+        """
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+        return None
+
     def print(self):
         """
         Prints information about the response object. This method is only
@@ -78,7 +145,7 @@ class Response(object):
         print("\t", "status", self.status)
         print("\t", "headers", self.headers)
         print("\t", "body")
-        print(self.body)
+        print(self.body if not self.is_stream else "<stream>")
         print("\t", "is_file", self.is_file)
         print("\t", "file", self.file)
         return None
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Benedikt Schmitt
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+jsonapi.base.router
+===================
+
+The :class:`Router` finds the handler for a request path. The routes are
+stored in a tree of path segments, so a lookup needs only one step per
+segment of the path, no matter how many types are registered. The first
+segment, usually the typename, is resolved with a single dictionary lookup. The typename
+segment only matches typenames known to the API, so requests for unknown
+types or with malformed paths are rejected before a handler or a database
+session is created.
+"""
+
+# std
+import re
+import urllib.parse
+
+
+__all__ = [
+    "NAME_RE",
+    "ID_RE",
+    "Router"
+]
+
+
+#: Matches a typename or relationship name segment.
+NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+
+#: Matches a resource id segment (the unreserved characters of RFC 3986).
+ID_RE = re.compile(r"[A-Za-z0-9_.~-]+")
+
+
+def _is_name(segment):
+    """
+    Returns True, if the *segment* matches :data:`NAME_RE`. Most names are
+    identifiers, which are checked without the regular expression.
+    """
+    return (segment.isidentifier() and segment.isascii()) \
+        or NAME_RE.fullmatch(segment) is not None
+
+
+def _is_id(segment):
+    """
+    Returns True, if the *segment* matches :data:`ID_RE`. Most ids are
+    alphanumeric, which is checked without the regular expression.
+    """
+    return (segment.isalnum() and segment.isascii()) \
+        or ID_RE.fullmatch(segment) is not None
+
+
+class _Node(object):
+    """
+    A node in the route tree.
+    """
+
+    __slots__ = (
+        "children", "parameter", "parameter_node", "is_valid", "handler"
+    )
+
+    def __init__(self):
+        #: Maps a literal segment to the next node.
+        self.children = dict()
+
+        #: The name of the parameter segment, which follows, the next node
+        #: and the function, which returns true, if a segment is a valid
+        #: value.
+        self.parameter = None
+        self.parameter_node = None
+        self.is_valid = None
+
+        #: The handler of the route, which ends at this node.
+        self.handler = None
+        return None
+
+
+class Router(object):
+    """
+    Maps the request paths below the API root to the handlers.
+
+    A route pattern is a list of segments, which are either literals or
+    parameters (``"<name>"``). The value of a parameter must match the
+    regular expression in :attr:`parameters`. The ``<type>`` parameter
+    matches only the typenames added with :meth:`add_typename`.
+
+    .. code-block:: python3
+
+        router = Router("/api")
+        router.add_typename("User")
+        router.add_route("<type>/<id>", ResourceHandler)
+
+        router.match("/api/User/1")
+        (ResourceHandler, {"type": "User", "id": "1"})
+
+    :arg str base_uri:
+        The root uri of the API. Only its path is used.
+    """
+
+    def __init__(self, base_uri):
+        """
+        """
+        path = urllib.parse.urlparse(base_uri).path.strip("/")
+        self._prefix = "/" + path + "/" if path else "/"
+        self._prefix_length = len(self._prefix)
+
+        #: The typenames, which are matched by the ``<type>`` parameter.
+        self.typenames = set()
+
+        #: Maps the name of a parameter to the regular expression, which
+        #: validates its value. Parameters without an expression match every
+        #: non-empty segment.
+        self.parameters = {
+            "id": ID_RE,
+            "relname": NAME_RE
+        }
+
+        self._root = _Node()
+
+        # Maps the first segment of a path to a tuple
+        # ``(parameter, node, ambiguous)``. It contains the literals and the
+        # typenames, if the routes start with ``<type>``, so that the first
+        # segment is resolved with a single lookup. Built by *match()*.
+        self._first = None
+        return None
+
+    def add_typename(self, typename):
+        """
+        Adds a typename, which is matched by the ``<type>`` parameter.
+
+        :arg str typename:
+        """
+        self.typenames.add(typename)
+        self._first = None
+        return None
+
+    def _validator(self, name):
+        """
+        Returns the function, which checks the value of the parameter *name*.
+        """
+        if name == "type":
+            return self.typenames.__contains__
+        regex = self.parameters.get(name)
+        if regex is None:
+            return bool
+        elif regex is NAME_RE:
+            return _is_name
+        elif regex is ID_RE:
+            return _is_id
+        return regex.fullmatch
+
+    def add_route(self, pattern, handler):
+        """
+        Adds the route with the *pattern* (e.g.
+        ``"<type>/<id>/relationships/<relname>"``), which is handled by
+        *handler*.
+
+        :arg str pattern:
+        :arg handler:
+
+        :raises ValueError:
+            If two different parameters follow the same segment.
+        """
+        node = self._root
+        for segment in pattern.strip("/").split("/"):
+            if segment.startswith("<") and segment.endswith(">"):
+                name = segment[1:-1]
+                if node.parameter is None:
+                    node.parameter = name
+                    node.parameter_node = _Node()
+                    node.is_valid = self._validator(name)
+                elif node.parameter != name:
+                    raise ValueError(
+                        "The parameters '{}' and '{}' are ambiguous."\
+                        .format(node.parameter, name)
+                    )
+                node = node.parameter_node
+            else:
+                node = node.children.setdefault(segment, _Node())
+        node.handler = handler
+        self._first = None
+        return None
+
+    def _build_first(self):
+        """
+        Returns the lookup table for the first segment of a path.
+        """
+        root = self._root
+        first = dict()
+        if root.parameter == "type":
+            for typename in self.typenames:
+                first[typename] = ("type", root.parameter_node, False)
+
+        # A literal takes precedence over a parameter.
+        for segment, child in root.children.items():
+            ambiguous = root.parameter is not None \
+                and root.is_valid(segment)
+            first[segment] = (None, child, ambiguous)
+
+        self._first = first
+        return first
+
+    def match(self, path):
+        """
+        Returns a tuple ``(handler, arguments)`` with the handler for the
+        request *path* and the values of the parameters or None, if no route
+        matches. A trailing ``/`` is ignored.
+
+        The tree is walked segment by segment. The first segment is looked
+        up in a table with the literals and typenames. A literal segment
+        takes precedence over a parameter. The parameter is only tried, if
+        the route of the literal does not match the rest of the path.
+
+        :arg str path:
+        """
+        if not path.startswith(self._prefix):
+            return None
+        first, sep, rest = path[self._prefix_length:].partition("/")
+
+        table = self._first
+        if table is None:
+            table = self._build_first()
+
+        entry = table.get(first)
+        if entry is not None:
+            parameter, node, ambiguous = entry
+        else:
+            root = self._root
+            if root.parameter is None or not root.is_valid(first):
+                return None
+            parameter = root.parameter
+            node = root.parameter_node
+            ambiguous = False
+        arguments = {parameter: first} if parameter is not None else dict()
+
+        # Usually, no literal competes with a parameter, so we can follow
+        # the path without remembering the alternatives.
+        segments = rest.split("/") if rest else ()
+        if segments and not segments[-1]:
+            segments.pop()
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is not None:
+                ambiguous = ambiguous or node.parameter is not None
+                node = child
+            elif node.parameter is not None and node.is_valid(segment):
+                arguments[node.parameter] = segment
+                node = node.parameter_node
+            else:
+                break
+        else:
+            if node.handler is not None:
+                return (node.handler, arguments)
+
+        if ambiguous:
+            segments = [first]
+            segments.extend(rest.split("/") if rest else ())
+            if len(segments) > 1 and not segments[-1]:
+                segments.pop()
+            return self._backtrack(self._root, segments, 0, dict())
+        return None
+
+    def _backtrack(self, node, segments, i, arguments):
+        """
+        Tries the literal and the parameter routes starting at *node* for
+        the *segments* ``i:``.
+        """
+        if i == len(segments):
+            return (node.handler, arguments) if node.handler else None
+
+        segment = segments[i]
+        child = node.children.get(segment)
+        if child is not None:
+            route = self._backtrack(child, segments, i + 1, arguments)
+            if route is not None:
+                return route
+
+        if node.parameter is not None and node.is_valid(segment):
+            arguments = dict(arguments)
+            arguments[node.parameter] = segment
+            return self._backtrack(
+                node.parameter_node, segments, i + 1, arguments
+            )
+        return None
@@ -38,6 +38,9 @@ class, this schema is **not** implemented as meta class.
     *   :mod:`jsonapi.marker.property` to decorate properties
 """
 
+# local
+from .utilities import ensure_identifier
+
 
 __all__ = [
     "Attribute",
@@ -138,6 +141,35 @@ class BaseRelationship(object):
         """
         raise NotImplementedError()
 
+    def get_identifiers(self, resource):
+        """
+        **Can be overridden** for performance reasons.
+
+        Returns the identifier tuples ``(typename, id)`` of the relatives
+        without loading them, if possible. A *to-one* relationship returns
+        a single identifier or None, a *to-many* relationship a list.
+
+        The default implementation loads the relatives with :meth:`get`.
+        """
+        if self.to_one:
+            relative = self.get(resource)
+            return ensure_identifier(relative) if relative is not None \
+                else None
+        return [ensure_identifier(relative) for relative in self.get(resource)]
+
+    def get_identifiers_many(self, resources):
+        """
+        **Can be overridden** for performance reasons.
+
+        Does the same as :meth:`get_identifiers`, but for a whole page of
+        *resources* at once and returns a list with the identifiers of each
+        resource in the same order. An implementation should fetch the
+        identifiers with one query.
+
+        :arg list resources:
+        """
+        return [self.get_identifiers(resource) for resource in resources]
+
 
 class ToOneRelationship(BaseRelationship):
     """
@@ -283,6 +315,15 @@ class Schema(object):
         self.id_attribute = None
         """The :class:`IDAttribute` marker."""
 
+        self.version_attribute = None
+        """
+        An attribute, whose value changes with every update of a resource
+        (e.g. a version counter or a modification timestamp) or None. It is
+        part of the key in the :class:`~jsonapi.base.cache.FragmentCache`, so
+        that changes, which are not made through the API, are noticed too.
+        It must have a *get()* method, like :class:`Attribute`.
+        """
+
         self.attributes = dict()
         """
         A dictionary, which maps the attributes names to the :class:`Attribute`
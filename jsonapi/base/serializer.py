@@ -31,17 +31,20 @@ A JSONapi serializer and unserializer based on the
 """
 
 # std
-from collections import OrderedDict
+from itertools import islice
 import logging
 
 # local
 from . import errors
-from .utilities import ensure_identifier_object
 
 
 __all__ = [
     "Unserializer",
-    "Serializer"
+    "relationship_object",
+    "SerializationPlan",
+    "Serializer",
+    "iter_serialize_many",
+    "serialize_many"
 ]
 
 
@@ -60,23 +63,14 @@ class Unserializer(object):
         self.schema = schema
         return None
 
-    def _load_relationships_object(self, db, relationships_object):
+    def _relationships_identifiers(self, relationships_object):
         """
-        Loads all resources referenced in the JSONapi relationships object
-        *relationships_object* and returns a dictionary, which maps the
-        relationship names to the related resources.
+        Returns the set of all identifier tuples in the JSONapi relationships
+        object *relationships_object*.
 
-        :arg jsonapi.base.database.Session db:
-            The database session used to query the related resources.
         :arg dict relationships_object:
             A JSONapi relationships object
-
-        :raises jsonapi.base.errors.NotFound:
-            If a relative does not exist.
-
-        :seealso: http://jsonapi.org/format/#document-resource-object-relationships
         """
-        # Collect the identifiers.
         identifiers = set()
         for relname, relobj in relationships_object.items():
             reldata = relobj.get("data")
@@ -92,8 +86,26 @@ class Unserializer(object):
                 identifiers.update(
                     (item["type"], item["id"]) for item in reldata
                 )
+        return identifiers
+
+    def _load_relationships_object(self, db, relationships_object):
+        """
+        Loads all resources referenced in the JSONapi relationships object
+        *relationships_object* and returns a dictionary, which maps the
+        relationship names to the related resources.
+
+        :arg jsonapi.base.database.Session db:
+            The database session used to query the related resources.
+        :arg dict relationships_object:
+            A JSONapi relationships object
+
+        :raises jsonapi.base.errors.NotFound:
+            If a relative does not exist.
 
+        :seealso: http://jsonapi.org/format/#document-resource-object-relationships
+        """
         # Load the resources
+        identifiers = self._relationships_identifiers(relationships_object)
         relatives = db.get_many(identifiers, required=True)
 
         # Map the relationship names back to the related resources.
@@ -179,12 +191,18 @@ class Unserializer(object):
             except errors.ErrorList as err:
                 error_list.extend(err)
 
-        # Update the relationships
+        # Update the relationships. All relatives are loaded at once.
         if "relationships" in resource_object:
             rels_object = resource_object["relationships"]
+            identifiers = self._relationships_identifiers(rels_object)
+            relatives = dict()
+            if identifiers:
+                relatives = db.get_many(identifiers)
             for rel_name, rel_object in rels_object.items():
                 try:
-                    self.update_relationship(db, resource, rel_name, rel_object)
+                    self._set_relationship(
+                        resource, rel_name, rel_object, relatives
+                    )
                 except errors.Error as err:
                     error_list.append(err)
                 except errors.ErrorList as err:
@@ -244,6 +262,36 @@ class Unserializer(object):
         :seealso: http://jsonapi.org/format/#document-resource-object-relationships
         :seealso: http://jsonapi.org/format/#crud-updating-relationships
         """
+        identifiers = self._relationships_identifiers(
+            {relationship_name: relationship_object}
+        )
+        relatives = db.get_many(identifiers) if identifiers else dict()
+        self._set_relationship(
+            resource, relationship_name, relationship_object, relatives
+        )
+        return None
+
+    def _set_relationship(
+        self, resource, relationship_name, relationship_object, relatives
+        ):
+        """
+        Updates the relationship with the name *relationship_name* of the
+        resource *resource* using the JSONapi relationship object
+        *relationship_object* and the already loaded *relatives*.
+
+        :arg resource:
+        :arg str relationship_name:
+        :arg dict relationship_object:
+        :arg dict relatives:
+            Maps the identifier tuples in *relationship_object* to the
+            resources (see :meth:`jsonapi.base.database.Session.get_many`).
+
+        :raises jsonapi.base.errors.ResourceNotFound:
+            If a *to-one* relative does not exist.
+        :raises jsonapi.base.errors.ErrorList:
+            With a :exc:`~jsonapi.base.errors.ResourceNotFound` error for
+            each *to-many* relative, which does not exist.
+        """
         relationship = self.schema.relationships[relationship_name]
 
         # Break if no data key is given.
@@ -257,7 +305,9 @@ class Unserializer(object):
                 relative = None
             else:
                 identifier = (identifier["type"], identifier["id"])
-                relative = db.get(identifier, required=True)
+                relative = relatives.get(identifier)
+                if relative is None:
+                    raise errors.ResourceNotFound(identifier)
             relationship.set(resource, relative)
 
         # Update a *to-many* relationship
@@ -265,10 +315,16 @@ class Unserializer(object):
             identifiers = relationship_object["data"]
             identifiers = [(item["type"], item["id"]) for item in identifiers]
 
-            relatives = db.get_many(identifiers, required=True)
-            relatives = list(relatives.values())
+            error_list = errors.ErrorList()
+            for identifier in identifiers:
+                if relatives.get(identifier) is None:
+                    error_list.append(errors.ResourceNotFound(identifier))
+            if error_list:
+                raise error_list
 
-            relationship.set(resource, relatives)
+            relationship.set(
+                resource, [relatives[identifier] for identifier in identifiers]
+            )
         return None
 
     def extend_relationship(
@@ -324,6 +380,167 @@ class Unserializer(object):
         return None
 
 
+def relationship_object(to_one, identifiers):
+    """
+    Creates the JSONapi relationship object with the resource linkage.
+
+    :arg bool to_one:
+        True, if the relationship is a *to-one* relationship.
+    :arg identifiers:
+        The identifier tuple (or None) of the relative in a *to-one*
+        relationship or the list with the identifier tuples of the relatives
+        in a *to-many* relationship.
+    """
+    if to_one:
+        if identifiers is None:
+            return {"data": None}
+        return {"data": {"type": identifiers[0], "id": identifiers[1]}}
+    return {"data": [
+        {"type": typename, "id": resource_id}\
+        for typename, resource_id in identifiers
+    ]}
+
+
+class SerializationPlan(object):
+    """
+    A precompiled recipe for serializing resources of one type with a fixed
+    sparse fieldset.
+
+    The plan is compiled only once per schema and fieldset: The field names
+    are sorted and the getters of the attribute and relationship markers are
+    bound in advance. Serializing a resource is then only a walk over these
+    lists.
+
+    :arg Serializer serializer:
+        The serializer, which owns this plan
+    :arg fields:
+        A collection with the names of the fields, which should be included or
+        None, if all fields should be included.
+
+    :seealso: :meth:`Serializer.get_plan`
+    """
+
+    def __init__(self, serializer, fields=None):
+        """
+        """
+        schema = serializer.schema
+
+        self.serializer = serializer
+        self.typename = schema.typename
+        self.get_id = schema.id_attribute.get
+
+        #: The sparse fieldset (a frozenset or None), which is part of the
+        #: key in the :class:`~jsonapi.base.cache.FragmentCache`.
+        self.fields = fields
+
+        #: Returns the version of a resource or None, if the schema has no
+        #: version attribute.
+        self.get_version = schema.version_attribute.get\
+            if schema.version_attribute is not None else None
+
+        #: A tuple of two tuples ``(name, getter)``
+        self.attributes = tuple(
+            (name, schema.attributes[name].get)\
+            for name in sorted(schema.attributes)\
+            if fields is None or name in fields
+        )
+
+        #: A tuple of three tuples ``(name, to_one, get_identifiers_many)``
+        self.relationships = tuple(
+            (
+                name, schema.relationships[name].to_one,
+                schema.relationships[name].get_identifiers_many
+            )\
+            for name in sorted(schema.relationships)\
+            if fields is None or name in fields
+        )
+        return None
+
+    def serialize(self, resource):
+        """
+        Creates the JSONapi resource object for *resource*.
+
+        :arg resource:
+        """
+        return self.serialize_many([resource])[0]
+
+    def serialize_many(self, resources):
+        """
+        Creates the JSONapi resource objects for the *resources*, which must
+        all be of the plan's type.
+
+        The relationship linkage is fetched with one
+        :meth:`~jsonapi.base.schema.BaseRelationship.get_identifiers_many`
+        call per relationship for all resources, so that the relatives are
+        not loaded one resource after another.
+
+        If the :attr:`Serializer.fragment_cache` is enabled, only the
+        resources, which are not already cached, are serialized. The cached
+        resource objects are shared, so only shallow copies are returned.
+
+        :arg list resources:
+        """
+        fragment_cache = self.serializer.fragment_cache
+        if fragment_cache is None:
+            return self._serialize_many(resources)
+
+        keys = list()
+        data = list()
+        missing = list()
+        for i, resource in enumerate(resources):
+            resource_id = self.get_id(resource)
+            version = self.get_version(resource)\
+                if self.get_version is not None else None
+            keys.append((resource_id, version))
+
+            d = None
+            if resource_id is not None:
+                d = fragment_cache.get(
+                    self.typename, resource_id, self.fields, version
+                )
+            if d is None:
+                missing.append(i)
+            data.append(d)
+
+        if missing:
+            new_data = self._serialize_many([resources[i] for i in missing])
+            for i, d in zip(missing, new_data):
+                resource_id, version = keys[i]
+                if resource_id is not None:
+                    fragment_cache.set(
+                        self.typename, resource_id, self.fields, version, d
+                    )
+                data[i] = d
+        return [dict(d) for d in data]
+
+    def _serialize_many(self, resources):
+        """
+        Creates the JSONapi resource objects for the *resources* without
+        looking at the cache.
+        """
+        linkage = [
+            (name, to_one, get_identifiers_many(resources))\
+            for name, to_one, get_identifiers_many in self.relationships
+        ]
+
+        data = list()
+        for i, resource in enumerate(resources):
+            d = {"type": self.typename, "id": self.get_id(resource)}
+
+            if self.attributes:
+                d["attributes"] = {
+                    name: get(resource) for name, get in self.attributes
+                }
+
+            if linkage:
+                d["relationships"] = {
+                    name: relationship_object(to_one, identifiers[i])\
+                    for name, to_one, identifiers in linkage
+                }
+            data.append(d)
+        return data
+
+
 class Serializer(object):
     """
     A serializer takes a resource and creates a JSONapi document.
@@ -332,12 +549,72 @@ class Serializer(object):
         The schema used to serialize resources
     """
 
+    #: The maximum number of different sparse fieldsets, for which we keep
+    #: a compiled :class:`SerializationPlan`.
+    max_plans = 128
+
+    #: The :class:`~jsonapi.base.cache.FragmentCache`, which is used by the
+    #: serialization plans. It is set by the API, if the cache is enabled.
+    fragment_cache = None
+
     def __init__(self, schema):
         """
         """
         self.schema = schema
+
+        # Maps the sparse fieldset (a frozenset or None) to the compiled
+        # SerializationPlan.
+        self._plans = dict()
+
+        # Maps the relationship names to the compiled relationship
+        # serializers.
+        self._relationship_serializers = dict()
         return None
 
+    def get_plan(self, fields=None):
+        """
+        Returns the :class:`SerializationPlan` for the sparse fieldset
+        *fields*. The plan is compiled on the first call and reused
+        afterwards.
+
+        :arg list fields:
+            A list with the names of the fields, which should be included.
+        :rtype: SerializationPlan
+        """
+        if fields is not None:
+            # Unknown field names are ignored anyway, so we drop them here.
+            # This keeps the number of different keys small.
+            fields = frozenset(fields) & self.schema.fields
+
+        plan = self._plans.get(fields)
+        if plan is None:
+            if len(self._plans) >= self.max_plans:
+                self._plans.clear()
+            plan = SerializationPlan(self, fields)
+            self._plans[fields] = plan
+        return plan
+
+    def get_relationship_serializer(self, name):
+        """
+        Returns a function, which takes a resource and returns the JSONapi
+        relationship object for the relationship *name*.
+
+        :arg str name:
+        """
+        serialize = self._relationship_serializers.get(name)
+        if serialize is not None:
+            return serialize
+
+        relationship = self.schema.relationships[name]
+        get_identifiers = relationship.get_identifiers
+        to_one = relationship.to_one
+
+        def serialize(resource):
+            return relationship_object(to_one, get_identifiers(resource))
+
+        self._relationship_serializers[name] = serialize
+        return serialize
+
     def serialize_resource(self, resource, fields=None):
         """
         Creates the JSONapi resource object.
@@ -348,17 +625,7 @@ class Serializer(object):
 
         :seealso: http://jsonapi.org/format/#document-resource-objects
         """
-        d = OrderedDict()
-        d.update(self.serialize_identifier(resource))
-
-        attributes = self.serialize_attributes(resource, fields)
-        if attributes:
-            d["attributes"] = attributes
-
-        relationships = self.serialize_relationships(resource, fields)
-        if relationships:
-            d["relationships"] = relationships
-        return d
+        return self.get_plan(fields).serialize(resource)
 
     def serialize_identifier(self, resource):
         """
@@ -368,10 +635,10 @@ class Serializer(object):
 
         :seealso: http://jsonapi.org/format/#document-resource-identifier-objects
         """
-        d = OrderedDict()
-        d["type"] = self.schema.typename
-        d["id"] = self.schema.id_attribute.get(resource)
-        return d
+        return {
+            "type": self.schema.typename,
+            "id": self.schema.id_attribute.get(resource)
+        }
 
     def serialize_attributes(self, resource, fields=None):
         """
@@ -383,12 +650,8 @@ class Serializer(object):
 
         :seealso: http://jsonapi.org/format/#document-resource-object-attributes
         """
-        d = OrderedDict()
-        for name in sorted(self.schema.attributes):
-            if fields is None or name in fields:
-                attr = self.schema.attributes[name]
-                d[name] = attr.get(resource)
-        return d
+        plan = self.get_plan(fields)
+        return {name: get(resource) for name, get in plan.attributes}
 
     def serialize_relationships(self, resource, fields):
         """
@@ -400,11 +663,11 @@ class Serializer(object):
 
         :seealso: http://jsonapi.org/format/#document-resource-object-relationships
         """
-        d = OrderedDict()
-        for name in sorted(self.schema.relationships):
-            if fields is None or name in fields:
-                d[name] = self.serialize_relationship(resource, name)
-        return d
+        plan = self.get_plan(fields)
+        return {
+            name: self.get_relationship_serializer(name)(resource)\
+            for name, to_one, get_identifiers_many in plan.relationships
+        }
 
     def serialize_relationship(self, resource, name):
         """
@@ -416,31 +679,66 @@ class Serializer(object):
 
         :seealso: http://jsonapi.org/format/#document-resource-object-relationships
         """
-        rel = self.schema.relationships[name]
-        d = OrderedDict()
+        return self.get_relationship_serializer(name)(resource)
 
-        # Serialize a to-one relationship.
-        if rel.to_one:
-            relative = rel.get(resource)
-            if relative is None:
-                d["data"] = None
-            else:
-                d["data"] = ensure_identifier_object(relative)
 
-        # Serialize a to many relationship.
-        else:
-            relatives = rel.get(resource)
-            relatives = [
-                ensure_identifier_object(item) for item in relatives
-            ]
-            d["data"] = relatives
-        return d
+def iter_serialize_many(resources, fields, chunk_size=500):
+    """
+    Yields the serialized version of each resource in *resources*. This is
+    the lazy version of :func:`serialize_many`, which is used when the
+    response is streamed.
+
+    The resources are serialized in chunks of *chunk_size* resources, so
+    that the relationship linkage of a chunk can be fetched with one query
+    (see :meth:`SerializationPlan.serialize_many`).
+
+    :arg resources:
+        An iterable of resources
+    :arg dict fields:
+        A dictionary, mapping the typename to the fields, which should be
+        included in the resource documents
+    :arg int chunk_size:
+
+    :seealso: :func:`serialize_many`
+    """
+    # Maps the typename to the plan used for the resources of this type.
+    plans = dict()
+
+    resources = iter(resources)
+    while True:
+        chunk = list(islice(resources, chunk_size))
+        if not chunk:
+            break
+
+        # Group the resources by their type, but keep the original order
+        # in the output.
+        groups = dict()
+        for i, resource in enumerate(chunk):
+            typename = resource._jsonapi["typename"]
+            groups.setdefault(typename, list()).append(i)
+
+        data = [None]*len(chunk)
+        for typename, indices in groups.items():
+            plan = plans.get(typename)
+            if plan is None:
+                serializer = chunk[indices[0]]._jsonapi["serializer"]
+                plan = serializer.get_plan(fields.get(typename))
+                plans[typename] = plan
+
+            group_data = plan.serialize_many([chunk[i] for i in indices])
+            for i, d in zip(indices, group_data):
+                data[i] = d
+        yield from data
+    return None
 
 
 def serialize_many(resources, fields):
     """
     Returns a list with the serialized version of all *resources*.
 
+    The :class:`SerializationPlan` is looked up only once per type and then
+    reused for all resources of this type.
+
     :arg resources:
         A list of resources
     :arg dict fields:
@@ -450,11 +748,4 @@ def serialize_many(resources, fields):
     :seealso: :meth:`Serializer.serialize_resource`
     :seealso: :meth:`jsonapi.base.request.Request.japi_fields`
     """
-    data = list()
-    for resource in resources:
-        serializer = resource._jsonapi["serializer"]
-        typename = resource._jsonapi["typename"]
-        data.append(
-            serializer.serialize_resource(resource, fields=fields.get(typename))
-        )
-    return data
+    return list(iter_serialize_many(resources, fields))
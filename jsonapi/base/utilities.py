@@ -31,7 +31,7 @@ modules.
 """
 
 # std
-from collections import OrderedDict
+import collections.abc
 
 # local
 from . import errors
@@ -41,7 +41,10 @@ __all__ = [
     "ensure_identifier_object",
     "ensure_identifier",
     "collect_identifiers",
+    "relatives",
     "relative_identifiers",
+    "build_include_tree",
+    "cached_slot_property"
 ]
 
 
@@ -64,28 +67,16 @@ def ensure_identifier_object(obj):
     """
     # Identifier tuple
     if isinstance(obj, tuple):
-        d = OrderedDict([
-            ("type", obj[0]),
-            ("id", obj[1])
-        ])
-        return d
+        return {"type": obj[0], "id": obj[1]}
     # JSONapi identifier object
     elif isinstance(obj, dict):
         # The dictionary may contain more keys than only *id* and *type*. So
         # we extract only these two keys.
-        d = OrderedDict([
-            ("type", obj["type"]),
-            ("id", obj["id"])
-        ])
-        return d
+        return {"type": obj["type"], "id": obj["id"]}
     # obj is a resource resource
     else:
         schema = obj._jsonapi["schema"]
-        d = OrderedDict([
-            ("type", schema.typename),
-            ("id", schema.id_attribute.get(obj))
-        ])
-        return d
+        return {"type": schema.typename, "id": schema.id_attribute.get(obj)}
 
 
 def ensure_identifier(obj):
@@ -158,9 +149,11 @@ def collect_identifiers(d, include_meta=False):
     return ids
 
 
-def relative_identifiers(relname, resource):
+def relatives(relname, resource):
     """
-    Returns a list with the ids of related resources.
+    Returns a list with the related resources. Depending on the relationship,
+    an item is either a resource object or only an identifier (a tuple or an
+    identifier object), if the relative has not been loaded.
 
     :arg str relname:
         The name of the relationship
@@ -174,9 +167,94 @@ def relative_identifiers(relname, resource):
         raise errors.RelationshipNotFound(schema.typename, relname)
     elif relationship.to_one:
         relative = relationship.get(resource)
-        relatives = [relative] if relative else []
+        return [relative] if relative else []
     else:
-        relatives = relationship.get(resource)
+        return list(relationship.get(resource))
+
+
+def relative_identifiers(relname, resource):
+    """
+    Returns a list with the ids of related resources.
+
+    :arg str relname:
+        The name of the relationship
+    :arg resource:
+
+    :raises jsonapi.base.errors.RelationshipNotFound:
+    """
+    return [
+        ensure_identifier(relative)\
+        for relative in relatives(relname, resource)
+    ]
+
+
+def build_include_tree(paths):
+    """
+    Merges the include *paths* into a prefix tree, so that a shared prefix
+    appears only once:
+
+    .. code-block:: python3
+
+        >>> build_include_tree([
+        ...     ["comments"], ["comments", "author"], ["comments", "post"],
+        ...     ["author"]
+        ... ])
+        {"comments": {"author": {}, "post": {}}, "author": {}}
+
+    If *paths* is already a tree (a mapping), it is returned unchanged, so
+    the tree of :attr:`jsonapi.base.request.Request.japi_include_tree` is
+    not built again.
+
+    :arg list paths:
+        A list of relationship name lists, like
+        :attr:`jsonapi.base.request.Request.japi_include`.
+    """
+    if isinstance(paths, collections.abc.Mapping):
+        return paths
+
+    tree = dict()
+    for path in paths:
+        node = tree
+        for relname in path:
+            node = node.setdefault(relname, dict())
+    return tree
+
+
+class cached_slot_property(object):
+    """
+    Like :func:`cached_property.cached_property`, but the value is stored in
+    the slot ``_<name>`` of the instance, so it can be used in classes with
+    ``__slots__``. The class must declare the slot.
+
+    .. code-block:: python3
+
+        class Request(object):
+
+            __slots__ = ("uri", "_parsed_uri")
+
+            @cached_slot_property
+            def parsed_uri(self):
+                return urllib.parse.urlparse(self.uri)
+    """
+
+    def __init__(self, func):
+        """
+        """
+        self.func = func
+        self.slot = "_" + func.__name__
+        self.__doc__ = func.__doc__
+        return None
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.func(obj)
+            setattr(obj, self.slot, value)
+            return value
 
-    relatives = [ensure_identifier(relative) for relative in relatives]
-    return relatives
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+        return None
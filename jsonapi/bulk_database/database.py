@@ -107,7 +107,7 @@ class Session(jsonapi.base.database.Session):
     def __init__(self, api, db):
         """
         """
-        self.api = api
+        super().__init__(api)
         self.db = db
 
         # Maps the database adapter to the database session.
@@ -124,9 +124,7 @@ class Session(jsonapi.base.database.Session):
         :rtype: jsonapi.base.database.Session
         """
         db = self.db.get_db(typename)
-        if not db in self._sessions:
-            self._sessions[db] = db.session()
-        return self._sessions[db]
+        return self.session_by_db(db)
 
     def session_by_db(self, db):
         """
@@ -137,17 +135,24 @@ class Session(jsonapi.base.database.Session):
         :rtype: jsonapi.base.database.Session
         """
         if not db in self._sessions:
-            self._sessions[db] = db.session()
+            session = db.session()
+
+            # All sessions share the identity map, so that its counters
+            # cover the whole request.
+            session.identity_map = self.identity_map
+            self._sessions[db] = session
         return self._sessions[db]
 
     def query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
         """
         session = self.session(typename)
         return session.query(
-            typename, order=order, limit=limit, offset=offset, filters=filters
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include, cursor=cursor
         )
 
     def query_size(self, typename,
@@ -160,14 +165,32 @@ class Session(jsonapi.base.database.Session):
             typename, order=order, limit=limit, offset=offset, filters=filters
         )
 
-    def get(self, identifier):
+    def query_with_size(self, typename,
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None
+        ):
+        """
+        """
+        session = self.session(typename)
+        return session.query_with_size(
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include
+        )
+
+    def estimate_size(self, typename, *, filters=None):
+        """
+        """
+        session = self.session(typename)
+        return session.estimate_size(typename, filters=filters)
+
+    def get(self, identifier, required=False, fields=None, include=None):
         """
         """
         typename, resource_id = identifier
         session = self.session(typename)
-        return session.get(identifier)
+        return session.get(identifier, required, fields, include)
 
-    def get_many(self, identifiers):
+    def get_many(self, identifiers, required=False, fields=None):
         """
         :seealso: :meth:`Session.get_many`
         """
@@ -180,7 +203,7 @@ class Session(jsonapi.base.database.Session):
             # us to only iterate once over them.
             identifiers = list(identifiers)
             session = self.session(typename)
-            resources = session.get_many(identifiers)
+            resources = session.get_many(identifiers, required, fields)
             result.update(resources)
         return result
 
@@ -212,3 +235,10 @@ class Session(jsonapi.base.database.Session):
         for session in self._sessions.values():
             session.commit()
         return None
+
+    def close(self):
+        """
+        """
+        for session in self._sessions.values():
+            session.close()
+        return None
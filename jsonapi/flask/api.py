@@ -56,7 +56,7 @@ def get_request():
         uri += "?" + flask.request.query_string.decode("utf-8")
 
     method = flask.request.method
-    headers = dict(flask.request.headers)
+    headers = flask.request.headers
     body = flask.request.get_data()
     return jsonapi.base.Request(uri, method, headers, body)
 
@@ -67,6 +67,9 @@ def to_response(japi_response):
     """
     if japi_response.is_file:
         flask_response = flask.send_file(japi_response.file)
+    elif japi_response.is_stream:
+        # The generator is consumed by werkzeug, while the response is sent.
+        flask_response = flask.Response(iter(japi_response.body))
     elif japi_response.has_body:
         flask_response = flask.Response(japi_response.body)
     else:
@@ -30,7 +30,7 @@ The database adapter for mongoengine documents.
 """
 
 # std
-from itertools import groupby
+from collections import OrderedDict
 
 # third party
 import mongoengine
@@ -38,6 +38,7 @@ from bson.objectid import ObjectId
 
 # local
 import jsonapi
+from jsonapi.base.utilities import ensure_identifier
 from . import schema
 
 
@@ -69,16 +70,34 @@ class Session(jsonapi.base.database.Session):
         Builds a dictionary, which can be used inside a document's *objects()*
         method to filter the resources by the *japi_filters* dictionary.
 
+        A field name may be a path over relationships, e.g.
+        ``author.country``. MongoDB can not join the collections, so the
+        ids of the matching related documents are looked up first (one
+        query per relationship) and the relationship is filtered by these
+        ids. The filters on the same relationship must all match the same
+        related document.
+
         :arg jsonapi.mongoengine.schema.Schema schema_:
         :arg filters:
         """
         d = dict()
+        related = OrderedDict()
         for fieldname, filtername, value in filters:
 
+            # The filter belongs to a related document.
+            relname, dot, subfieldname = fieldname.partition(".")
+            if dot:
+                related.setdefault(relname, list()).append(
+                    (subfieldname, filtername, value)
+                )
+                continue
+
             # We only allow filtering for mongoengine attributes.
             attribute = schema_.attributes.get(fieldname)
             if not isinstance(attribute, schema.Attribute):
-                raise errors.UnfilterableField(filtername, fieldname)
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, fieldname
+                )
 
             if filtername == "eq":
                 d[attribute.name] = value
@@ -119,14 +138,75 @@ class Session(jsonapi.base.database.Session):
             elif filtername == "match":
                 d[attribute.name + "__match"] = value
             else:
-                raise errors.UnfilterableField(filtername, fieldname)
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, fieldname
+                )
+
+        # Look up the ids of the related documents.
+        for relname, subfilters in related.items():
+            relationship = schema_.relationships.get(relname)
+            document_class = self._related_document_class(relationship)
+            if document_class is None:
+                subfieldname, filtername, value = subfilters[0]
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, relname + "." + subfieldname
+                )
+
+            related_schema = self.api.get_schema(
+                self.api.get_typename(document_class)
+            )
+            criterion = self._build_filter_criterion(
+                related_schema, subfilters
+            )
+            ids = list(
+                document_class.objects(**criterion)\
+                .scalar(related_schema.id_attribute.name)
+            )
+            d[relationship.name + "__in"] = ids
         return d
 
+    def _related_document_class(self, relationship):
+        """
+        Returns the document class of the *relationship* or None, if the
+        relationship is no reference (list) field to a known type.
+
+        :arg relationship:
+        """
+        if isinstance(relationship, schema.ToOneRelationship):
+            field = relationship.me_field
+        elif isinstance(relationship, schema.ToManyRelationship):
+            field = relationship.me_field.field
+        else:
+            return None
+
+        # A *GenericReferenceField* has no document type.
+        document_class = getattr(field, "document_type", None)
+        if document_class is None \
+            or self.api.get_typename(document_class, None) is None:
+            return None
+        return document_class
+
+    def related_typename(self, typename, relname):
+        """
+        """
+        schema_ = self.api.get_schema(typename, None)
+        if schema_ is None:
+            return None
+
+        document_class = self._related_document_class(
+            schema_.relationships.get(relname)
+        )
+        return self.api.get_typename(document_class)\
+            if document_class else None
+
     def _build_order_criterion(self, schema_, order):
         """
         Converts the *order* list into a representation, which can be used with
         mongoengine's queryset *order_by()* method.
 
+        Sorting by the fields of related documents (``author.name``) is not
+        supported, because MongoDB can not join the collections.
+
         :arg jsonapi.mongoengine.schema.Schema schema_:
         :arg order:
         """
@@ -136,26 +216,151 @@ class Session(jsonapi.base.database.Session):
             # We only support sorting for attributes at the moment.
             attribute = schema_.attributes.get(fieldname)
             if not isinstance(attribute, schema.Attribute):
-                raise errors.UnsortableField(schema_.typename, fieldname)
+                raise jsonapi.base.errors.UnsortableField(
+                    schema_.typename, fieldname
+                )
 
             criterion.append(direction + attribute.name)
         return criterion
 
+    def _build_cursor_criterion(self, schema_, cursor):
+        """
+        Translates the *cursor* into a :class:`mongoengine.queryset.Q` object,
+        which selects the resources after (or before) the cursor and the
+        order, which must be used for the query.
+
+        MongoDB sorts *null* before all other values, like the
+        :meth:`~jsonapi.base.pagination.Cursor.keyset` expects.
+
+        :arg jsonapi.mongoengine.schema.Schema schema_:
+        :arg jsonapi.base.pagination.Cursor cursor:
+        """
+        def field_name(fieldname):
+            # *None* refers to the id.
+            if fieldname is None:
+                return schema_.id_attribute.name
+
+            attribute = schema_.attributes.get(fieldname)
+            if not isinstance(attribute, schema.Attribute):
+                raise jsonapi.base.errors.UnsortableField(
+                    schema_.typename, fieldname
+                )
+            return attribute.name
+
+        order = [
+            direction + field_name(fieldname)\
+            for direction, fieldname in cursor.query_order
+        ]
+
+        criterion = None
+        for branch in cursor.keyset():
+            branch_criterion = mongoengine.queryset.Q()
+            for fieldname, op, value in branch:
+                name = field_name(fieldname)
+                if op == "null":
+                    value = None
+                elif op == "notnull":
+                    name += "__ne"
+                    value = None
+                else:
+                    # The values are encoded as JSON in the cursor.
+                    field = schema_.resource_class._fields.get(name)
+                    if field is not None:
+                        value = field.to_python(value)
+                    if op != "eq":
+                        name += "__" + op
+                branch_criterion &= mongoengine.queryset.Q(**{name: value})
+
+            if criterion is None:
+                criterion = branch_criterion
+            else:
+                criterion |= branch_criterion
+        return (criterion, order)
+
+    def _build_only_criterion(self, schema_, fields):
+        """
+        Returns the names of the document fields, which must be loaded for
+        the sparse fieldset *fields* or None, if all fields must be loaded.
+
+        The id and all relationships are always loaded, because they are
+        needed to build the resource linkage and to resolve the includes.
+
+        Attributes and relationships defined with a marker are no document
+        fields and we do not know, which fields their getters read. So all
+        fields are loaded, if the id or a field in the fieldset is defined
+        with a marker.
+
+        :arg jsonapi.mongoengine.schema.Schema schema_:
+        :arg dict fields:
+            The sparse fieldset
+        """
+        if not fields or not schema_.typename in fields:
+            return None
+
+        type_fields = fields[schema_.typename]
+        document_fields = schema_.resource_class._fields
+
+        markers = [schema_.id_attribute]
+        markers.extend(
+            schema_.attributes.get(name) or schema_.relationships.get(name)\
+            for name in type_fields
+        )
+        for marker in markers:
+            if marker is not None and not isinstance(
+                marker, (
+                    schema.IDAttribute, schema.Attribute,
+                    schema.ToOneRelationship, schema.ToManyRelationship
+                )
+                ):
+                return None
+
+        names = [schema_.id_attribute.name]
+        names.extend(
+            name for name in schema_.relationships if name in document_fields
+        )
+        names.extend(
+            name for name in type_fields\
+            if name in schema_.attributes and name in document_fields
+        )
+        return names
+
+    def _objects(self, typename, fields=None):
+        """
+        Returns the queryset for the documents of type *typename*, which
+        loads only the fields needed for the sparse fieldset *fields*.
+        """
+        resource_class = self.api.get_resource_class(typename)
+        schema_ = self.api.get_schema(typename)
+
+        query = resource_class.objects()
+
+        only = self._build_only_criterion(schema_, fields)
+        if only is not None:
+            query = query.only(*only)
+        return query
+
     def _build_query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        cursor=None
         ):
         """
         """
-        resource_class = self.api.get_resource_class(typename)
         schema_ = self.api.get_schema(typename)
 
+        query = self._objects(typename, fields)
+
         if filters:
             filters = self._build_filter_criterion(schema_, filters)
-            query = resource_class.objects(**filters)
-        else:
-            query = resource_class.objects()
-
-        if order:
+            query = query.filter(**filters)
+
+        if cursor is not None:
+            cursor_criterion, order = self._build_cursor_criterion(
+                schema_, cursor
+            )
+            if cursor_criterion is not None:
+                query = query.filter(cursor_criterion)
+            query = query.order_by(*order)
+        elif order:
             order = self._build_order_criterion(schema_, order)
             query = query.order_by(*order)
 
@@ -167,14 +372,21 @@ class Session(jsonapi.base.database.Session):
         return query
 
     def query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
+        The include paths *include* are ignored.
         """
         query = self._build_query(
-            typename, order=order, limit=limit, offset=offset, filters=filters
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, cursor=cursor
         )
-        resources = list(query)
+        resources = self.identity_map.add_all(query, fields)
+
+        # The order has been flipped for the resources before the cursor.
+        if cursor is not None and cursor.before:
+            resources.reverse()
         return resources
 
     def query_size(self, typename,
@@ -187,27 +399,62 @@ class Session(jsonapi.base.database.Session):
         )
         return query.count()
 
-    def get(self, identifier, required=False):
+    def estimate_size(self, typename, *, filters=None):
         """
+        Uses the collection metadata (*estimated_document_count*), if there
+        are no *filters*. Otherwise, the documents are counted with
+        :meth:`query_size` and the number is exact.
         """
-        typename, resource_id = identifier
+        if filters:
+            return (self.query_size(typename, filters=filters), False)
+
+        # The metadata is only available for the whole collection and
+        # not for subclasses of a document.
         resource_class = self.api.get_resource_class(typename)
-        resource = resource_class.objects(id=resource_id).first()
-        if required and resource is None:
+        if resource_class._meta.get("allow_inheritance"):
+            return (self.query_size(typename), False)
+
+        collection = resource_class._get_collection()
+        return (collection.estimated_document_count(), True)
+
+    def get(self, identifier, required=False, fields=None, include=None):
+        """
+        The include paths *include* are ignored.
+        """
+        resource = self.identity_map.get(identifier, fields)
+        if resource is not None:
+            return resource
+
+        cached = self.read_cache_get_many([identifier])[0]
+        if cached:
+            return cached[identifier]
+
+        typename, resource_id = identifier
+        resource = self._objects(typename, fields).filter(id=resource_id).first()
+        if resource is not None:
+            resource = self.identity_map.add(resource, fields)
+            self.read_cache_set_many([resource], fields)
+        elif required:
             raise jsonapi.base.errors.ResourceNotFound(identifier)
         return resource
 
-    def get_many(self, identifiers, required=False):
+    def get_many(self, identifiers, required=False, fields=None):
         """
+        Only the resources, which are neither in the
+        :attr:`~jsonapi.base.database.Session.identity_map` nor in the
+        :attr:`~jsonapi.base.api.API.read_cache`, are queried.
         """
-        results = dict()
+        results, missing = self.identity_map.get_many(identifiers, fields)
+        if missing:
+            cached, missing = self.read_cache_get_many(missing)
+            results.update(cached)
 
         # Group the identifiers by the typenames.
-        group_key = lambda identifier: identifier[0]
-        for typename, identifiers in groupby(identifiers, group_key):
-            resource_class = self.api.get_resource_class(typename)
-            schema_ = self.api.get_schema(typename)
+        ids_by_type = dict()
+        for typename, resource_id in missing:
+            ids_by_type.setdefault(typename, set()).add(resource_id)
 
+        for typename, resource_ids in ids_by_type.items():
             # Extract the resource ids, fetch the resources and add them
             # to the result.
             #
@@ -215,22 +462,40 @@ class Session(jsonapi.base.database.Session):
             #
             #   mongoengine requires an explicit ObjectId object here.
             #   Remove the conversion, when it is no longer needed.
-            resource_ids = [ObjectId(e[1]) for e in identifiers]
-            resources = resource_class.objects().in_bulk(resource_ids)
+            resource_ids = [ObjectId(item) for item in resource_ids]
+            resources = self._objects(typename, fields).in_bulk(resource_ids)
 
             # Break, if a resource does not exist.
-            not_found = resources.keys() - resource_ids
+            not_found = set(resource_ids) - resources.keys()
             if required and not_found:
                 raise jsonapi.base.errors.ResourceNotFound(
-                    identifier=(typename, not_found.pop())
+                    identifier=(typename, str(not_found.pop()))
                 )
 
-            results.update({
-                (typename, str(resource_id)): resource\
+            loaded = {
+                (typename, str(resource_id)): \
+                    self.identity_map.add(resource, fields)\
                 for resource_id, resource in resources.items()
-            })
+            }
+            self.read_cache_set_many(list(loaded.values()), fields)
+            results.update(loaded)
         return results
 
+    def dump_resource(self, resource):
+        """
+        Returns the SON document of the *resource*, if it has not been
+        changed.
+        """
+        if resource._get_changed_fields():
+            return None
+        return resource.to_mongo().to_dict()
+
+    def load_resource(self, typename, state):
+        """
+        """
+        resource_class = self.api.get_resource_class(typename)
+        return resource_class._from_son(state)
+
     def save(self, resources):
         """
         .. todo::
@@ -242,6 +507,7 @@ class Session(jsonapi.base.database.Session):
 
             Is there something like *bulk_save()* ?
         """
+        self.invalidate_caches(resources)
         for resource in resources:
             resource.save()
         return None
@@ -257,11 +523,14 @@ class Session(jsonapi.base.database.Session):
 
             Is there something like *bulk_delete()* ?
         """
+        self.invalidate_caches(resources)
         for resource in resources:
+            self.identity_map.discard(ensure_identifier(resource))
             resource.delete()
         return None
 
     def commit(self):
         """
         """
+        self.invalidate_committed_caches()
         return None
@@ -88,7 +88,7 @@ class Session(jsonapi.asyncio.database.Session):
             # We only allow filtering for motorengine attributes.
             attribute = schema_.attributes.get(fieldname)
             if not isinstance(attribute, schema.Attribute):
-                raise errors.UnfilterableField(
+                raise jsonapi.base.errors.UnfilterableField(
                     schema_.typename, filtername, fieldname
                 )
 
@@ -131,7 +131,7 @@ class Session(jsonapi.asyncio.database.Session):
             elif filtername == "match":
                 d[attribute.name + "__match"] = value
             else:
-                raise errors.UnfilterableField(
+                raise jsonapi.base.errors.UnfilterableField(
                     schema_.typename, filtername, fieldname
                 )
 
@@ -146,7 +146,9 @@ class Session(jsonapi.asyncio.database.Session):
             # We only support sorting for attributes at the moment.
             attribute = schema_.attributes.get(fieldname)
             if not isinstance(attribute, schema.Attribute):
-                raise errors.UnsortableField(schema_.typename, fieldname)
+                raise jsonapi.base.errors.UnsortableField(
+                    schema_.typename, fieldname
+                )
 
             if direction == "+":
                 query.order_by(attribute.name, motorengine.ASCENDING)
@@ -172,15 +174,25 @@ class Session(jsonapi.asyncio.database.Session):
             query = query.limit(limit)
         return query
 
+    @asyncio.coroutine
     def query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
+        The sparse fieldset *fields* and the include paths *include* are
+        ignored. The cursor pagination is not supported.
         """
+        if cursor is not None:
+            raise jsonapi.base.errors.BadRequest(
+                detail="The cursor pagination is not supported.",
+                source_parameter="page[size]"
+            )
         query = self._build_query(
             typename, order=order, limit=limit, offset=offset, filters=filters
         )
-        return to_asyncio_future(query.find_all())
+        resources = yield from to_asyncio_future(query.find_all())
+        return self.identity_map.add_all(resources)
 
     def query_size(self, typename,
         *, order=None, limit=None, offset=None, filters=None
@@ -193,8 +205,29 @@ class Session(jsonapi.asyncio.database.Session):
         return to_asyncio_future(query.count())
 
     @asyncio.coroutine
-    def get(self, identifier, required=False):
+    def get(self, identifier, required=False, fields=None, include=None):
+        """
+        The sparse fieldset *fields* and the include paths *include* are
+        ignored.
+        """
+        resource = self.identity_map.get(identifier)
+        if resource is not None:
+            return resource
+
+        cached = self.read_cache_get_many([identifier])[0]
+        if cached:
+            return cached[identifier]
+
+        resource = yield from self._load(identifier)
+        if required and resource is None:
+            raise jsonapi.base.errors.ResourceNotFound(identifier)
+        return resource
+
+    @asyncio.coroutine
+    def _load(self, identifier):
         """
+        Loads the resource with the *identifier* from the database and adds
+        it to the identity map and the read cache.
         """
         typename, resource_id = identifier
         resource_class = self.api.get_resource_class(typename)
@@ -202,24 +235,44 @@ class Session(jsonapi.asyncio.database.Session):
         resource = yield from to_asyncio_future(
             resource_class.objects.get(resource_id)
         )
-        if required and resource is None:
-            raise jsonapi.base.errors.ResourceNotFound(identifier)
+        if resource is not None:
+            resource = self.identity_map.add(resource)
+            self.read_cache_set_many([resource])
         return resource
 
     @asyncio.coroutine
-    def get_many(self, identifiers, required=False):
+    def get_many(self, identifiers, required=False, fields=None):
         """
         .. todo:: Use bulk get.
         """
-        resources = dict()
-        for identifier in identifiers:
-            resource = yield from self.get(identifier, required)
+        resources, missing = self.identity_map.get_many(identifiers)
+        if missing:
+            cached, missing = self.read_cache_get_many(missing)
+            resources.update(cached)
+
+        for identifier in missing:
+            resource = yield from self._load(identifier)
+            if required and resource is None:
+                raise jsonapi.base.errors.ResourceNotFound(identifier)
             resources[identifier] = resource
         return resources
 
+    def dump_resource(self, resource):
+        """
+        Returns the SON document of the *resource*.
+        """
+        return resource.to_son()
+
+    def load_resource(self, typename, state):
+        """
+        """
+        resource_class = self.api.get_resource_class(typename)
+        return resource_class.from_son(state)
+
     def save(self, resources):
         """
         """
+        self.invalidate_caches(resources)
         for resource in resources:
             schema = resource._jsonapi["schema"]
             identifier = (schema.typename, schema.id_attribute.get(resource))
@@ -234,11 +287,13 @@ class Session(jsonapi.asyncio.database.Session):
     def delete(self, resources):
         """
         """
+        self.invalidate_caches(resources)
         for resource in resources:
             schema = resource._jsonapi["schema"]
             identifier = (schema.typename, schema.id_attribute.get(resource))
 
             if identifier[1]:
+                self.identity_map.discard(identifier)
                 self._deleted_resources[identifier] = resource
                 self._saved_resources.pop(identifier, None)
             else:
@@ -258,4 +313,6 @@ class Session(jsonapi.asyncio.database.Session):
 
         for resource in self._deleted_resources.values():
             yield from to_asyncio_future(resource.delete())
+
+        self.invalidate_committed_caches()
         return None
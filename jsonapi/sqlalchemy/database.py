@@ -30,11 +30,20 @@ The database adapter for *sqlalchemy*.
 """
 
 # std
-from itertools import groupby
+from collections import OrderedDict
+import datetime
+from itertools import chain, groupby
 import logging
+import threading
+
+# third party
+import sqlalchemy
+import sqlalchemy.orm
 
 # local
 import jsonapi
+from jsonapi.base.cache import LRUCache
+from jsonapi.base.utilities import build_include_tree, ensure_identifier
 from . import schema
 
 
@@ -57,22 +66,109 @@ class Database(jsonapi.base.database.Database):
     :arg jsonapi.base.api.API api:
     """
 
+    #: The maximum number of query templates in the :attr:`statement_cache`.
+    #: 0 disables the cache.
+    statement_cache_size = 256
+
     def __init__(self, sessionmaker=None, api=None):
         super().__init__(api=api)
 
+        #: Caches the SQLAlchemy queries (without session and values) for
+        #: the query shapes, which have been used recently. The SQLAlchemy
+        #: compiled cache recognizes the same queries again, so they are not
+        #: compiled to SQL again.
+        #:
+        #: :seealso: :meth:`Session._build_query`
+        self.statement_cache = LRUCache(max_entries=self.statement_cache_size)\
+            if self.statement_cache_size else None
+
+        # Counts the sessions and the connection checkouts (see *stats()*).
+        self._stats_lock = threading.Lock()
+        self._stats = {"sessions": 0, "opened": 0, "checkouts": 0}
+        self._pool = None
+
         if sessionmaker is None and api is not None:
             sessionmaker = self.api.settings["sqlalchemy_sessionmaker"]
-        self.sessionmaker = sessionmaker
+        self.sessionmaker = None
+        if sessionmaker is not None:
+            self._set_sessionmaker(sessionmaker)
         return None
 
     def init_api(self, api):
         super().init_api(api)
         if self.sessionmaker is None:
-            self.sessionmaker = self.api.settings["sqlalchemy_sessionmaker"]
+            self._set_sessionmaker(
+                self.api.settings["sqlalchemy_sessionmaker"]
+            )
         return None
 
+    def _set_sessionmaker(self, sessionmaker):
+        """
+        Sets the *sessionmaker* and counts the connection checkouts of its
+        engine, if it is bound to one.
+        """
+        self.sessionmaker = sessionmaker
+
+        bind = getattr(sessionmaker, "kw", dict()).get("bind")
+        if isinstance(bind, sqlalchemy.engine.Engine):
+            self._pool = bind.pool
+            sqlalchemy.event.listen(bind, "checkout", self._on_checkout)
+        return None
+
+    def _count(self, key):
+        """
+        Increments the counter *key* in the stats.
+        """
+        with self._stats_lock:
+            self._stats[key] += 1
+        return None
+
+    def _on_checkout(self, dbapi_connection, connection_record,
+        connection_proxy
+        ):
+        """
+        Listens to the *checkout* events of the pool.
+        """
+        self._count("checkouts")
+        return None
+
+    def _open_sqla_session(self):
+        """
+        Creates the SQLAlchemy session of a :class:`Session`, when it is used
+        for the first time.
+        """
+        self._count("opened")
+        return self.sessionmaker()
+
     def session(self):
-        return Session(self.api, self.sessionmaker())
+        """
+        Returns a new :class:`Session`. The SQLAlchemy session is only
+        created, when it is needed.
+        """
+        self._count("sessions")
+        return Session(
+            self.api, self._open_sqla_session,
+            statement_cache=self.statement_cache
+        )
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of created :class:`Session`
+        objects (*sessions*), the SQLAlchemy sessions, which were actually
+        opened (*opened*), and the connection checkouts from the pool of the
+        engine (*checkouts*). *checkedout* is the number of connections,
+        which are currently checked out, if the pool tells it.
+        *statement_hits* and *statement_misses* count the lookups in the
+        :attr:`statement_cache`.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        if self.statement_cache is not None:
+            stats["statement_hits"] = self.statement_cache.hits
+            stats["statement_misses"] = self.statement_cache.misses
+        if self._pool is not None and hasattr(self._pool, "checkedout"):
+            stats["checkedout"] = self._pool.checkedout()
+        return stats
 
 
 class Session(jsonapi.base.database.Session):
@@ -81,80 +177,221 @@ class Session(jsonapi.base.database.Session):
 
     :arg jsonapi.base.api.API api:
     :arg sqla_session:
-        SQLAlchemy session instance
+        SQLAlchemy session instance or a function, which returns one. The
+        function is called, when the session is used for the first time.
+    :arg jsonapi.base.cache.LRUCache statement_cache:
+        The cache for the query templates (see
+        :attr:`Database.statement_cache`) or None.
     """
 
-    def __init__(self, api, sqla_session):
+    #: The maximum number of ids in the ``IN (...)`` clause of a
+    #: :meth:`get_many` query.
+    get_many_chunk_size = 500
+
+    def __init__(self, api, sqla_session, statement_cache=None):
         """
         """
         super().__init__(api)
-        self.sqla_session = sqla_session
+        self.statement_cache = statement_cache
+        if isinstance(sqla_session, sqlalchemy.orm.Session):
+            self._sqla_session = sqla_session
+            self._sqla_session_factory = None
+        else:
+            self._sqla_session = None
+            self._sqla_session_factory = sqla_session
         return None
 
+    @property
+    def sqla_session(self):
+        """
+        The SQLAlchemy session. It is created on first access.
+        """
+        if self._sqla_session is None:
+            self._sqla_session = self._sqla_session_factory()
+        return self._sqla_session
+
+    @staticmethod
+    def _filter_shape(filters):
+        """
+        Returns the shape of the *filters*: the field and filter names
+        without the values. Only a *None* value changes the shape, because
+        it is compared with ``IS NULL`` instead of a bound parameter.
+        """
+        return tuple(
+            (fieldname, filtername, value is None)\
+            for fieldname, filtername, value in filters or ()
+        )
+
+    @staticmethod
+    def _filter_params(filters):
+        """
+        Returns the values of the bound parameters of the criterion, which
+        is created by :meth:`_build_filter_criterion` for the *filters*.
+        """
+        params = dict()
+        for i, (fieldname, filtername, value) in enumerate(filters or ()):
+            if value is None or filtername == "exists":
+                continue
+
+            if filtername == "icontains":
+                value = "%" + value + "%"
+            elif filtername == "istartswith":
+                value = value + "%"
+            elif filtername == "iendswith":
+                value = "%" + value
+            params["jsonapi_filter_{}".format(i)] = value
+        return params
+
     def _build_filter_criterion(self, schema_, filters):
         """
         Builds the argument for the sqlalchemy query method
         :meth:`~sqlalchemy.orm.query.Query.filter`.
 
+        The values are not part of the criterion. They are *bound
+        parameters*, whose values are returned by :meth:`_filter_params`, so
+        the criterion can be reused for all filters with the same shape
+        (see :meth:`_filter_shape`).
+
+        A field name may be a path over relationships, e.g.
+        ``author.country``. The filters on the same relationship are
+        combined into one ``EXISTS`` subquery, so they must all match the
+        same related resource.
+
         .. todo::
 
             Implement the *add*, *size*, .. filters
         """
+        shape = [
+            (i, fieldname, filtername, is_null)\
+            for i, (fieldname, filtername, is_null)\
+            in enumerate(self._filter_shape(filters))
+        ]
+        return self._build_shape_criterion(schema_, shape)
+
+    def _related_schema(self, relationship):
+        """
+        Returns the schema of the resources in the *relationship* or None,
+        if the relationship is not a sqlalchemy relationship to a known
+        type.
+        """
+        if not isinstance(
+            relationship, (schema.ToOneRelationship, schema.ToManyRelationship)
+            ):
+            return None
+
+        typename = self.api.get_typename(
+            relationship.sqlrel.mapper.class_, None
+        )
+        return self.api.get_schema(typename) if typename else None
+
+    def related_typename(self, typename, relname):
+        """
+        """
+        schema_ = self.api.get_schema(typename, None)
+        if schema_ is None:
+            return None
+
+        related_schema = self._related_schema(
+            schema_.relationships.get(relname)
+        )
+        return related_schema.typename if related_schema else None
+
+    def _build_shape_criterion(self, schema_, shape):
+        """
+        Builds the criterion for the filters in *shape*, a list with
+        ``(index, fieldname, filtername, is_null)`` tuples. The *index*
+        is used in the name of the bound parameter.
+        """
         criterions = list()
-        for fieldname, filtername, value in filters:
+        related = OrderedDict()
+        for i, fieldname, filtername, is_null in shape:
+
+            # The filter belongs to a related resource.
+            relname, dot, subfieldname = fieldname.partition(".")
+            if dot:
+                related.setdefault(relname, list()).append(
+                    (i, subfieldname, filtername, is_null)
+                )
+                continue
 
-            # For the moment, we only allow filterting on attributes.
             attr = schema_.attributes.get(fieldname)
             if not isinstance(attr, schema.Attribute):
-                raise jsonapi.base.errors.UnfilterableField(filtername, fieldname)
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, fieldname
+                )
+
+            column = attr.class_attr
+            value = None if is_null else sqlalchemy.bindparam(
+                "jsonapi_filter_{}".format(i),
+                expanding=filtername in ("in", "nin")
+            )
 
             if filtername == "eq":
-                criterions.append(attr.class_attr == value)
+                criterions.append(
+                    column.is_(None) if is_null else column == value
+                )
             elif filtername == "ne":
-                criterions.append(attr.class_attr != value)
+                criterions.append(
+                    column.isnot(None) if is_null else column != value
+                )
             elif filtername == "lt":
-                criterions.append(attr.class_attr < value)
+                criterions.append(column < value)
             elif filtername == "lte":
-                criterions.append(attr.class_attr <= value)
+                criterions.append(column <= value)
             elif filtername == "gt":
-                criterions.append(attr.class_attr > value)
+                criterions.append(column > value)
             elif filtername == "gte":
-                criterions.append(attr.class_attr >= value)
+                criterions.append(column >= value)
             elif filtername == "in":
-                criterions.append(attr.class_attr.in_(value))
+                criterions.append(column.in_(value))
             elif filtername == "nin":
-                criterions.append(attr.class_attr.notin_(value))
-            elif filtername == "all":
-                # .. todo:: Implement it.
-                raise jsonapi.base.errors.UnfilterableField(filtername, fieldname)
-            elif filtername == "size":
-                # .. todo:: Implement it.
-                raise jsonapi.base.errors.UnfilterableField(filtername, fieldname)
+                criterions.append(column.notin_(value))
             elif filtername == "exists":
-                criterions.append(attr.class_attr != None)
+                criterions.append(column != None)
             elif filtername == "iexact":
                 # .. todo:: Escape *value*
-                criterions.append(attr.class_attr.ilike(value))
+                criterions.append(column.ilike(value))
             elif filtername == "contains":
-                criterions.append(attr.class_attr.contains(value))
+                criterions.append(column.contains(value))
             elif filtername == "icontains":
                 # .. todo:: Escape *value*
-                criterions.append(attr.class_attr.ilike("%" + value + "%"))
+                criterions.append(column.ilike(value))
             elif filtername == "startswith":
-                criterions.append(attr.class_attr.startswith(value))
+                criterions.append(column.startswith(value))
             elif filtername == "istartswith":
                 # .. todo:: Escape *value*
-                criterions.append(attr.class_attr.ilike(value + "%"))
+                criterions.append(column.ilike(value))
             elif filtername == "endswith":
-                criterions.append(attr.class_attr.endswith(value))
+                criterions.append(column.endswith(value))
             elif filtername == "iendswith":
                 # .. todo:: Escape *value*
-                criterions.append(attr.class_attr.ilike("%" + value))
+                criterions.append(column.ilike(value))
             elif filtername == "match":
                 # .. todo:: This only works for MYSQL
-                criterions.append(attr.class_attr.op("regexp")(value))
+                criterions.append(column.op("regexp")(value))
+            else:
+                # .. todo:: Implement *all* and *size*.
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, fieldname
+                )
+
+        # The filters on a relationship become an *EXISTS* subquery.
+        for relname, subshape in related.items():
+            relationship = schema_.relationships.get(relname)
+            related_schema = self._related_schema(relationship)
+            if related_schema is None:
+                i, subfieldname, filtername, is_null = subshape[0]
+                raise jsonapi.base.errors.UnfilterableField(
+                    schema_.typename, filtername, relname + "." + subfieldname
+                )
+
+            criterion = sqlalchemy.and_(
+                *self._build_shape_criterion(related_schema, subshape)
+            )
+            if relationship.to_one:
+                criterions.append(relationship.class_attr.has(criterion))
             else:
-                raise jsonapi.base.errors.UnfilterableField(filtername, fieldname)
+                criterions.append(relationship.class_attr.any(criterion))
         return criterions
 
     def _build_order_criterion(self, schema_, order):
@@ -162,41 +399,330 @@ class Session(jsonapi.base.database.Session):
         Builds the argument for the sqlalchemy query method
         :meth:`~sqlalchemy.orm.query.Query.order_by`.
 
+        A field name may be a path over *to-one* relationships, e.g.
+        ``author.name``. The related tables are joined with a ``LEFT OUTER
+        JOIN``. Returns a tuple with the joins, a list with the arguments
+        for :meth:`~sqlalchemy.orm.query.Query.outerjoin`, and the order
+        criterion.
+
         .. todo::
 
-            Support ordering also for relationships and hybrid methods.
+            Support ordering also for hybrid methods.
         """
+        # Maps a relationship path to the alias of the joined table.
+        aliases = OrderedDict()
+        joins = list()
+
         criterions = list()
         for direction, fieldname in order:
+            *path, attrname = fieldname.split(".")
+
+            # Join the related tables.
+            current_schema = schema_
+            entity = None
+            for i, relname in enumerate(path):
+                relationship = current_schema.relationships.get(relname)
+                related_schema = self._related_schema(relationship)
+                if related_schema is None or not relationship.to_one:
+                    raise jsonapi.base.errors.UnsortableField(
+                        schema_.typename, fieldname
+                    )
+
+                key = tuple(path[:i + 1])
+                if not key in aliases:
+                    onclause = relationship.class_attr if entity is None\
+                        else getattr(entity, relationship.sqlrel.key)
+                    alias = sqlalchemy.orm.aliased(
+                        relationship.sqlrel.mapper.class_
+                    )
+                    aliases[key] = alias
+                    joins.append((alias, onclause))
+                entity = aliases[key]
+                current_schema = related_schema
 
             # We only support sorting for attributes at the moment.
+            attr = current_schema.attributes.get(attrname)
+            if not isinstance(attr, schema.Attribute):
+                raise jsonapi.base.errors.UnsortableField(
+                    schema_.typename, fieldname
+                )
+
+            column = attr.class_attr if entity is None\
+                else getattr(entity, attr.class_attr.key)
+            if direction == "+":
+                criterions.append(column.asc())
+            else:
+                criterions.append(column.desc())
+        return (joins, criterions)
+
+    @staticmethod
+    def _cursor_value(column, value, source_parameter):
+        """
+        Converts the *value* of a sort field, which has been decoded from the
+        JSON of a cursor, back to the Python type of the *column*. E.g. a
+        *datetime* is encoded as ISO 8601 string and the id as string.
+
+        :raises jsonapi.base.errors.BadRequest:
+            If the value can not be converted.
+        """
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+
+        if isinstance(value, python_type):
+            return value
+        try:
+            if issubclass(
+                python_type, (datetime.datetime, datetime.date, datetime.time)
+                ):
+                return python_type.fromisoformat(value)
+            return python_type(value)
+        except (TypeError, ValueError, ArithmeticError):
+            raise jsonapi.base.errors.BadRequest(
+                detail="The cursor is not valid.",
+                source_parameter=source_parameter
+            )
+
+    def _build_cursor_criterion(self, schema_, cursor):
+        """
+        Translates the *cursor* into a range predicate, which selects the
+        resources after (or before) the cursor and the order criterion,
+        which must be used for the query.
+
+        *NULL* is sorted as the smallest value with an additional
+        ``column IS NULL`` order criterion, which works with all databases.
+
+        :arg jsonapi.sqlalchemy.schema.Schema schema_:
+        :arg jsonapi.base.pagination.Cursor cursor:
+        """
+        primary_key = sqlalchemy.inspect(schema_.resource_class).primary_key[0]
+
+        def column(fieldname):
+            # *None* refers to the primary key.
+            if fieldname is None:
+                return primary_key
+
             attr = schema_.attributes.get(fieldname)
             if not isinstance(attr, schema.Attribute):
-                raise jsonapi.base.errors.UnsortableField(schema_.typename, fieldname)
+                raise jsonapi.base.errors.UnsortableField(
+                    schema_.typename, fieldname
+                )
+            return attr.class_attr
+
+        def nullable(fieldname):
+            if fieldname is None:
+                return False
+            columns = getattr(column(fieldname).property, "columns", ())
+            return any(column_.nullable for column_ in columns)
 
+        order_criterion = list()
+        for direction, fieldname in cursor.query_order:
             if direction == "+":
-                criterions.append(attr.class_attr.asc())
+                if nullable(fieldname):
+                    order_criterion.append(column(fieldname).is_(None).desc())
+                order_criterion.append(column(fieldname).asc())
             else:
-                criterions.append(attr.class_attr.desc())
-        return criterions
+                if nullable(fieldname):
+                    order_criterion.append(column(fieldname).is_(None).asc())
+                order_criterion.append(column(fieldname).desc())
+
+        source_parameter = "page[before]" if cursor.before else "page[after]"
+
+        branches = list()
+        for branch in cursor.keyset():
+            conditions = list()
+            for fieldname, op, value in branch:
+                if op == "null":
+                    conditions.append(column(fieldname).is_(None))
+                    continue
+                elif op == "notnull":
+                    conditions.append(column(fieldname).isnot(None))
+                    continue
+
+                # The values are encoded as JSON in the cursor.
+                value = self._cursor_value(
+                    column(fieldname), value, source_parameter
+                )
+                if op == "eq":
+                    conditions.append(column(fieldname) == value)
+                elif op == "gt":
+                    conditions.append(column(fieldname) > value)
+                else:
+                    conditions.append(column(fieldname) < value)
+            branches.append(sqlalchemy.and_(*conditions))
+
+        filter_criterion = sqlalchemy.or_(*branches) if branches else None
+        return (filter_criterion, order_criterion)
+
+    def _build_load_options(self, typename, fields):
+        """
+        Returns a list with sqlalchemy loader options, which defer the columns
+        of all attributes, which are not part of the sparse fieldset *fields*.
+
+        Primary keys, foreign keys and the columns sqlalchemy needs internally
+        (polymorphic discriminator, version counter) are always loaded.
+
+        :arg str typename:
+        :arg dict fields:
+            The sparse fieldset
+        """
+        if not fields or not typename in fields:
+            return list()
+
+        type_fields = fields[typename]
+        schema_ = self.api.get_schema(typename)
+        mapper = sqlalchemy.inspect(schema_.resource_class)
+
+        # These columns are required by sqlalchemy.
+        keep_columns = {mapper.polymorphic_on, mapper.version_id_col}
+
+        options = list()
+        for name, attr in schema_.attributes.items():
+            if name in type_fields:
+                continue
+            if not isinstance(attr, schema.Attribute):
+                continue
+            if not isinstance(attr.sqlattr, sqlalchemy.orm.ColumnProperty):
+                continue
+            if any(col in keep_columns for col in attr.sqlattr.columns):
+                continue
+            options.append(sqlalchemy.orm.defer(attr.class_attr))
+        return options
+
+    def _build_include_options(self, typename, include, fields=None):
+        """
+        Returns a list with sqlalchemy loader options, which eager load the
+        relationships in the include paths *include*.
+
+        *to-many* relationships are loaded with one additional
+        ``SELECT ... IN (...)`` query per path (*selectinload*) and *to-one*
+        relationships with a ``LEFT OUTER JOIN`` (*joinedload*). So the number
+        of queries does not depend on the number of resources anymore. The
+        sparse fieldset *fields* is applied to the eager loaded relatives too.
+
+        Relationships, which are not sqlalchemy relationships or not known,
+        are skipped. They are loaded later by
+        :meth:`~jsonapi.base.database.Session.get_relatives`.
+
+        :arg str typename:
+        :arg list include:
+            A list of include paths
+        :arg dict fields:
+            The sparse fieldset
+        """
+        if not include:
+            return list()
+
+        def build_options(resource_class, tree):
+            typename = self.api.get_typename(resource_class, None)
+            schema_ = self.api.get_schema(typename, None)
+            if schema_ is None:
+                return list()
+
+            options = list()
+            for relname, subtree in tree.items():
+                rel = schema_.relationships.get(relname)
+                if not isinstance(
+                    rel, (schema.ToOneRelationship, schema.ToManyRelationship)
+                    ):
+                    continue
+
+                if rel.to_one:
+                    option = sqlalchemy.orm.joinedload(rel.class_attr)
+                else:
+                    option = sqlalchemy.orm.selectinload(rel.class_attr)
+
+                target_class = rel.sqlrel.mapper.class_
+                suboptions = self._build_load_options(
+                    self.api.get_typename(target_class, None), fields
+                )
+                suboptions.extend(build_options(target_class, subtree))
+                if suboptions:
+                    option = option.options(*suboptions)
+                options.append(option)
+            return options
+
+        resource_class = self.api.get_resource_class(typename)
+        return build_options(resource_class, build_include_tree(include))
+
+    def _cached_query(self, key, build):
+        """
+        Returns the query template with the *key* from the
+        :attr:`Database.statement_cache`. If it is not cached yet, it is
+        created with *build*. The template is not bound to a session.
+        """
+        if self.statement_cache is None:
+            return build()
+
+        template = self.statement_cache.get(key)
+        if template is None:
+            template = build()
+            self.statement_cache.set(key, template)
+        return template
 
     def _build_query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
         Maps the arguments to a sqlalchemy query object and returns it.
+
+        The query without the values of the filters and without the cursor
+        only depends on the *shape* of the arguments, so it is cached in the
+        :attr:`Database.statement_cache` and reused for all requests with
+        the same shape.
         """
         resource_class = self.api.get_resource_class(typename)
         schema_ = self.api.get_schema(typename)
 
-        query = self.sqla_session.query(resource_class)
+        if cursor is not None:
+            order = None
+
+        def build():
+            query = sqlalchemy.orm.Query(resource_class)
+
+            load_options = self._build_load_options(typename, fields)
+            load_options.extend(
+                self._build_include_options(typename, include, fields)
+            )
+            if load_options:
+                query = query.options(*load_options)
+
+            if filters:
+                filter_criterion = self._build_filter_criterion(
+                    schema_, filters
+                )
+                query = query.filter(*filter_criterion)
+
+            if order:
+                joins, order_criterion = self._build_order_criterion(
+                    schema_, order
+                )
+                for alias, onclause in joins:
+                    query = query.outerjoin(alias, onclause)
+                query = query.order_by(*order_criterion)
+            return query
 
+        key = (
+            "query", typename, self._filter_shape(filters),
+            tuple(order or ()),
+            tuple(
+                (typename_, tuple(fieldnames))\
+                for typename_, fieldnames in sorted((fields or {}).items())
+            ),
+            tuple(tuple(path) for path in include or ())
+        )
+        query = self._cached_query(key, build).with_session(self.sqla_session)
         if filters:
-            filter_criterion = self._build_filter_criterion(schema_, filters)
-            query = query.filter(*filter_criterion)
+            query = query.params(self._filter_params(filters))
 
-        if order:
-            order_criterion = self._build_order_criterion(schema_, order)
+        if cursor is not None:
+            cursor_criterion, order_criterion = self._build_cursor_criterion(
+                schema_, cursor
+            )
+            if cursor_criterion is not None:
+                query = query.filter(cursor_criterion)
             query = query.order_by(*order_criterion)
 
         if offset:
@@ -207,58 +733,327 @@ class Session(jsonapi.base.database.Session):
         return query
 
     def query(self, typename,
-        *, order=None, limit=None, offset=None, filters=None
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None, cursor=None
         ):
         """
         """
         query = self._build_query(
-            typename, order=order, limit=limit, offset=offset, filters=filters
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include, cursor=cursor
         )
-        return list(query)
+        resources = self.identity_map.add_all(query, fields)
+
+        # The order has been flipped for the resources before the cursor.
+        if cursor is not None and cursor.before:
+            resources.reverse()
+        return resources
 
     def query_size(self, typename,
-        *, order=None, limit=None, offset=None, filters
+        *, order=None, limit=None, offset=None, filters=None
+        ):
+        """
+        The *order* is ignored. If neither *limit* nor *offset* is given, a
+        plain ``SELECT COUNT(*) ... WHERE ...`` without a subquery is emitted.
+        """
+        if limit or offset:
+            query = self._build_query(
+                typename, limit=limit, offset=offset, filters=filters
+            )
+            return query.count()
+
+        resource_class = self.api.get_resource_class(typename)
+        schema_ = self.api.get_schema(typename)
+
+        def build():
+            query = sqlalchemy.orm.Query(sqlalchemy.func.count())\
+                .select_from(resource_class)
+            if filters:
+                filter_criterion = self._build_filter_criterion(
+                    schema_, filters
+                )
+                query = query.filter(*filter_criterion)
+            return query
+
+        key = ("count", typename, self._filter_shape(filters))
+        query = self._cached_query(key, build).with_session(self.sqla_session)
+        if filters:
+            query = query.params(self._filter_params(filters))
+        return query.scalar()
+
+    def query_with_size(self, typename,
+        *, order=None, limit=None, offset=None, filters=None, fields=None,
+        include=None
         ):
         """
+        Fetches the total number with a ``COUNT(*) OVER()`` window column
+        together with the resources. If the page is empty, the number is
+        queried with :meth:`query_size`.
         """
         query = self._build_query(
-            typename, order=order, limit=limit, offset=offset, filters=filters
+            typename, order=order, limit=limit, offset=offset, filters=filters,
+            fields=fields, include=include
+        )
+        query = query.add_columns(sqlalchemy.func.count().over())
+
+        rows = query.all()
+        if not rows:
+            return (list(), self.query_size(typename, filters=filters))
+
+        resources = self.identity_map.add_all(
+            [row[0] for row in rows], fields
         )
-        return query.count()
+        total = rows[0][1]
+        return (resources, total)
 
-    def get(self, identifier, required=False):
+    def estimate_size(self, typename, *, filters=None):
         """
+        Uses the planner statistics (``pg_class.reltuples``), if the
+        database is PostgreSQL and there are no *filters*. Otherwise, the
+        resources are counted with :meth:`query_size` and the number is
+        exact.
         """
+        if filters:
+            return (self.query_size(typename, filters=filters), False)
+
+        resource_class = self.api.get_resource_class(typename)
+        mapper = sqlalchemy.inspect(resource_class)
+        bind = self.sqla_session.get_bind(mapper)
+
+        # The statistics are only available for the whole table and not
+        # for the types in a single table inheritance.
+        if bind.dialect.name != "postgresql" \
+            or mapper.single or len(mapper.tables) != 1:
+            return (self.query_size(typename), False)
+
+        estimate = self.sqla_session.execute(
+            sqlalchemy.text(
+                "SELECT reltuples::bigint FROM pg_class "\
+                "WHERE oid = to_regclass(:table)"
+            ),
+            {"table": mapper.local_table.fullname}
+        ).scalar()
+
+        # The table has not been analyzed yet.
+        if estimate is None or estimate < 0:
+            return (self.query_size(typename), False)
+        return (estimate, True)
+
+    def get(self, identifier, required=False, fields=None, include=None):
+        """
+        """
+        resource = self.identity_map.get(identifier, fields)
+        if resource is not None:
+            return resource
+
+        cached = self.read_cache_get_many([identifier])[0]
+        if cached:
+            return cached[identifier]
+
         typename, resource_id = identifier
         resource_class = self.api.get_resource_class(typename)
-        resource = self.sqla_session.query(resource_class).get(resource_id)
 
-        if resource is None:
+        query = self.sqla_session.query(resource_class)
+
+        load_options = self._build_load_options(typename, fields)
+        load_options.extend(
+            self._build_include_options(typename, include, fields)
+        )
+        if load_options:
+            query = query.options(*load_options)
+
+        resource = query.get(resource_id)
+
+        if resource is not None:
+            resource = self.identity_map.add(resource, fields)
+            self.read_cache_set_many([resource], fields)
+        elif required:
             raise jsonapi.base.errors.ResourceNotFound(identifier)
         return resource
 
-    def get_many(self, identifiers, required=False):
+    def get_many(self, identifiers, required=False, fields=None):
         """
-        .. todo::
+        Loads the resources with one ``SELECT ... WHERE pk IN (...)`` query
+        per type. Very long id lists are split into chunks of
+        :attr:`get_many_chunk_size` ids.
+
+        If *required* is true, a :exc:`~jsonapi.base.errors.ErrorList` with
+        a :exc:`~jsonapi.base.errors.ResourceNotFound` error for each missing
+        resource is raised.
 
-            Can we require them in a bulk?
+        Only the resources, which are neither in the
+        :attr:`~jsonapi.base.database.Session.identity_map` nor in the
+        :attr:`~jsonapi.base.api.API.read_cache`, are queried.
         """
-        resources = {
-            identifier: self.get(identifier, required)\
-            for identifier in identifiers
-        }
+        resources, missing = self.identity_map.get_many(identifiers, fields)
+        if missing:
+            cached, missing = self.read_cache_get_many(missing)
+            resources.update(cached)
+        loaded = list()
+
+        # Group the ids by the typename.
+        ids_by_type = dict()
+        for identifier in missing:
+            typename, resource_id = ensure_identifier(identifier)
+            ids_by_type.setdefault(typename, set()).add(resource_id)
+
+        for typename, resource_ids in ids_by_type.items():
+            resource_class = self.api.get_resource_class(typename)
+            schema_ = self.api.get_schema(typename)
+            primary_key = sqlalchemy.inspect(resource_class).primary_key[0]
+
+            query = self.sqla_session.query(resource_class)
+
+            load_options = self._build_load_options(typename, fields)
+            if load_options:
+                query = query.options(*load_options)
+
+            # Query the resources and map them back to their id. The ids may
+            # be given as strings or as the type of the primary key, so we
+            # compare their string representation.
+            found = dict()
+            resource_ids = list(resource_ids)
+            for i in range(0, len(resource_ids), self.get_many_chunk_size):
+                chunk = resource_ids[i:i + self.get_many_chunk_size]
+                for resource in query.filter(primary_key.in_(chunk)):
+                    resource = self.identity_map.add(resource, fields)
+                    found[str(schema_.id_attribute.get(resource))] = resource
+                    loaded.append(resource)
+
+            # Resources, which do not exist, are mapped to None.
+            for resource_id in resource_ids:
+                resources[(typename, resource_id)] = found.get(
+                    str(resource_id)
+                )
+
+        self.read_cache_set_many(loaded, fields)
+
+        if required:
+            error_list = jsonapi.base.errors.ErrorList()
+            for identifier, resource in resources.items():
+                if resource is None:
+                    error_list.append(
+                        jsonapi.base.errors.ResourceNotFound(identifier)
+                    )
+            if error_list:
+                raise error_list
         return resources
 
+    def dump_resource(self, resource):
+        """
+        Returns the values of all column attributes, if they are loaded and
+        have not been changed.
+        """
+        state = sqlalchemy.inspect(resource)
+        if not state.persistent or state.modified:
+            return None
+
+        keys = [prop.key for prop in state.mapper.column_attrs]
+        if not all(key in state.dict for key in keys):
+            return None
+        return {key: state.dict[key] for key in keys}
+
+    def load_resource(self, typename, state):
+        """
+        Creates a persistent instance with the column values in *state*
+        without emitting a query. If the resource is already in the
+        sqlalchemy session, this instance is returned.
+        """
+        resource_class = self.api.get_resource_class(typename)
+        mapper = sqlalchemy.inspect(resource_class)
+
+        identity_key = mapper.identity_key_from_primary_key([
+            state[mapper.get_property_by_column(column).key]\
+            for column in mapper.primary_key
+        ])
+        resource = self.sqla_session.identity_map.get(identity_key)
+        if resource is not None:
+            return resource
+
+        resource = mapper.class_manager.new_instance()
+        for key, value in state.items():
+            sqlalchemy.orm.attributes.set_committed_value(resource, key, value)
+        sqlalchemy.orm.make_transient_to_detached(resource)
+        self.sqla_session.add(resource)
+        return resource
+
+    def changed_identifiers(self, resources):
+        """
+        The changed relationships are read from the attribute history, so
+        that no unloaded relationship must be loaded. Only for new resources,
+        the current relatives are used.
+        """
+        identifiers = set()
+        for resource in resources:
+            state = sqlalchemy.inspect(resource)
+            if not state.persistent:
+                identifiers.update(super().changed_identifiers([resource]))
+                continue
+
+            identifiers.add(ensure_identifier(resource))
+            for relationship in state.mapper.relationships:
+                # The history of an unloaded relationship may be
+                # ``History(None, None, None)``.
+                history = state.attrs[relationship.key].history
+                added = history.added or ()
+                deleted = history.deleted or ()
+                identifiers.update(
+                    ensure_identifier(relative)\
+                    for relative in chain(added, deleted)\
+                    if hasattr(relative, "_jsonapi")
+                )
+
+                # The old value of an unloaded many-to-one relationship is
+                # not part of the history, but we still know its foreign key.
+                if added and not deleted:
+                    identifier = self._replaced_relative(state, relationship)
+                    if identifier is not None:
+                        identifiers.add(identifier)
+        return identifiers
+
+    def _replaced_relative(self, state, relationship):
+        """
+        Returns the identifier of the relative, which has been replaced in the
+        unloaded many-to-one *relationship*, or None.
+
+        :arg state:
+            The sqlalchemy instance state of the resource
+        :arg relationship:
+            The sqlalchemy relationship property
+        """
+        if relationship.direction is not sqlalchemy.orm.interfaces.MANYTOONE:
+            return None
+        if len(relationship.local_remote_pairs) != 1:
+            return None
+
+        typename = self.api.get_typename(relationship.mapper.class_, None)
+        if typename is None:
+            return None
+
+        column = relationship.local_remote_pairs[0][0]
+        prop = state.mapper.get_property_by_column(column)
+        value = state.attrs[prop.key].loaded_value
+        if value is None or value is sqlalchemy.orm.base.NO_VALUE:
+            return None
+        return (typename, str(value))
+
     def save(self, resources):
         """
         """
+        self.invalidate_caches(resources)
         self.sqla_session.add_all(resources)
         return None
 
     def delete(self, resources):
         """
         """
+        # All relatives lose a relationship, so we can not use the
+        # attribute history here.
+        self.invalidate_caches(
+            resources, super().changed_identifiers(resources)
+        )
         for resource in resources:
+            self.identity_map.discard(ensure_identifier(resource))
             self.sqla_session.delete(resource)
         return None
 
@@ -266,4 +1061,14 @@ class Session(jsonapi.base.database.Session):
         """
         """
         self.sqla_session.commit()
+        self.invalidate_committed_caches()
+        return None
+
+    def close(self):
+        """
+        Closes the SQLAlchemy session, if it has been opened, so that its
+        connection is returned to the pool.
+        """
+        if self._sqla_session is not None:
+            self._sqla_session.close()
         return None
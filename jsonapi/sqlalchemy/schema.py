@@ -30,6 +30,7 @@ The *py-jsonapi* schema for *sqlalchemy* models.
 """
 
 # std
+from itertools import chain
 import logging
 
 # third party
@@ -125,11 +126,39 @@ class ToOneRelationship(jsonapi.base.schema.ToOneRelationship):
         self.sqlrel = sqlrel
         self.class_attr = sqlrel.class_attribute
         self.resource_class = resource_class
+
+        # The name of the attribute, which holds the foreign key, if it
+        # references the primary key of the relative. Otherwise, the
+        # relative must be loaded to get its id.
+        self._foreign_key = None
+        if len(sqlrel.local_remote_pairs) == 1 \
+            and len(sqlrel.mapper.primary_key) == 1 \
+            and sqlrel.mapper.polymorphic_on is None:
+            local, remote = sqlrel.local_remote_pairs[0]
+            if remote is sqlrel.mapper.primary_key[0]:
+                self._foreign_key = sqlrel.parent\
+                    .get_property_by_column(local).key
         return None
 
     def get(self, resource):
         return self.class_attr.__get__(resource, None)
 
+    def get_identifiers(self, resource):
+        """
+        Reads the foreign key column instead of loading the relative, if the
+        relationship has not been loaded yet.
+        """
+        state = sqlalchemy.inspect(resource)
+        if self._foreign_key is None or self.name in state.dict \
+            or not self._foreign_key in state.dict:
+            return super().get_identifiers(resource)
+
+        relative_id = state.dict[self._foreign_key]
+        if relative_id is None:
+            return None
+        typename = self.sqlrel.mapper.class_._jsonapi["typename"]
+        return (typename, str(relative_id))
+
     def set(self, resource, relative):
         return self.class_attr.__set__(resource, relative)
 
@@ -152,11 +181,96 @@ class ToManyRelationship(jsonapi.base.schema.ToManyRelationship):
         self.sqlrel = sqlrel
         self.class_attr = sqlrel.class_attribute
         self.resource_class = resource_class
+
+        # The columns ``(parent key, relative id)`` used to query the
+        # identifiers without loading the relatives or None, if the
+        # relationship is too complex.
+        self._id_columns = self._find_id_columns()
+        return None
+
+    def _find_id_columns(self):
+        """
+        Returns the two tuple ``(parent key, relative id)`` of the columns,
+        which link the parent primary key with the relative's primary key.
+        For a *one-to-many* relationship, these are the foreign key and the
+        primary key of the relative's table, for a *many-to-many*
+        relationship, both columns are in the association table.
+
+        Returns None, if the relationship uses more than one column for the
+        join, a custom join condition or an *order_by* clause.
+        """
+        sqlrel = self.sqlrel
+        if len(sqlrel.parent.primary_key) != 1 \
+            or len(sqlrel.mapper.primary_key) != 1 \
+            or sqlrel.mapper.polymorphic_on is not None \
+            or sqlrel.order_by \
+            or len(sqlrel.synchronize_pairs) != 1:
+            return None
+
+        parent_pk = sqlrel.parent.primary_key[0]
+        relative_pk = sqlrel.mapper.primary_key[0]
+
+        parent_col, parent_key = sqlrel.synchronize_pairs[0]
+        if parent_col is not parent_pk \
+            or not sqlrel.primaryjoin.compare(parent_col == parent_key):
+            return None
+
+        if sqlrel.direction == sqlalchemy.orm.interfaces.ONETOMANY:
+            return (parent_key, relative_pk)
+
+        if sqlrel.direction == sqlalchemy.orm.interfaces.MANYTOMANY:
+            if len(sqlrel.secondary_synchronize_pairs) != 1:
+                return None
+            relative_col, relative_key = sqlrel.secondary_synchronize_pairs[0]
+            if relative_col is not relative_pk or not sqlrel.secondaryjoin\
+                .compare(relative_col == relative_key):
+                return None
+            return (parent_key, relative_key)
         return None
 
     def get(self, resource):
         return self.class_attr.__get__(resource, None)
 
+    def get_identifiers(self, resource):
+        """
+        """
+        return self.get_identifiers_many([resource])[0]
+
+    def get_identifiers_many(self, resources):
+        """
+        Loads the identifiers of all resources, whichs relationship has not
+        been loaded yet, with one ``SELECT parent_key, relative_id ... WHERE
+        parent_key IN (...)`` query. The relatives themselves are not loaded.
+        """
+        identifiers = [None]*len(resources)
+
+        # Maps the primary key of a resource to its positions in *resources*.
+        unloaded = dict()
+        sqla_session = None
+        for i, resource in enumerate(resources):
+            state = sqlalchemy.inspect(resource)
+            if self._id_columns is None or self.name in state.dict \
+                or state.identity is None or state.session is None:
+                identifiers[i] = super().get_identifiers(resource)
+            else:
+                unloaded.setdefault(state.identity[0], list()).append(i)
+                sqla_session = state.session
+
+        if unloaded:
+            for i in chain.from_iterable(unloaded.values()):
+                identifiers[i] = list()
+
+            typename = self.sqlrel.mapper.class_._jsonapi["typename"]
+            parent_key, relative_id = self._id_columns
+            query = sqla_session.query(parent_key, relative_id)\
+                .filter(parent_key.in_(list(unloaded)))
+
+            for key, relative_id in query:
+                identifier = (typename, str(relative_id))
+                for i in unloaded.get(key, ()):
+                    identifiers[i].append(identifier)
+        return identifiers
+
     def set(self, resource, relatives):
         self.class_attr.__set__(resource, relatives)
         return None
@@ -246,4 +360,13 @@ class Schema(jsonapi.base.schema.Schema):
         # Use the primary id of the resource_class, if no id marker is set.
         if self.id_attribute is None:
             self.id_attribute = IDAttribute(self.resource_class)
+
+        # Use the version counter of the mapper as version attribute.
+        if self.version_attribute is None \
+            and inspection.version_id_col is not None:
+            sql_attr = inspection.get_property_by_column(
+                inspection.version_id_col
+            )
+            self.version_attribute = self.attributes.get(sql_attr.key)\
+                or Attribute(self.resource_class, sql_attr)
         return None
@@ -34,6 +34,7 @@ import asyncio
 import tornado
 import tornado.web
 import tornado.gen
+from tornado.platform.asyncio import to_asyncio_future
 
 # local
 import jsonapi
@@ -80,6 +81,12 @@ class Handler(tornado.web.RequestHandler):
 
         if resp.is_file:
             raise RuntimeError("Sorry, files are not yet supported :(")
+        elif resp.is_stream:
+            # Send the body chunk by chunk, so that only one chunk is
+            # buffered at a time.
+            for chunk in resp.body:
+                self.write(chunk)
+                yield from to_asyncio_future(self.flush())
         elif resp.has_body:
             self.write(resp.body)
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""
+Fixtures for the tests: a small blog API with *User* and *Post* resources
+on top of an in-memory SQLite database.
+"""
+
+# std
+import json
+
+# third party
+import pytest
+sqlalchemy = pytest.importorskip("sqlalchemy")
+import sqlalchemy.orm
+from sqlalchemy.ext.declarative import declarative_base
+
+# local
+import jsonapi
+import jsonapi.sqlalchemy
+from jsonapi.base.request import Request
+
+
+Base = declarative_base()
+
+
+class User(Base):
+
+    __tablename__ = "users"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    name = sqlalchemy.Column(sqlalchemy.String)
+    country = sqlalchemy.Column(sqlalchemy.String)
+
+
+class Post(Base):
+
+    __tablename__ = "posts"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    text = sqlalchemy.Column(sqlalchemy.Text)
+    created = sqlalchemy.Column(sqlalchemy.DateTime)
+
+    author_id = sqlalchemy.Column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id")
+    )
+    author = sqlalchemy.orm.relationship(
+        "User", backref=sqlalchemy.orm.backref("posts"),
+        foreign_keys=[author_id]
+    )
+
+    editor_id = sqlalchemy.Column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id")
+    )
+    editor = sqlalchemy.orm.relationship("User", foreign_keys=[editor_id])
+
+
+@pytest.fixture
+def sessionmaker():
+    engine = sqlalchemy.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sqlalchemy.orm.sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def statements(sessionmaker):
+    """
+    Returns a list, which records the SQL statements sent to the database.
+    """
+    statements = list()
+    sqlalchemy.event.listen(
+        sessionmaker.kw["bind"], "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+    return statements
+
+
+@pytest.fixture
+def make_api(sessionmaker):
+    """
+    Returns a function, which creates the API with the given *settings*.
+    """
+    def make_api(**settings):
+        db = jsonapi.sqlalchemy.Database(sessionmaker=sessionmaker)
+        api = jsonapi.base.api.API("/api", db, settings=settings)
+        api.add_type(jsonapi.sqlalchemy.Schema(User))
+        api.add_type(jsonapi.sqlalchemy.Schema(Post))
+        return api
+    return make_api
+
+
+@pytest.fixture
+def request_():
+    """
+    Returns a function, which sends a request to the *api* and returns the
+    response.
+    """
+    def request_(api, method, uri, body=None, headers=None):
+        headers_ = {
+            "content-type": "application/vnd.api+json",
+            "accept": "application/vnd.api+json"
+        }
+        headers_.update(headers or dict())
+        body = json.dumps(body).encode() if body is not None else b""
+        return api.handle_request(
+            Request("http://localhost" + uri, method, headers_, body)
+        )
+    return request_
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# std
+import gzip
+import json
+
+# third party
+import pytest
+
+# local
+from jsonapi.base.request import Request
+from conftest import Post, User
+
+
+@pytest.fixture
+def blog(sessionmaker):
+    session = sessionmaker()
+    session.add(User(id=1, name="Homer", country="us"))
+    for i in range(1, 6):
+        session.add(Post(id=i, text="Post {}".format(i), author_id=1))
+    session.commit()
+    session.close()
+    return None
+
+
+def test_stream(blog, make_api, request_):
+    """
+    A collection with at least *stream_threshold* resources is encoded in
+    chunks. The document is the same.
+    """
+    response = request_(make_api(), "get", "/api/Post?include=author")
+    assert not response.is_stream
+    expected = json.loads(response.body.decode())
+
+    api = make_api(stream_threshold=5)
+    response = request_(api, "get", "/api/Post?include=author")
+    assert response.is_stream
+    assert json.loads(b"".join(response.body).decode()) == expected
+
+
+def test_dump_json_iter(make_api):
+    """
+    The resources in *data* are encoded one after another.
+    """
+    api = make_api()
+    data = ({"type": "Post", "id": str(i)} for i in range(3))
+    chunks = list(api.dump_json_iter({"data": data, "meta": {}}, 1))
+    assert len(chunks) > 3
+    assert json.loads(b"".join(chunks).decode()) == {
+        "data": [{"type": "Post", "id": str(i)} for i in range(3)],
+        "meta": {}
+    }
+
+
+def test_json_codec(make_api):
+    """
+    The codec is selected with ``settings["json_codec"]`` and works on
+    *bytes*.
+    """
+    api = make_api(json_codec="json")
+    assert api.json_codec.name == "json"
+    assert api.dump_json({"id": "1"}) == b'{"id":"1"}'
+    assert api.load_json(b'{"id": "1"}') == {"id": "1"}
+
+
+def test_not_modified(blog, make_api, request_):
+    """
+    A request with a matching *If-None-Match* header is answered with
+    *304 Not Modified* and without a body.
+    """
+    api = make_api()
+    response = request_(api, "get", "/api/Post/1")
+    assert response.status == 200
+    etag = response.headers["etag"]
+
+    response = request_(
+        api, "get", "/api/Post/1", headers={"if-none-match": etag}
+    )
+    assert response.status == 304
+    assert response.body is None
+    assert response.headers["etag"] == etag
+
+    response = request_(
+        api, "get", "/api/Post/1", headers={"if-none-match": '"other"'}
+    )
+    assert response.status == 200
+
+
+@pytest.mark.parametrize("uri", [
+    "/api/Post", "/api/Post/1", "/api/Post/1/author",
+    "/api/Post/1/relationships/author"
+])
+def test_head(blog, make_api, request_, uri):
+    """
+    A HEAD request is answered without building the document.
+    """
+    api = make_api()
+    def dump_document(*args, **kargs):
+        raise AssertionError("The document must not be encoded.")
+    api.dump_document = api.dump_document_iter = dump_document
+
+    response = request_(api, "head", uri)
+    assert response.status == 200
+    assert response.body is None
+    assert response.headers["content-type"] == "application/vnd.api+json"
+
+
+def test_head_not_found(blog, make_api, request_):
+    response = request_(make_api(), "head", "/api/Post/9")
+    assert response.status == 404
+    assert response.body is None
+
+
+def test_etag_per_content_coding(sessionmaker, make_api, request_):
+    """
+    The representations with different content codings have different
+    strong *ETags* and *If-None-Match* is compared with the *ETag* of the
+    negotiated coding.
+    """
+    session = sessionmaker()
+    session.add(User(id=1, name="Homer"*500))
+    session.commit()
+    session.close()
+
+    api = make_api(compression={"min_size": 100})
+    etags = dict()
+    for encoding in ("gzip", "identity"):
+        response = request_(
+            api, "get", "/api/User/1", headers={"accept-encoding": encoding}
+        )
+        assert response.status == 200
+        etags[encoding] = response.headers["etag"]
+    assert etags["gzip"] != etags["identity"]
+    assert not etags["gzip"].startswith("W/")
+
+    for encoding, etag, status in [
+        ("gzip", etags["gzip"], 304),
+        ("gzip", etags["identity"], 200),
+        ("identity", etags["gzip"], 200),
+        ("identity", etags["identity"], 304)
+        ]:
+        response = request_(api, "get", "/api/User/1", headers={
+            "accept-encoding": encoding, "if-none-match": etag
+        })
+        assert response.status == status
+
+
+def test_compression(sessionmaker, make_api, request_):
+    """
+    The body is compressed with the preferred coding, if it is large
+    enough.
+    """
+    session = sessionmaker()
+    session.add_all([User(id=1, name="Homer"*500), User(id=2, name="Bart")])
+    session.commit()
+    session.close()
+
+    api = make_api(compression={"min_size": 1000})
+    identity = request_(api, "get", "/api/User/1")
+    assert not "content-encoding" in identity.headers
+
+    response = request_(
+        api, "get", "/api/User/1",
+        headers={"accept-encoding": "deflate;q=0.5, gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert gzip.decompress(response.body) == identity.body
+
+    response = request_(
+        api, "get", "/api/User/2", headers={"accept-encoding": "gzip"}
+    )
+    assert not "content-encoding" in response.headers
+
+
+def test_msgpack(blog, make_api, request_):
+    """
+    The documents can be exchanged as *MessagePack*.
+    """
+    msgpack = pytest.importorskip("msgpack")
+    media_type = "application/vnd.api+msgpack"
+
+    api = make_api()
+    expected = json.loads(request_(api, "get", "/api/Post/1").body.decode())
+
+    response = request_(
+        api, "get", "/api/Post/1", headers={"accept": media_type}
+    )
+    assert response.status == 200
+    assert response.headers["content-type"] == media_type
+    assert msgpack.unpackb(response.body, raw=False) == expected
+
+    body = msgpack.packb({
+        "data": {"type": "Post", "id": "1", "attributes": {"text": "Woohoo"}}
+    })
+    response = api.handle_request(Request(
+        "http://localhost/api/Post/1", "patch",
+        {"content-type": media_type, "accept": media_type}, body
+    ))
+    assert response.status == 200
+    document = msgpack.unpackb(response.body, raw=False)
+    assert document["data"]["attributes"]["text"] == "Woohoo"
+
+
+def count_closed_sessions(api):
+    """
+    Returns a list, which gets an item for each closed database session.
+    """
+    closed = list()
+    open_session = api.database.session
+    def session():
+        db = open_session()
+        close = db.close
+        def close_db():
+            closed.append(db)
+            return close()
+        db.close = close_db
+        return db
+    api.database.session = session
+    return closed
+
+
+@pytest.mark.parametrize("method, uri, status", [
+    ("get", "/api/Comment", 404),
+    ("get", "/api/Post/1/2/3", 404),
+    ("delete", "/api/Post", 405)
+])
+def test_no_session_for_errors(blog, make_api, request_, method, uri, status):
+    """
+    Requests, which fail before the database is needed, do not open a
+    database session.
+    """
+    api = make_api()
+    response = request_(api, method, uri)
+    assert response.status == status
+    assert api.database.stats()["opened"] == 0
+
+
+@pytest.mark.parametrize("uri, status", [
+    ("/api/Post", 200),
+    ("/api/Post/9", 404)
+])
+def test_session_closed(blog, make_api, request_, uri, status):
+    """
+    The database session is closed, when the request has been handled.
+    """
+    api = make_api()
+    closed = count_closed_sessions(api)
+    response = request_(api, "get", uri)
+    assert response.status == status
+    assert len(closed) == 1
+
+    stats = api.database.stats()
+    assert stats["opened"] == 1
+    assert stats["checkouts"] >= 1
+
+
+def test_session_closed_after_stream(blog, make_api, request_):
+    """
+    The database session of a streamed response is closed, when the body
+    has been consumed.
+    """
+    api = make_api(stream_threshold=1)
+    closed = count_closed_sessions(api)
+
+    response = request_(api, "get", "/api/Post")
+    assert response.is_stream
+    assert not closed
+
+    b"".join(response.body)
+    assert len(closed) == 1
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# std
+import datetime
+import decimal
+import json
+import uuid
+
+# third party
+import pytest
+
+# local
+from jsonapi.base import codecs
+
+
+class Money(object):
+
+    def __init__(self, amount):
+        self.amount = amount
+
+
+@pytest.mark.parametrize("name", list(codecs.CODECS))
+def test_dumps_bytes(name):
+    """
+    The documents are encoded to *bytes*. The types, which are not
+    supported by the backend, are converted by the encoders.
+    """
+    codec = codecs.get_codec(name)
+    d = {
+        "created": datetime.datetime(2016, 1, 2, 3, 4, 5),
+        "price": decimal.Decimal("1.50"),
+        "uuid": uuid.UUID(int=1),
+        "name": "Hömer"
+    }
+    data = codec.dumps(d)
+    assert isinstance(data, bytes)
+    assert json.loads(data.decode("utf-8")) == {
+        "created": "2016-01-02T03:04:05",
+        "price": "1.50",
+        "uuid": "00000000-0000-0000-0000-000000000001",
+        "name": "Hömer"
+    }
+    assert codec.loads(data)["name"] == "Hömer"
+
+
+@pytest.mark.parametrize("name", list(codecs.CODECS))
+def test_register_encoder(name):
+    codec = codecs.get_codec(name)
+    with pytest.raises(TypeError):
+        codec.dumps({"price": Money(2)})
+
+    codec.register_encoder(Money, lambda o: o.amount)
+    assert codec.loads(codec.dumps({"price": Money(2)})) == {"price": 2}
+
+
+def test_get_codec():
+    assert isinstance(codecs.get_codec("json"), codecs.StdlibCodec)
+    fastest = next(iter(codecs.CODECS.values()))
+    assert isinstance(codecs.get_codec(), fastest)
+    with pytest.raises(ValueError):
+        codecs.get_codec("pickle")
+
+
+@pytest.mark.parametrize("name", list(codecs.BINARY_CODECS))
+def test_binary_codecs(name):
+    codec = codecs.get_binary_codecs([name])[0]
+    d = {
+        "data": {"type": "Post", "id": "1"},
+        "created": datetime.date(2016, 1, 2)
+    }
+    assert codec.loads(codec.dumps(d)) == {
+        "data": {"type": "Post", "id": "1"}, "created": "2016-01-02"
+    }
+    with pytest.raises(ValueError):
+        codec.loads(b"\xc1")
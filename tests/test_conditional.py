@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+# local
+from jsonapi.base.compression import Compression
+from jsonapi.base.request import Request
+from jsonapi.base.response import Response
+
+
+def test_compression_suffixes_strong_etag():
+    """
+    The compressed representation must not inherit a strong *ETag*.
+    """
+    request = Request(
+        "http://localhost/api/Post", "get", {"accept-encoding": "gzip"}, b""
+    )
+    compression = Compression(min_size=0)
+
+    response = Response(headers={"etag": '"abc"'}, body=b"{}")
+    compression.compress(request, response)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+
+    response = Response(headers={"etag": 'W/"abc"'}, body=b"{}")
+    compression.compress(request, response)
+    assert response.headers["etag"] == 'W/"abc"'
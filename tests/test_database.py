@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# local
+from jsonapi.base.database import IdentityMap
+
+
+class Schema(object):
+
+    def __init__(self, typename):
+        self.typename = typename
+        self.id_attribute = self
+
+    def get(self, resource):
+        return resource.id
+
+
+class Resource(object):
+
+    def __init__(self, typename, id_):
+        self.id = id_
+        self._jsonapi = {"schema": Schema(typename)}
+
+
+def test_identity_map():
+    """
+    The same object is returned for repeated lookups.
+    """
+    identity_map = IdentityMap()
+    post = Resource("Post", "1")
+    assert identity_map.add(post) is post
+    assert identity_map.add(Resource("Post", "1")) is post
+
+    assert identity_map.get(("Post", "1")) is post
+    assert identity_map.get(("Post", "2")) is None
+
+    resources, missing = identity_map.get_many([("Post", "1"), ("Post", "2")])
+    assert resources == {("Post", "1"): post}
+    assert missing == [("Post", "2")]
+    assert identity_map.stats() == {"resources": 1, "hits": 2, "misses": 2}
+
+
+def test_identity_map_fields():
+    """
+    A resource loaded with a sparse fieldset is only returned for the same
+    or a smaller fieldset. A completely loaded resource replaces it.
+    """
+    identity_map = IdentityMap()
+    post = Resource("Post", "1")
+    identity_map.add(post, {"Post": ["text", "created"]})
+
+    assert identity_map.get(("Post", "1"), {"Post": ["text"]}) is post
+    assert identity_map.get(("Post", "1"), {"Post": ["author"]}) is None
+    assert identity_map.get(("Post", "1")) is None
+
+    complete = Resource("Post", "1")
+    assert identity_map.add(complete) is complete
+    assert identity_map.get(("Post", "1"), {"Post": ["author"]}) is complete
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# std
+import json
+
+# third party
+import pytest
+mongoengine = pytest.importorskip("mongoengine")
+mongomock = pytest.importorskip("mongomock")
+
+# local
+import jsonapi
+import jsonapi.mongoengine
+from jsonapi.marker.method import attribute, to_one_relationship
+
+
+class User(mongoengine.Document):
+
+    name = mongoengine.StringField()
+
+
+class Post(mongoengine.Document):
+
+    title = mongoengine.StringField()
+    text = mongoengine.StringField()
+    author_name = mongoengine.StringField()
+
+    @attribute
+    def summary(self):
+        return self.text[:3]
+
+    @to_one_relationship
+    def author(self):
+        return User.objects(name=self.author_name).first()
+
+
+@pytest.fixture
+def api():
+    mongoengine.connect(
+        "jsonapi", host="mongodb://localhost",
+        mongo_client_class=mongomock.MongoClient
+    )
+    User(name="Homer").save()
+    Post(title="Hello", text="Doh doh", author_name="Homer").save()
+
+    api = jsonapi.base.api.API("/api", jsonapi.mongoengine.Database())
+    api.add_type(jsonapi.mongoengine.Schema(User))
+    api.add_type(jsonapi.mongoengine.Schema(Post))
+    yield api
+
+    User.drop_collection()
+    Post.drop_collection()
+    mongoengine.disconnect()
+
+
+def get(request_, api, uri):
+    response = request_(api, "get", uri)
+    assert response.status == 200
+    return json.loads(response.body.decode())["data"][0]
+
+
+def test_only_fields(api, request_):
+    """
+    Only the id and the requested document fields are loaded.
+    """
+    session = api.database.session()
+    schema = api.get_schema("Post")
+    assert session._build_only_criterion(schema, {"Post": ["title"]}) \
+        == ["id", "title"]
+
+    data = get(request_, api, "/api/Post?fields[Post]=title")
+    assert data["attributes"] == {"title": "Hello"}
+
+
+def test_only_marker_fields(api, request_):
+    """
+    The markers may read any field, so all fields are loaded for them.
+    """
+    session = api.database.session()
+    schema = api.get_schema("Post")
+    assert session._build_only_criterion(schema, {"Post": ["summary"]}) \
+        is None
+    assert session._build_only_criterion(schema, {"Post": ["author"]}) \
+        is None
+
+    data = get(request_, api, "/api/Post?fields[Post]=summary")
+    assert data["attributes"] == {"summary": "Doh"}
+
+    data = get(request_, api, "/api/Post?fields[Post]=title,author")
+    user = User.objects.first()
+    assert data["relationships"]["author"]["data"] \
+        == {"type": "User", "id": str(user.id)}
+
+
+def test_identity_map(api):
+    """
+    A resource is loaded only once per session.
+    """
+    session = api.database.session()
+    post = Post.objects.first()
+    identifier = ("Post", str(post.id))
+
+    resource = session.get(identifier)
+    assert session.get(identifier) is resource
+    assert session.get_many([identifier]) == {identifier: resource}
+    assert session.query("Post") == [resource]
+    assert session.identity_map.hits == 2
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# std
+import datetime
+import json
+import urllib.parse
+
+# third party
+import pytest
+
+# local
+from conftest import Post, User
+
+
+@pytest.fixture
+def posts(sessionmaker):
+    """
+    Creates 7 posts. Two of them have no *created* date.
+    """
+    session = sessionmaker()
+    session.add(User(id=1, name="Homer"))
+    for i in range(1, 8):
+        created = datetime.datetime(2016, 1, 8 - i) if i > 2 else None
+        session.add(Post(id=i, text=str(i), created=created, author_id=1))
+    session.commit()
+    session.close()
+    return None
+
+
+def get(request_, api, uri):
+    response = request_(api, "get", uri)
+    assert response.status == 200
+    return json.loads(response.body.decode())
+
+
+def follow(request_, api, link):
+    parsed_uri = urllib.parse.urlparse(link)
+    return get(request_, api, parsed_uri.path + "?" + parsed_uri.query)
+
+
+def ids(document):
+    return [item["id"] for item in document["data"]]
+
+
+def test_page_size_without_cursor(posts, make_api, request_):
+    """
+    The cursor pagination must be enabled for requests without a cursor.
+    """
+    api = make_api()
+    document = get(request_, api, "/api/Post?page[size]=2")
+    assert ids(document) == ["1", "2", "3", "4", "5", "6", "7"]
+
+    api = make_api(cursor_pagination=True)
+    document = get(request_, api, "/api/Post?page[size]=2")
+    assert ids(document) == ["1", "2"]
+    assert "next" in document["links"]
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("created", ["1", "2", "7", "6", "5", "4", "3"]),
+    ("-created", ["3", "4", "5", "6", "7", "1", "2"])
+])
+def test_cursor_datetime_and_null(posts, make_api, request_, sort, expected):
+    """
+    The pages are sorted by a nullable *datetime*. We walk forward through
+    all pages and back again.
+    """
+    api = make_api(cursor_pagination=True)
+
+    pages = [get(request_, api, "/api/Post?page[size]=2&sort=" + sort)]
+    while "next" in pages[-1]["links"]:
+        pages.append(follow(request_, api, pages[-1]["links"]["next"]))
+    assert [id_ for page in pages for id_ in ids(page)] == expected
+    assert len(pages) == 4
+
+    # The *before* pages know, that there is a next page.
+    page = follow(request_, api, pages[-1]["links"]["prev"])
+    while True:
+        assert ids(page) in [ids(other) for other in pages]
+        assert "next" in page["links"]
+        if not "prev" in page["links"]:
+            break
+        page = follow(request_, api, page["links"]["prev"])
+    assert ids(page) == expected[:2]
+
+
+def test_estimate_fallback_is_exact(posts, make_api, request_):
+    """
+    SQLite has no planner statistics, so the resources are counted and the
+    total is not flagged as approximate.
+    """
+    api = make_api(count_strategy="estimate")
+    document = get(request_, api, "/api/Post?page[size]=2&page[number]=1")
+    assert document["meta"]["total-resources"] == 7
+    assert not "total-approximate" in document["meta"]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+# std
+import json
+
+# third party
+import pytest
+
+# local
+from jsonapi.base.query import parse_query
+
+
+def test_parse_query():
+    query = parse_query(
+        "page[number]=2&page[size]=10&filter[author.name]=eq:%22Homer%22"\
+        "&fields[Post]=text,created&sort=-created,text",
+        json.loads
+    )
+    assert (query.page_number, query.page_size) == (2, 10)
+    assert query.filters == (("author.name", "eq", "Homer"),)
+    assert query.fields == (("Post", ("text", "created")),)
+    assert query.sort == (("-", "created"), ("+", "text"))
+
+    assert query == parse_query(query.raw, json.loads)
+    assert hash(query) == hash(parse_query(query.raw, json.loads))
+    with pytest.raises(AttributeError):
+        query.sort = ()
+
+
+@pytest.mark.parametrize("key", [
+    "filter[na^me]", "filter[na`me]", "filter[na[me]", "filter[na\\me]",
+    "fields[Po^st]", "fields[Po`st]"
+])
+def test_invalid_keys(key):
+    """
+    The field names and typenames contain only letters, digits and the
+    underscore.
+    """
+    query = parse_query(key + "=eq:1", json.loads)
+    assert query.filters == ()
+    assert query.fields == ()
+
+
+def test_include_tree():
+    """
+    The include paths are merged into a read-only prefix tree.
+    """
+    query = parse_query("include=comments,comments.author,author", json.loads)
+    assert query.include == (("comments",), ("comments", "author"), ("author",))
+    assert query.include_tree == {"comments": {"author": {}}, "author": {}}
+    with pytest.raises(TypeError):
+        query.include_tree["post"] = {}
+
+    assert parse_query("sort=text", json.loads).include_tree == {}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# std
+import json
+
+# third party
+import pytest
+
+# local
+from jsonapi.base.cache import MemcachedBackend, MemoryBackend, ReadCache
+from conftest import Post, User
+
+
+class MemcachedClient(object):
+    """
+    A local stand-in for :class:`pymemcache.client.base.Client`.
+    """
+
+    def __init__(self):
+        self.data = dict()
+
+    def get_many(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_many(self, mapping, expire=0):
+        assert all(isinstance(value, bytes) for value in mapping.values())
+        self.data.update(mapping)
+        return []
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.data.pop(key, None)
+        return True
+
+    def flush_all(self):
+        self.data.clear()
+        return True
+
+
+@pytest.fixture(params=["memory", "memcached"])
+def api(request, sessionmaker, make_api):
+    session = sessionmaker()
+    session.add_all([
+        User(id=1, name="Homer"),
+        User(id=2, name="Marge"),
+        Post(id=1, text="Doh", author_id=1)
+    ])
+    session.commit()
+    session.close()
+
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = MemcachedBackend(client=MemcachedClient())
+    return make_api(read_cache=ReadCache(backend=backend))
+
+
+def get(request_, api, uri):
+    response = request_(api, "get", uri)
+    assert response.status == 200
+    return json.loads(response.body.decode())["data"]
+
+
+def test_hit(api, statements):
+    """
+    The second session gets the resource from the cache.
+    """
+    session = api.database.session()
+    assert session.get(("User", "1")).name == "Homer"
+    session.close()
+    assert len(statements) == 1
+
+    session = api.database.session()
+    assert session.get_many([("User", "1")])[("User", "1")].name == "Homer"
+    session.close()
+    assert len(statements) == 1
+    assert api.read_cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_invalidate_on_commit(api, request_):
+    """
+    A saved resource is removed from the cache.
+    """
+    assert get(request_, api, "/api/User/1")["attributes"]["name"] == "Homer"
+
+    response = request_(api, "patch", "/api/User/1", {
+        "data": {"type": "User", "id": "1", "attributes": {"name": "Bart"}}
+    })
+    assert response.status == 200
+    assert get(request_, api, "/api/User/1")["attributes"]["name"] == "Bart"
+
+
+def test_invalidate_relatives(api, request_):
+    """
+    The foreign key of a post changes, when it is added to the *posts* of
+    another user. So the cached post must be invalidated too.
+    """
+    data = get(request_, api, "/api/Post/1")
+    assert data["relationships"]["author"]["data"]["id"] == "1"
+
+    response = request_(api, "patch", "/api/User/2", {
+        "data": {
+            "type": "User", "id": "2",
+            "relationships": {
+                "posts": {"data": [{"type": "Post", "id": "1"}]}
+            }
+        }
+    })
+    assert response.status == 200
+
+    data = get(request_, api, "/api/Post/1")
+    assert data["relationships"]["author"]["data"]["id"] == "2"
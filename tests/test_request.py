@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# std
+import collections.abc
+
+# third party
+import pytest
+
+# local
+from jsonapi.base.handler.collection import CollectionHandler
+from jsonapi.base.request import Request
+from jsonapi.base.response import Response
+
+
+class CaseInsensitiveHeaders(collections.abc.Mapping):
+    """
+    Like the headers objects of the web frameworks.
+    """
+
+    def __init__(self, headers):
+        self._headers = {key.lower(): value for key, value in headers.items()}
+
+    def __getitem__(self, key):
+        return self._headers[key.lower()]
+
+    def __iter__(self):
+        return iter(self._headers)
+
+    def __len__(self):
+        return len(self._headers)
+
+
+def test_slots():
+    """
+    The request, response and handler objects have no instance dictionary.
+    """
+    request = Request("http://localhost/api/Post", "GET", {}, b"")
+    assert not hasattr(request, "__dict__")
+    assert not hasattr(Response(), "__dict__")
+    assert "__dict__" not in dir(CollectionHandler)
+
+    with pytest.raises(AttributeError):
+        request.foo = "bar"
+
+
+def test_headers():
+    """
+    The header names are lowercased lazily and only, if necessary.
+    """
+    request = Request(
+        "http://localhost/api/Post", "GET", {"Content-Type": "text/plain"}, b""
+    )
+    assert request.headers == {"content-type": "text/plain"}
+
+    headers = {"content-type": "text/plain"}
+    request = Request("http://localhost/api/Post", "GET", headers, b"")
+    assert request.headers is headers
+
+    headers = CaseInsensitiveHeaders({"Content-Type": "text/plain"})
+    request = Request("http://localhost/api/Post", "GET", headers, b"")
+    assert request.headers is headers
+    assert request.headers.get("content-type") == "text/plain"
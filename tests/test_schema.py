@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# local
+from jsonapi.base.schema import BaseRelationship
+
+
+class Resource(object):
+
+    def __init__(self, typename, id_, relatives=None):
+        self.id = id_
+        self.relatives = relatives
+        self._jsonapi = {"schema": Schema(typename)}
+
+
+class IDAttribute(object):
+
+    def get(self, resource):
+        return resource.id
+
+
+class Schema(object):
+
+    def __init__(self, typename):
+        self.typename = typename
+        self.id_attribute = IDAttribute()
+
+
+class Relationship(BaseRelationship):
+    """
+    A relationship, which only implements :meth:`get`.
+    """
+
+    def __init__(self, name, to_one):
+        super().__init__(name)
+        self.to_one = to_one
+        self.to_many = not to_one
+
+    def get(self, resource):
+        return resource.relatives
+
+
+def test_get_identifiers_default():
+    """
+    The default implementation loads the relatives with *get()*.
+    """
+    author = Relationship("author", to_one=True)
+    assert author.get_identifiers(Resource("Post", "1")) is None
+    assert author.get_identifiers(
+        Resource("Post", "1", Resource("User", "2"))
+    ) == ("User", "2")
+
+    comments = Relationship("comments", to_one=False)
+    resources = [
+        Resource("Post", "1", []),
+        Resource("Post", "2", [Resource("Comment", "3"), ("Comment", "4")])
+    ]
+    assert comments.get_identifiers_many(resources) == [
+        [], [("Comment", "3"), ("Comment", "4")]
+    ]
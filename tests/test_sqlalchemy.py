@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+# std
+import json
+
+# third party
+import pytest
+
+# local
+import jsonapi
+import jsonapi.sqlalchemy
+from conftest import Post, User
+
+
+@pytest.fixture
+def blog(sessionmaker):
+    session = sessionmaker()
+    session.add_all([
+        User(id=1, name="Homer", country="us"),
+        User(id=2, name="Marge", country="ca"),
+        Post(id=1, text="Doh", author_id=1),
+        Post(id=2, text="Hmm", author_id=2)
+    ])
+    session.commit()
+    session.close()
+    return None
+
+
+@pytest.mark.parametrize("settings", [
+    {"fragment_cache": True},
+    {"response_cache": True},
+    {"fragment_cache": True, "response_cache": True}
+])
+def test_patch_with_caches(blog, make_api, request_, settings):
+    """
+    The unloaded *author* relationship has no history. This must not break
+    the cache invalidation.
+    """
+    api = make_api(**settings)
+    response = request_(
+        api, "patch", "/api/Post/1", {
+            "data": {"type": "Post", "id": "1", "attributes": {"text": "Woohoo"}}
+        }
+    )
+    assert response.status == 200
+
+    response = request_(api, "get", "/api/Post/1")
+    assert b"Woohoo" in response.body
+
+
+@pytest.mark.parametrize("query, country, ids", [
+    ("filter[author.country]=eq:\"us\"", "us", ["1", "2"]),
+    ("sort=author.country", "zz", ["1", "2"])
+])
+def test_response_cache_across_relationships(
+    blog, make_api, request_, query, country, ids
+    ):
+    """
+    A collection, which is filtered or sorted by the fields of a related
+    resource, is invalidated, when the related resource changes.
+    """
+    api = make_api(response_cache=True)
+    response = request_(api, "get", "/api/Post?" + query)
+    assert response.status == 200
+    assert response.cache_tags >= {"Post", "User"}
+
+    response = request_(
+        api, "patch", "/api/User/2", {
+            "data": {
+                "type": "User", "id": "2", "attributes": {"country": country}
+            }
+        }
+    )
+    assert response.status == 200
+
+    response = request_(api, "get", "/api/Post?" + query)
+    data = json.loads(response.body.decode())["data"]
+    assert [item["id"] for item in data] == ids
+
+
+def test_response_cache_authorization(blog, make_api, request_):
+    """
+    The responses for different credentials are cached separately.
+    """
+    api = make_api(response_cache=True)
+    for credentials in ("Bearer homer", "Bearer marge", "Bearer homer"):
+        response = request_(
+            api, "get", "/api/Post", headers={"authorization": credentials}
+        )
+        assert response.status == 200
+
+    response = request_(
+        api, "get", "/api/Post", headers={"cookie": "session=bart"}
+    )
+    assert response.status == 200
+    assert len(api.response_cache) == 3
+
+
+def test_sparse_fieldset_defers_columns(blog, make_api, request_, statements):
+    """
+    The columns of the attributes, which are not in the sparse fieldset,
+    are not loaded.
+    """
+    api = make_api()
+    response = request_(api, "get", "/api/Post?fields[Post]=created")
+    assert response.status == 200
+    data = json.loads(response.body.decode())["data"]
+    assert all(list(item["attributes"]) == ["created"] for item in data)
+
+    select = statements[0]
+    assert "posts.created" in select and "posts.author_id" in select
+    assert not "posts.text" in select
+
+
+def test_get_many(blog, make_api, statements):
+    """
+    The resources are loaded with one IN query per type and chunk. The ids
+    may be integers.
+    """
+    api = make_api()
+    session = api.database.session()
+    session.get_many_chunk_size = 1
+
+    resources = session.get_many([("User", 1), ("User", "2"), ("Post", "1")])
+    assert resources[("User", 1)].name == "Homer"
+    assert resources[("User", "2")].name == "Marge"
+    assert resources[("Post", "1")].text == "Doh"
+    assert len(statements) == 3
+    assert all(" IN (" in statement for statement in statements)
+
+
+def test_get_many_missing(blog, make_api):
+    """
+    All missing resources are reported at once.
+    """
+    api = make_api()
+    session = api.database.session()
+
+    resources = session.get_many([("User", 1), ("User", 3)])
+    assert resources[("User", 3)] is None
+
+    with pytest.raises(jsonapi.base.errors.ErrorList) as err:
+        session.get_many([("User", 1), ("User", 3), ("User", "4")], True)
+    assert len(err.value.errors) == 2
+
+
+def test_include_tree(blog, sessionmaker, make_api, request_):
+    """
+    The include paths share the *author* prefix and the primary resource
+    is not repeated in *included*.
+    """
+    session = sessionmaker()
+    session.add(Post(id=3, text="Woohoo", author_id=1))
+    session.commit()
+    session.close()
+
+    api = make_api()
+    response = request_(api, "get", "/api/Post/1?include=author,author.posts")
+    assert response.status == 200
+    document = json.loads(response.body.decode())
+    assert document["data"]["id"] == "1"
+    assert sorted(
+        (item["type"], item["id"]) for item in document["included"]
+    ) == [("Post", "3"), ("User", "1")]
+
+
+@pytest.mark.parametrize("uri, relname, linkage, queries", [
+    ("/api/Post", "author", [("User", "1"), ("User", "2")], 1),
+    ("/api/User", "posts", [[("Post", "1")], [("Post", "2")]], 2)
+])
+def test_linkage_without_relatives(
+    blog, make_api, request_, statements, uri, relname, linkage, queries
+    ):
+    """
+    The linkage is read from the foreign keys or queried for the whole page
+    at once. The relatives are not loaded.
+    """
+    def identifiers(data):
+        if isinstance(data, list):
+            return [identifiers(item) for item in data]
+        return (data["type"], data["id"])
+
+    api = make_api()
+    response = request_(api, "get", uri)
+    assert response.status == 200
+    data = json.loads(response.body.decode())["data"]
+    data.sort(key=lambda item: item["id"])
+    assert [
+        identifiers(item["relationships"][relname]["data"]) for item in data
+    ] == linkage
+    assert len(statements) == queries
+
+
+def test_patch_relationships_batched(blog, make_api, request_, monkeypatch):
+    """
+    The relatives of all relationships are loaded with one *get_many()*
+    call and missing relatives are reported together.
+    """
+    calls = list()
+    get_many = jsonapi.sqlalchemy.database.Session.get_many
+    def spy(self, identifiers, *args, **kargs):
+        calls.append(sorted(identifiers))
+        return get_many(self, identifiers, *args, **kargs)
+    monkeypatch.setattr(jsonapi.sqlalchemy.database.Session, "get_many", spy)
+
+    api = make_api()
+    response = request_(
+        api, "patch", "/api/Post/1", {
+            "data": {
+                "type": "Post", "id": "1",
+                "relationships": {
+                    "author": {"data": {"type": "User", "id": "2"}},
+                    "editor": {"data": {"type": "User", "id": "1"}}
+                }
+            }
+        }
+    )
+    assert response.status == 200
+    assert calls == [[("User", "1"), ("User", "2")]]
+
+    relationships = json.loads(response.body.decode())["data"]["relationships"]
+    assert relationships["author"]["data"]["id"] == "2"
+    assert relationships["editor"]["data"]["id"] == "1"
+
+    response = request_(
+        api, "patch", "/api/Post/1", {
+            "data": {
+                "type": "Post", "id": "1",
+                "relationships": {
+                    "author": {"data": {"type": "User", "id": "8"}},
+                    "editor": {"data": {"type": "User", "id": "9"}}
+                }
+            }
+        }
+    )
+    assert response.status == 404
+    assert len(json.loads(response.body.decode())["errors"]) == 2
+
+
+def test_response_cache_hit_without_session(blog, make_api, request_):
+    """
+    A cached response is returned before a database session is opened.
+    """
+    api = make_api(response_cache=True)
+    sessions = list()
+    open_session = api.database.session
+    def session():
+        sessions.append(1)
+        return open_session()
+    api.database.session = session
+
+    first = request_(api, "get", "/api/Post")
+    second = request_(api, "get", "/api/Post")
+    assert second.status == 200
+    assert second.body == first.body
+    assert len(sessions) == 1
+
+
+def test_response_cache_concurrent_write(
+    blog, make_api, request_, monkeypatch
+    ):
+    """
+    A response is not cached, if a concurrent request invalidated the cache
+    while it was built.
+    """
+    api = make_api(response_cache=True)
+
+    query = jsonapi.sqlalchemy.database.Session.query
+    def concurrent_write(self, *args, **kargs):
+        resources = query(self, *args, **kargs)
+        api.response_cache.invalidate({"Post"})
+        return resources
+    monkeypatch.setattr(
+        jsonapi.sqlalchemy.database.Session, "query", concurrent_write
+    )
+
+    response = request_(api, "get", "/api/Post")
+    assert response.status == 200
+    assert len(api.response_cache) == 0
+
+    monkeypatch.undo()
+    response = request_(api, "get", "/api/Post")
+    assert len(api.response_cache) == 1
+
+
+def test_statement_cache(blog, make_api, request_):
+    """
+    The query for a filter shape is built once and reused with the values
+    of the next request.
+    """
+    api = make_api()
+    for country, ids in [("us", ["1"]), ("ca", ["2"]), ("us", ["1"])]:
+        response = request_(
+            api, "get", "/api/User?filter[country]=eq:\"{}\"".format(country)
+        )
+        assert response.status == 200
+        data = json.loads(response.body.decode())["data"]
+        assert [item["id"] for item in data] == ids
+
+    stats = api.database.stats()
+    assert stats["statement_misses"] == 1
+    assert stats["statement_hits"] == 2